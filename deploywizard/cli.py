@@ -36,6 +36,26 @@ version_option = typer.Option(None, "--version", "-v", help="Version of the mode
 framework_option = typer.Option(..., "--framework", "-f", help="Model framework (sklearn, pytorch, tensorflow)")
 description_option = typer.Option("", "--description", "-d", help="Description of the model")
 model_class_option = typer.Option(None, "--model-class", help="Path to Python file containing model class definition (required for PyTorch state_dict)")
+batching_option = typer.Option(False, "--batching/--no-batching", help="Coalesce concurrent /predict requests into micro-batches (override with ENABLE_BATCHING)")
+max_batch_size_option = typer.Option(32, "--max-batch-size", help="Maximum rows per micro-batch (override with MAX_BATCH_SIZE)")
+max_batch_wait_option = typer.Option(5.0, "--max-batch-wait-ms", help="Maximum milliseconds to wait for a micro-batch to fill (override with MAX_BATCH_WAIT_MS)")
+fast_json_option = typer.Option(False, "--fast-json/--no-fast-json", help="Serialize responses with orjson and skip response-model validation")
+workers_option = typer.Option(None, "--workers", help="Serve with this many pre-forked gunicorn workers, 0 = one per CPU in the container quota (override with WEB_CONCURRENCY)")
+preload_option = typer.Option(True, "--preload/--no-preload", help="With --workers, load the model once in the gunicorn master and share it copy-on-write")
+cache_size_option = typer.Option(0, "--cache-size", help="Cache up to this many /predict results in an LRU cache, 0 = off (override with PREDICTION_CACHE_SIZE)")
+torchscript_option = typer.Option(True, "--torchscript/--no-torchscript", help="Trace PyTorch models to TorchScript at deploy time and serve the traced archive")
+sample_shape_option = typer.Option(None, "--sample-shape", help="Comma-separated shape of one input row used for tracing, e.g. '4' or '3,224,224' (default: from the first Linear layer)")
+runtime_option = typer.Option("native", "--runtime", help="Serving runtime: 'native' (training framework) or 'onnx' (convert sklearn/PyTorch models and serve with onnxruntime)")
+onnx_tolerance_option = typer.Option(1e-4, "--onnx-tolerance", help="Maximum difference allowed between ONNX and original model outputs")
+jit_compile_option = typer.Option(False, "--jit-compile/--no-jit-compile", help="Compile TensorFlow serving functions with XLA (override with TF_JIT_COMPILE)")
+warmup_batch_sizes_option = typer.Option("1,8,32", "--warmup-batch-sizes", help="Comma-separated batch sizes scored at startup before serving, '' = no warmup (override with WARMUP_BATCH_SIZES)")
+watch_interval_option = typer.Option(0.0, "--watch-interval", help="Seconds between checks of the model file for a new version to hot-reload, 0 = off (override with MODEL_WATCH_INTERVAL)")
+mmap_option = typer.Option(False, "--mmap/--no-mmap", help="Memory-map sklearn/PyTorch weights so workers share one copy; re-saves the artifact uncompressed (override with MODEL_MMAP)")
+quantize_option = typer.Option(None, "--quantize", help="Quantize PyTorch models at deploy time: 'dynamic-int8' (int8 Linear/LSTM weights, report in quantization_report.json)")
+max_in_flight_option = typer.Option(0, "--max-in-flight", help="Prediction requests processed at once, 0 = derived from the inference pool (override with MAX_IN_FLIGHT)")
+max_queue_option = typer.Option(64, "--max-queue", help="Prediction requests waiting for a slot before new ones are shed with 503 (override with MAX_QUEUE)")
+request_deadline_option = typer.Option(10000.0, "--request-deadline-ms", help="Milliseconds a request may wait before it is dropped without inference, 0 = none (override with REQUEST_DEADLINE_MS)")
+inference_workers_option = typer.Option(0, "--inference-workers", help="Threads running inference off the event loop, 0 = min(4, CPUs) (override with INFERENCE_WORKERS)")
 
 # Add version callback to the main app
 @app.callback()
@@ -77,11 +97,13 @@ def register(
         raise typer.Exit(code=1)
 
 @app.command(name="list")
-def list_models():
+def list_models(
+    framework: str = typer.Option(None, "--framework", "-f", help="Only list models of this framework"),
+):
     """List all registered models."""
     try:
         scaffolder = Scaffolder()
-        models = scaffolder.list_models()
+        models = scaffolder.list_models(framework)
         
         if not models:
             console.print("No models found in the registry.", style="yellow")
@@ -191,8 +213,8 @@ def update(
             console.print(f"Model '{name}'{version_msg}not found in registry.", style="red")
             raise typer.Exit(code=1)
         
-        # Update fields if provided
-        updated = False
+        # Collect the fields that actually change
+        changes = {}
         
         if new_name and new_name != name:
             # Check if new name already exists
@@ -200,43 +222,25 @@ def update(
             if existing and existing['id'] != model_info['id']:
                 console.print(f"A model with name '{new_name}' and version {model_info['version']} already exists.", style="red")
                 raise typer.Exit(code=1)
-            
-            # Update name in the registry
-            del scaffolder._registry._registry['models'][name][model_info['version']]
-            if not scaffolder._registry._registry['models'][name]:
-                del scaffolder._registry._registry['models'][name]
-                
-            model_info['name'] = new_name
-            updated = True
+            changes['new_name'] = new_name
         
         if new_version and new_version != model_info['version']:
             # Check if version already exists for this model
-            existing = scaffolder.get_model_info(model_info['name'], new_version)
+            target_name = changes.get('new_name', model_info['name'])
+            existing = scaffolder.get_model_info(target_name, new_version)
             if existing:
-                console.print(f"Version {new_version} already exists for model '{model_info['name']}'", style="red")
+                console.print(f"Version {new_version} already exists for model '{target_name}'", style="red")
                 raise typer.Exit(code=1)
-                
-            # Remove old version and add new one
-            del scaffolder._registry._registry['models'][model_info['name']][model_info['version']]
-            model_info['version'] = new_version
-            updated = True
+            changes['new_version'] = new_version
         
         if description is not None and description != model_info.get('description'):
-            model_info['description'] = description
-            updated = True
+            changes['description'] = description
         
-        if not updated:
+        if not changes:
             console.print("No changes detected. Use --help to see available options.")
             return
         
-        # Save the updated model
-        if 'models' not in scaffolder._registry._registry:
-            scaffolder._registry._registry['models'] = {}
-        if model_info['name'] not in scaffolder._registry._registry['models']:
-            scaffolder._registry._registry['models'][model_info['name']] = {}
-            
-        scaffolder._registry._registry['models'][model_info['name']][model_info['version']] = model_info
-        scaffolder._registry._save_registry()
+        model_info = scaffolder._registry.update_model(name, model_info['version'], **changes)
         
         console.print(f"Successfully updated {model_info['name']} v{model_info['version']}", style="green")
         _print_model_info(model_info)
@@ -252,6 +256,26 @@ def deploy(
     output_dir: str = typer.Option(".", "--output", "-o", help="Output directory"),
     api: str = typer.Option("fastapi", help="Type of API to generate"),
     model_class: str = model_class_option,
+    batching: bool = batching_option,
+    max_batch_size: int = max_batch_size_option,
+    max_batch_wait_ms: float = max_batch_wait_option,
+    inference_workers: int = inference_workers_option,
+    fast_json: bool = fast_json_option,
+    workers: Optional[int] = workers_option,
+    preload: bool = preload_option,
+    cache_size: int = cache_size_option,
+    torchscript: bool = torchscript_option,
+    sample_shape: Optional[str] = sample_shape_option,
+    runtime: str = runtime_option,
+    onnx_tolerance: float = onnx_tolerance_option,
+    jit_compile: bool = jit_compile_option,
+    warmup_batch_sizes: str = warmup_batch_sizes_option,
+    watch_interval: float = watch_interval_option,
+    mmap: bool = mmap_option,
+    quantize: Optional[str] = quantize_option,
+    max_in_flight: int = max_in_flight_option,
+    max_queue: int = max_queue_option,
+    request_deadline_ms: float = request_deadline_option,
 ):
     """Generate a deployment project for a registered model.
     
@@ -285,6 +309,26 @@ def deploy(
             output_dir=output_dir,
             api_type=api,
             model_class_path=model_class,
+            batching=batching,
+            max_batch_size=max_batch_size,
+            max_batch_wait_ms=max_batch_wait_ms,
+            inference_workers=inference_workers,
+            fast_json=fast_json,
+            workers=workers,
+            preload=preload,
+            cache_size=cache_size,
+            torchscript=torchscript,
+            sample_shape=_parse_shape(sample_shape),
+            runtime=runtime,
+            onnx_tolerance=onnx_tolerance,
+            jit_compile=jit_compile,
+            warmup_batch_sizes=_parse_shape(warmup_batch_sizes) or (),
+            watch_interval=watch_interval,
+            mmap=mmap,
+            quantize=quantize,
+            max_in_flight=max_in_flight,
+            max_queue=max_queue,
+            request_deadline_ms=request_deadline_ms,
         )
         
         console.print(f"Successfully deployed [bold]{name}[/bold] to {output_dir}", style="green")
@@ -298,6 +342,34 @@ def deploy(
         console.print(f"Error: {str(e)}", style="red")
         raise typer.Exit(code=1)
 
+@app.command("deploy-multi")
+def deploy_multi(
+    models: Optional[List[str]] = typer.Option(None, "--model", "-m", help="Model to host as NAME (all versions) or NAME:VERSION; repeat for more (default: every registered model)"),
+    output_dir: str = typer.Option(".", "--output", "-o", help="Output directory"),
+    memory_budget_mb: float = typer.Option(1024, "--memory-budget-mb", help="Memory budget for loaded models in MiB; least recently used models are evicted beyond it (override with MODEL_MEMORY_BUDGET_MB)"),
+    inference_workers: int = inference_workers_option,
+):
+    """Generate one service hosting many registered models under /models/{name}/{version}/predict."""
+    try:
+        scaffolder = Scaffolder()
+        hosted = scaffolder.generate_multi_project(
+            models=models or None,
+            output_dir=output_dir,
+            memory_budget_mb=memory_budget_mb,
+            inference_workers=inference_workers,
+        )
+        
+        console.print(f"Successfully deployed [bold]{len(hosted)}[/bold] model version(s) to {output_dir}", style="green")
+        for entry in hosted:
+            console.print(f"  • /models/{entry['name']}/{entry['version']}/predict ({entry['framework']})")
+        console.print("\nNext steps:")
+        console.print(f"1. cd {output_dir}")
+        console.print("2. docker-compose up --build")
+        
+    except Exception as e:
+        console.print(f"Error: {str(e)}", style="red")
+        raise typer.Exit(code=1)
+
 @app.command()
 def init(
     model: str = typer.Option(..., help="Path to saved model file"),
@@ -305,7 +377,27 @@ def init(
     api: str = typer.Option("fastapi", help="Type of API to generate"),
     output_dir: str = typer.Option("my_app", help="Output directory"),
     name: str = typer.Option(None, "--name", "-n", help="Name for the model (defaults to the filename without extension)"),
-    model_class: str = typer.Option(None, "--model-class", help="Path to Python file containing model class definition (required for PyTorch state_dict models)")
+    model_class: str = typer.Option(None, "--model-class", help="Path to Python file containing model class definition (required for PyTorch state_dict models)"),
+    batching: bool = batching_option,
+    max_batch_size: int = max_batch_size_option,
+    max_batch_wait_ms: float = max_batch_wait_option,
+    inference_workers: int = inference_workers_option,
+    fast_json: bool = fast_json_option,
+    workers: Optional[int] = workers_option,
+    preload: bool = preload_option,
+    cache_size: int = cache_size_option,
+    torchscript: bool = torchscript_option,
+    sample_shape: Optional[str] = sample_shape_option,
+    runtime: str = runtime_option,
+    onnx_tolerance: float = onnx_tolerance_option,
+    jit_compile: bool = jit_compile_option,
+    warmup_batch_sizes: str = warmup_batch_sizes_option,
+    watch_interval: float = watch_interval_option,
+    mmap: bool = mmap_option,
+    quantize: Optional[str] = quantize_option,
+    max_in_flight: int = max_in_flight_option,
+    max_queue: int = max_queue_option,
+    request_deadline_ms: float = request_deadline_option,
 ):
     """Initialize a new ML model deployment project.
     
@@ -339,7 +431,27 @@ def init(
             version="1.0.0",
             output_dir=output_dir,
             api_type=api,
-            model_class_path=model_class
+            model_class_path=model_class,
+            batching=batching,
+            max_batch_size=max_batch_size,
+            max_batch_wait_ms=max_batch_wait_ms,
+            inference_workers=inference_workers,
+            fast_json=fast_json,
+            workers=workers,
+            preload=preload,
+            cache_size=cache_size,
+            torchscript=torchscript,
+            sample_shape=_parse_shape(sample_shape),
+            runtime=runtime,
+            onnx_tolerance=onnx_tolerance,
+            jit_compile=jit_compile,
+            warmup_batch_sizes=_parse_shape(warmup_batch_sizes) or (),
+            watch_interval=watch_interval,
+            mmap=mmap,
+            quantize=quantize,
+            max_in_flight=max_in_flight,
+            max_queue=max_queue,
+            request_deadline_ms=request_deadline_ms,
         )
         
         typer.echo(f"Successfully generated project in {output_dir}")
@@ -354,6 +466,15 @@ def init(
         typer.echo(f"Error: {str(e)}", err=True)
         raise typer.Exit(code=1)
 
+def _parse_shape(value: Optional[str]) -> Optional[tuple]:
+    """Parse comma-separated integers, such as the shape '3,224,224', into a tuple of ints."""
+    if not value:
+        return None
+    try:
+        return tuple(int(dim) for dim in value.split(","))
+    except ValueError:
+        raise typer.BadParameter(f"Invalid value '{value}', expected comma-separated integers")
+
 def _print_model_info(model_info: dict):
     """Print detailed information about a model."""
     console.print("\n[bold]Model Information[/bold]")
@@ -1,6 +1,6 @@
 from jinja2 import Environment, FileSystemLoader, TemplateNotFound
 from pathlib import Path
-from typing import Dict, Any, Optional, Union
+from typing import Dict, Any, List, Optional, Union
 from importlib import resources
 import logging
 
@@ -63,13 +63,45 @@ class APIGenerator:
         self._generate_main(app_dir, framework, template_vars)
         
         # Generate requirements.txt
-        self._generate_requirements(app_dir, framework)
+        self._generate_requirements(app_dir, framework, template_vars)
         
         # Generate README if it doesn't exist
         readme_path = app_dir / "README.md"
         if not readme_path.exists():
             self._generate_readme(app_dir, framework, template_vars)
 
+    def generate_multi(
+        self,
+        frameworks: List[str],
+        output_dir: str,
+        template_vars: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """
+        Generate API code and requirements for a service hosting many models.
+        
+        The service reads the hosted models from app/models.json, which the caller writes.
+        
+        Args:
+            frameworks: Frameworks of the hosted models; each one's packages are required
+            output_dir: Directory to write the generated files to
+            template_vars: Additional template variables (memory_budget_mb, inference_workers)
+        """
+        logger.info(f"Generating multi-model API for frameworks {sorted(set(frameworks))}")
+        
+        app_dir = Path(output_dir) / "app"
+        app_dir.mkdir(parents=True, exist_ok=True)
+        template_vars = {**(template_vars or {}), 'frameworks': sorted(set(frameworks))}
+        
+        try:
+            output = self._env.get_template('fastapi_multi.tpl').render(**template_vars)
+            with open(app_dir / "main.py", "w", encoding="utf-8") as f:
+                f.write(output)
+        except Exception as e:
+            logger.error(f"Failed to generate main.py: {e}")
+            raise
+        
+        self._generate_requirements(app_dir, None, template_vars)
+
     def _generate_main(self, output_dir: Path, framework: str, template_vars: Dict[str, Any]) -> None:
         """Generate the main application file."""
         try:
@@ -83,31 +115,48 @@ class APIGenerator:
             logger.error(f"Failed to generate main.py: {e}")
             raise
 
-    def _generate_requirements(self, output_dir: Path, framework: str) -> None:
+    def _generate_requirements(self, output_dir: Path, framework: str, 
+                               template_vars: Optional[Dict[str, Any]] = None) -> None:
         """
         Generate requirements.txt file.
         
         Args:
             output_dir: Directory to write requirements.txt to
             framework: Framework used (e.g., "sklearn", "pytorch", "tensorflow")
+            template_vars: Template variables; generation options that need extra packages
+                          (e.g. fast_json) add them here
         """
+        template_vars = template_vars or {}
         try:
             requirements = {
-                'fastapi': '>=0.68.0',
+                'fastapi': '>=0.93.0',  # Lifespan handlers
                 'uvicorn': '>=0.15.0',
                 'python-multipart': '',  # For file uploads
                 'pydantic': '>=1.8.2,<3.0.0',
-                'numpy': '>=1.21.0,<2.0.0'  # Compatible with most ML libraries
+                'numpy': '>=1.21.0,<2.0.0',  # Compatible with most ML libraries
+                'msgpack': '>=1.0.0'  # For application/msgpack request and response bodies
             }
             
-            # Add framework-specific requirements
-            if framework == 'sklearn':
+            # Add framework-specific requirements (a multi-model service lists several frameworks)
+            frameworks = template_vars.get('frameworks') or [framework]
+            if template_vars.get('runtime') == 'onnx':
+                # The converted model only needs the runtime, not the training framework
+                requirements['onnxruntime'] = '>=1.10.0'
+                frameworks = []
+            if 'sklearn' in frameworks:
                 requirements['scikit-learn'] = '>=1.0.0,<2.0.0'  # Support a wide range of scikit-learn versions
                 requirements['joblib'] = '>=1.0.0'  # Flexible joblib version
-            elif framework == 'pytorch':
+            if 'pytorch' in frameworks:
                 requirements['torch'] = '>=1.9.0,<3.0.0'  # Support a wide range of PyTorch versions
-            elif framework == 'tensorflow':
+            if 'tensorflow' in frameworks:
                 requirements['tensorflow'] = '>=2.6.0,<3.0.0'  # Support TF 2.x
+            
+            # Add option-specific requirements
+            if template_vars.get('fast_json'):
+                requirements['orjson'] = '>=3.6.0'  # Native numpy serialization
+            if template_vars.get('workers') is not None:
+                requirements['gunicorn'] = '>=20.1.0'  # Pre-fork process manager
+                requirements['uvicorn-worker'] = '>=0.2.0'  # Uvicorn worker class for gunicorn
                 
             with open(output_dir / "requirements.txt", "w", encoding="utf-8") as f:
                 for pkg, version in requirements.items():
@@ -54,9 +54,18 @@ class DockerGenerator:
                 python_version=template_vars.get('python_version', '3.10'),
                 additional_deps=template_vars.get('additional_deps', {}),
                 use_gpu=template_vars.get('use_gpu', False),
-                requirements_file=template_vars.get('requirements_file')
+                requirements_file=template_vars.get('requirements_file'),
+                workers=template_vars.get('workers')
             )
             
+            # Generate gunicorn.conf.py for multi-worker serving
+            if template_vars.get('workers') is not None:
+                self.generate_gunicorn_config(
+                    output_dir=output_dir,
+                    workers=template_vars['workers'],
+                    preload=template_vars.get('preload', True)
+                )
+            
             # Generate docker-compose.yml
             self.generate_docker_compose(
                 output_dir=output_dir,
@@ -79,7 +88,8 @@ class DockerGenerator:
         python_version: str = "3.10",
         additional_deps: Optional[Dict[str, list]] = None,
         use_gpu: bool = False,
-        requirements_file: Optional[str] = None
+        requirements_file: Optional[str] = None,
+        workers: Optional[int] = None
     ) -> None:
         """
         Generate a Dockerfile based on the template.
@@ -91,6 +101,8 @@ class DockerGenerator:
             additional_deps: Additional system dependencies to install
             use_gpu: Whether to configure the Dockerfile for GPU support
             requirements_file: Custom requirements file to use (if any)
+            workers: Number of gunicorn worker processes (0 derives it from the CPU quota).
+                    If None, the container runs a single uvicorn process.
             
         Raises:
             PermissionError: If there are permission issues writing the Dockerfile
@@ -114,7 +126,8 @@ class DockerGenerator:
                 model_name=model_name,
                 system_deps=system_deps,
                 use_gpu=use_gpu,
-                requirements_file=requirements_file
+                requirements_file=requirements_file,
+                workers=workers
             )
             
             # Ensure output directory exists
@@ -134,6 +147,49 @@ class DockerGenerator:
             logger.error(f"Failed to generate Dockerfile: {e}")
             raise OSError(f"Failed to generate Dockerfile: {e}") from e
     
+    def generate_gunicorn_config(
+        self,
+        output_dir: str,
+        workers: int = 0,
+        preload: bool = True
+    ) -> None:
+        """
+        Generate app/gunicorn.conf.py for pre-forked multi-worker serving.
+        
+        Args:
+            output_dir: Project directory; the file is written to its app/ subdirectory
+            workers: Number of worker processes (0 derives it from the container's CPU quota)
+            preload: Whether to load the model once in the master and share it copy-on-write
+            
+        Raises:
+            PermissionError: If there are permission issues writing the config file
+            OSError: For other file system related errors
+        """
+        try:
+            template = self._env.get_template('gunicorn.conf.tpl')
+            
+            rendered = template.render(
+                workers=workers,
+                preload=preload
+            )
+            
+            # Ensure app directory exists
+            app_path = Path(output_dir) / 'app'
+            app_path.mkdir(parents=True, exist_ok=True)
+            
+            # Write gunicorn.conf.py
+            config_path = app_path / 'gunicorn.conf.py'
+            try:
+                with open(config_path, 'w') as f:
+                    f.write(rendered)
+            except (PermissionError, OSError) as e:
+                logger.error(f"Failed to write gunicorn.conf.py to {config_path}: {e}")
+                raise PermissionError(f"Cannot write to {config_path}") from e
+                
+        except Exception as e:
+            logger.error(f"Failed to generate gunicorn.conf.py: {e}")
+            raise OSError(f"Failed to generate gunicorn.conf.py: {e}") from e
+    
     def generate_docker_compose(
         self,
         output_dir: str,
@@ -0,0 +1,539 @@
+import importlib.util
+import inspect
+import io
+import shutil
+import sys
+import time
+import warnings
+import zipfile
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+class ModelExporter:
+    """Convert registered model artifacts into faster serving formats at scaffold time."""
+
+    def export_torchscript(
+        self,
+        model_path: str,
+        output_path: str,
+        sample_shape: Optional[Sequence[int]] = None,
+        model_class_path: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Trace (or script) a PyTorch model and save it as a TorchScript archive.
+
+        The traced module is checked against the eager model on a batch of a different
+        size, so a trace that hard-coded the sample's batch dimension is rejected. If
+        tracing and scripting both fail, nothing is written and the report explains why,
+        so the caller can keep serving the eager model.
+
+        Args:
+            model_path: Path to the saved model (full model or state_dict)
+            output_path: Where to write the TorchScript archive
+            sample_shape: Shape of one input row, without the batch dimension. If None,
+                         it is taken from the first nn.Linear layer's in_features.
+            model_class_path: Python file defining the model class, for state_dict artifacts
+
+        Returns:
+            Report dictionary with 'format' ('torchscript' or 'eager'), 'method'
+            ('trace', 'script' or None), 'path', 'input_shape', 'warnings' and 'reason'
+        """
+        report: Dict[str, Any] = {
+            'format': 'eager',
+            'method': None,
+            'path': None,
+            'input_shape': list(sample_shape) if sample_shape else None,
+            'warnings': [],
+            'reason': None,
+        }
+
+        try:
+            import torch
+        except ImportError:
+            report['reason'] = "PyTorch is not installed"
+            return report
+
+        try:
+            model = self._load_torch_module(model_path, model_class_path)
+        except Exception as e:
+            report['reason'] = f"Could not load model: {e}"
+            return report
+
+        row_shape = tuple(sample_shape) if sample_shape else self._infer_row_shape(model)
+        if row_shape is None:
+            report['reason'] = "Could not infer the input shape; pass a sample shape"
+            return report
+        report['input_shape'] = [1, *row_shape]
+
+        try:
+            exported, method, caught = self._to_torchscript(model, row_shape)
+        except ValueError as e:
+            report['reason'] = str(e)
+            return report
+
+        Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+        torch.jit.save(exported, str(output_path))
+        report.update({
+            'format': 'torchscript',
+            'method': method,
+            'path': str(output_path),
+            'warnings': caught,
+        })
+        return report
+
+    def quantize_dynamic(
+        self,
+        model_path: str,
+        output_path: str,
+        sample_shape: Optional[Sequence[int]] = None,
+        model_class_path: Optional[str] = None,
+        num_samples: int = 64,
+        iterations: int = 200
+    ) -> Dict[str, Any]:
+        """
+        Apply dynamic int8 quantization to a PyTorch model and save it as TorchScript.
+        
+        ``torch.ao.quantization.quantize_dynamic`` stores the weights of every nn.Linear and
+        nn.LSTM layer as int8 and quantizes activations on the fly, which speeds up CPU
+        inference for models dominated by those layers. The quantized model is traced (or
+        scripted) so the service can load it without model.py. Both models are then
+        compared on the same random rows, and timed one row at a time against the fp32
+        model traced the same way.
+        
+        Args:
+            model_path: Path to the saved fp32 model (full model or state_dict)
+            output_path: Where to write the quantized TorchScript archive
+            sample_shape: Shape of one input row, without the batch dimension. If None,
+                         it is taken from the first nn.Linear layer's in_features.
+            model_class_path: Python file defining the model class, for state_dict artifacts
+            num_samples: Number of random rows used to measure output drift
+            iterations: Number of timed single-row forward passes per model
+        
+        Returns:
+            Report dictionary with 'format' ('torchscript-int8' on success, None otherwise),
+            'method', 'path', 'input_shape', 'quantized_layers', 'size_bytes' and
+            'latency_ms' (each with 'fp32' and 'int8' entries, latency as 'p50' and 'p99'),
+            'speedup' (fp32 p50 / int8 p50), 'drift' ('max_abs_diff', 'mean_abs_diff' and,
+            for multi-output models, 'top1_agreement'), 'warnings' and 'reason'
+        """
+        report: Dict[str, Any] = {
+            'format': None,
+            'method': None,
+            'path': None,
+            'input_shape': list(sample_shape) if sample_shape else None,
+            'quantized_layers': 0,
+            'size_bytes': None,
+            'latency_ms': None,
+            'speedup': None,
+            'drift': None,
+            'warnings': [],
+            'reason': None,
+        }
+
+        try:
+            import torch
+            from torch.ao.quantization import quantize_dynamic
+        except ImportError:
+            report['reason'] = "PyTorch with torch.ao.quantization is not installed"
+            return report
+
+        try:
+            model = self._load_torch_module(model_path, model_class_path)
+        except Exception as e:
+            report['reason'] = f"Could not load model: {e}"
+            return report
+
+        row_shape = tuple(sample_shape) if sample_shape else self._infer_row_shape(model)
+        if row_shape is None:
+            report['reason'] = "Could not infer the input shape; pass a sample shape"
+            return report
+        report['input_shape'] = [1, *row_shape]
+
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                quantized = quantize_dynamic(model, {torch.nn.Linear, torch.nn.LSTM}, dtype=torch.qint8)
+        except Exception as e:
+            report['reason'] = f"Quantization failed: {e}"
+            return report
+        report['quantized_layers'] = sum(
+            1 for module in quantized.modules()
+            if type(module).__module__.startswith('torch.ao.nn.quantized.dynamic')
+        )
+        if not report['quantized_layers']:
+            report['reason'] = "The model has no nn.Linear or nn.LSTM layers to quantize"
+            return report
+
+        try:
+            exported, method, caught = self._to_torchscript(quantized, row_shape)
+        except ValueError as e:
+            report['reason'] = str(e)
+            return report
+
+        samples = torch.as_tensor(np.random.default_rng(0).standard_normal((num_samples, *row_shape)).astype(np.float32))
+        with torch.no_grad():
+            expected = model(samples)
+            actual = exported(samples)
+        diff = (actual - expected).abs()
+        drift: Dict[str, Any] = {
+            'max_abs_diff': float(diff.max()),
+            'mean_abs_diff': float(diff.mean()),
+        }
+        if expected.dim() > 1 and expected.shape[1] > 1:
+            drift['top1_agreement'] = float((actual.argmax(dim=1) == expected.argmax(dim=1)).float().mean())
+
+        # Time against what would ship without quantization: the traced fp32 model, or eager
+        try:
+            baseline = self._to_torchscript(model, row_shape)[0]
+        except ValueError:
+            baseline = model
+        latency = {
+            'fp32': self._latency_ms(baseline, samples[:1], iterations),
+            'int8': self._latency_ms(exported, samples[:1], iterations),
+        }
+
+        Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+        torch.jit.save(exported, str(output_path))
+        report.update({
+            'format': 'torchscript-int8',
+            'method': method,
+            'path': str(output_path),
+            'size_bytes': {
+                'fp32': self._state_dict_bytes(model),
+                'int8': self._state_dict_bytes(quantized),
+            },
+            'latency_ms': latency,
+            'speedup': round(latency['fp32']['p50'] / latency['int8']['p50'], 2) if latency['int8']['p50'] else None,
+            'drift': drift,
+            'warnings': caught,
+        })
+        return report
+
+    def _to_torchscript(self, model: Any, row_shape: Sequence[int]):
+        """
+        Trace a model, or script it if tracing fails, and check it against the eager model.
+        
+        The check runs a batch of a different size than the tracing example, so a trace
+        that hard-coded the batch dimension is rejected.
+        
+        Returns:
+            (exported module, 'trace' or 'script', sorted warning messages)
+        
+        Raises:
+            ValueError: If neither method produces a module matching the eager model
+        """
+        import torch
+
+        example = torch.rand(1, *row_shape)
+        check = torch.rand(3, *row_shape)
+        failures = []
+        for method in ('trace', 'script'):
+            try:
+                with warnings.catch_warnings(record=True) as caught:
+                    warnings.simplefilter("always")
+                    if method == 'trace':
+                        exported = torch.jit.trace(model, example)
+                    else:
+                        exported = torch.jit.script(model)
+                    with torch.no_grad():
+                        expected = model(check)
+                        actual = exported(check)
+                if not torch.allclose(expected, actual, rtol=1e-4, atol=1e-5):
+                    raise ValueError("output differs from the eager model")
+            except Exception as e:
+                failures.append(f"{method}: {e}")
+                continue
+
+            messages = sorted({
+                str(w.message).splitlines()[0] for w in caught
+                if not issubclass(w.category, (DeprecationWarning, FutureWarning))
+            })
+            return exported, method, messages
+
+        raise ValueError("; ".join(failures))
+
+    @staticmethod
+    def _latency_ms(model: Any, example: Any, iterations: int) -> Dict[str, float]:
+        """Time single forward passes after a few warmup calls; return p50 and p99 in milliseconds."""
+        import torch
+
+        timings = []
+        with torch.no_grad():
+            for _ in range(5):
+                model(example)
+            for _ in range(iterations):
+                start = time.perf_counter()
+                model(example)
+                timings.append((time.perf_counter() - start) * 1000)
+        return {
+            'p50': round(float(np.percentile(timings, 50)), 4),
+            'p99': round(float(np.percentile(timings, 99)), 4),
+        }
+
+    @staticmethod
+    def _state_dict_bytes(model: Any) -> int:
+        """Return the serialized size of a model's weights."""
+        import torch
+
+        buffer = io.BytesIO()
+        torch.save(model.state_dict(), buffer)
+        return buffer.tell()
+
+    def export_onnx(
+        self,
+        model_path: str,
+        framework: str,
+        output_path: str,
+        sample_shape: Optional[Sequence[int]] = None,
+        model_class_path: Optional[str] = None,
+        tolerance: float = 1e-4,
+        num_samples: int = 64
+    ) -> Dict[str, Any]:
+        """
+        Convert a scikit-learn or PyTorch model to ONNX and check it against the original.
+
+        scikit-learn models are converted with skl2onnx (classifiers without ZipMap, so
+        probabilities come back as a matrix) and PyTorch models with torch.onnx.export
+        and a dynamic batch dimension. Both models then score the same random float32
+        rows through onnxruntime's CPU provider. The export passes only if every output
+        is within ``tolerance`` (absolute and relative) and no class label differs,
+        apart from rows whose top two probabilities are themselves within ``tolerance``.
+
+        Args:
+            model_path: Path to the saved model
+            framework: 'sklearn' or 'pytorch'
+            output_path: Where to write the .onnx file
+            sample_shape: Shape of one input row, without the batch dimension. If None, it
+                         is taken from n_features_in_ (sklearn) or the first nn.Linear layer.
+            model_class_path: Python file defining the model class, for PyTorch state_dicts
+            tolerance: Maximum allowed absolute and relative difference between outputs
+            num_samples: Number of random rows used for the comparison
+
+        Returns:
+            Report dictionary with 'format' ('onnx' on success, None otherwise), 'path',
+            'input_shape', 'max_abs_diff', 'label_mismatches' and 'reason'. On failure the
+            .onnx file is removed.
+        """
+        report: Dict[str, Any] = {
+            'format': None,
+            'path': None,
+            'input_shape': None,
+            'max_abs_diff': None,
+            'label_mismatches': None,
+            'reason': None,
+        }
+
+        try:
+            import onnxruntime
+        except ImportError:
+            report['reason'] = "onnxruntime is not installed (pip install onnxruntime)"
+            return report
+
+        output = Path(output_path)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            if framework == 'sklearn':
+                model, row_shape = self._export_sklearn_onnx(model_path, output, sample_shape)
+            elif framework == 'pytorch':
+                model, row_shape = self._export_torch_onnx(model_path, output, sample_shape, model_class_path)
+            else:
+                report['reason'] = f"ONNX export is not supported for {framework} models"
+                return report
+        except Exception as e:
+            report['reason'] = f"Conversion failed: {e}"
+            output.unlink(missing_ok=True)
+            return report
+        report['input_shape'] = [None, *row_shape]
+
+        samples = np.random.default_rng(0).standard_normal((num_samples, *row_shape)).astype(np.float32)
+        session = onnxruntime.InferenceSession(str(output), providers=["CPUExecutionProvider"])
+        outputs = session.run(None, {session.get_inputs()[0].name: samples})
+
+        if framework == 'sklearn':
+            diff, mismatches = self._compare_sklearn(model, samples, outputs, tolerance)
+        else:
+            import torch
+            with torch.no_grad():
+                expected = model(torch.as_tensor(samples)).numpy()
+            actual = np.asarray(outputs[0]).reshape(expected.shape)
+            diff, mismatches = self._exceeds(actual, expected, tolerance), 0
+
+        report['max_abs_diff'], report['label_mismatches'] = diff[0], mismatches
+        if not diff[1] or mismatches:
+            report['reason'] = (
+                f"ONNX output diverges from the original model on {num_samples} sample rows "
+                f"(max abs diff {diff[0]:.3g}, {mismatches} label mismatch(es), tolerance {tolerance:g})"
+            )
+            output.unlink(missing_ok=True)
+            return report
+
+        report.update({'format': 'onnx', 'path': str(output)})
+        return report
+
+    def export_mmap(self, model_path: str, framework: str, output_path: str) -> Dict[str, Any]:
+        """
+        Save a scikit-learn or PyTorch model in a layout that can be memory-mapped at load time.
+        
+        joblib can only memory-map the numpy arrays of an uncompressed dump, so scikit-learn
+        models are always re-dumped without compression. ``torch.load(mmap=True)`` needs the
+        zip serialization format, so only legacy-format PyTorch files are re-saved; zip files
+        are copied unchanged. ``output_path`` may be ``model_path`` itself, the file is then
+        replaced atomically.
+        
+        Args:
+            model_path: Path to the saved model
+            framework: 'sklearn' or 'pytorch'
+            output_path: Where to write the mmap-compatible artifact
+        
+        Returns:
+            Report dictionary with 'format' ('joblib' or 'torch-zip' on success, None
+            otherwise), 'path', 'rewritten' (whether the file was re-serialized),
+            'size_bytes' and 'reason'
+        """
+        report: Dict[str, Any] = {
+            'format': None,
+            'path': None,
+            'rewritten': False,
+            'size_bytes': None,
+            'reason': None,
+        }
+        
+        output = Path(output_path)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        temp = output.with_name(f".{output.name}.mmap.tmp")
+        try:
+            if framework == 'sklearn':
+                import joblib
+                model = joblib.load(model_path)
+                joblib.dump(model, temp, compress=0)
+                report.update({'format': 'joblib', 'rewritten': True})
+            elif framework == 'pytorch':
+                import torch
+                if zipfile.is_zipfile(model_path):
+                    shutil.copy2(model_path, temp)
+                else:
+                    try:
+                        checkpoint = torch.load(model_path, map_location='cpu', weights_only=False)
+                    except TypeError:  # PyTorch < 1.13 has no weights_only argument
+                        checkpoint = torch.load(model_path, map_location='cpu')
+                    torch.save(checkpoint, temp)
+                    report['rewritten'] = True
+                report['format'] = 'torch-zip'
+            else:
+                report['reason'] = f"Memory-mapped loading is not supported for {framework} models"
+                return report
+            temp.replace(output)
+        except Exception as e:
+            temp.unlink(missing_ok=True)
+            report.update({'format': None, 'rewritten': False, 'reason': f"Could not save the model for mmap: {e}"})
+            return report
+        
+        report.update({'path': str(output), 'size_bytes': output.stat().st_size})
+        return report
+
+    def _export_sklearn_onnx(self, model_path: str, output: Path, sample_shape: Optional[Sequence[int]]):
+        import joblib
+        from sklearn.base import is_classifier
+        from skl2onnx import to_onnx
+
+        model = joblib.load(model_path)
+        row_shape = tuple(sample_shape) if sample_shape else (int(model.n_features_in_),)
+        options = {id(model): {'zipmap': False}} if is_classifier(model) else None
+        onnx_model = to_onnx(model, np.zeros((1, *row_shape), dtype=np.float32), options=options)
+        output.write_bytes(onnx_model.SerializeToString())
+        return model, row_shape
+
+    def _export_torch_onnx(self, model_path: str, output: Path, sample_shape: Optional[Sequence[int]],
+                           model_class_path: Optional[str]):
+        import torch
+
+        model = self._load_torch_module(model_path, model_class_path)
+        row_shape = tuple(sample_shape) if sample_shape else self._infer_row_shape(model)
+        if row_shape is None:
+            raise ValueError("Could not infer the input shape; pass a sample shape")
+
+        kwargs = {}
+        # Newer PyTorch defaults to the dynamo exporter, which needs the onnxscript package
+        if 'dynamo' in inspect.signature(torch.onnx.export).parameters:
+            kwargs['dynamo'] = False
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            torch.onnx.export(
+                model, (torch.rand(1, *row_shape),), str(output),
+                input_names=['input'], output_names=['output'],
+                dynamic_axes={'input': {0: 'batch'}, 'output': {0: 'batch'}},
+                **kwargs
+            )
+        return model, row_shape
+
+    def _compare_sklearn(self, model: Any, samples: np.ndarray, outputs: list, tolerance: float):
+        """Compare skl2onnx outputs with the original estimator on the same float32 rows."""
+        rows = samples.astype(np.float64)
+        if len(outputs) > 1:
+            expected = np.asarray(model.predict_proba(rows))
+            diff = self._exceeds(np.asarray(outputs[1]), expected, tolerance)
+            # Labels may legitimately differ where the top two classes are (almost) tied
+            if expected.shape[1] > 1:
+                top_two = np.sort(expected, axis=1)[:, -2:]
+                decisive = top_two[:, 1] - top_two[:, 0] > tolerance
+            else:
+                decisive = np.ones(len(rows), dtype=bool)
+            labels = np.asarray(model.predict(rows))
+            mismatches = int(np.sum((np.asarray(outputs[0]).ravel() != labels) & decisive))
+            return diff, mismatches
+        expected = np.asarray(model.predict(rows), dtype=float).reshape(len(rows), -1)
+        return self._exceeds(np.asarray(outputs[0]).reshape(expected.shape), expected, tolerance), 0
+
+    @staticmethod
+    def _exceeds(actual: np.ndarray, expected: np.ndarray, tolerance: float):
+        """Return (max absolute difference, whether all values are within tolerance)."""
+        actual = np.asarray(actual, dtype=float)
+        expected = np.asarray(expected, dtype=float)
+        max_diff = float(np.max(np.abs(actual - expected))) if actual.size else 0.0
+        return max_diff, bool(np.allclose(actual, expected, rtol=tolerance, atol=tolerance))
+
+    def _load_torch_module(self, model_path: str, model_class_path: Optional[str] = None) -> Any:
+        """Load a full PyTorch model, or rebuild it from a state_dict and its class definition."""
+        import torch
+
+        try:
+            checkpoint = torch.load(model_path, map_location='cpu', weights_only=False)
+        except TypeError:  # PyTorch < 1.13 has no weights_only argument
+            checkpoint = torch.load(model_path, map_location='cpu')
+
+        if isinstance(checkpoint, torch.nn.Module):
+            return checkpoint.eval()
+
+        if not isinstance(checkpoint, dict):
+            raise ValueError(f"Unsupported checkpoint type: {type(checkpoint).__name__}")
+        if not model_class_path or not Path(model_class_path).exists():
+            raise ValueError("Model is a state_dict and no model class file was provided")
+
+        spec = importlib.util.spec_from_file_location("deploywizard_model_class", str(model_class_path))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[spec.name] = module
+        spec.loader.exec_module(module)
+
+        model_class = next(
+            (obj for obj in vars(module).values()
+             if isinstance(obj, type) and issubclass(obj, torch.nn.Module) and obj is not torch.nn.Module),
+            None
+        )
+        if model_class is None:
+            raise ValueError(f"No PyTorch model class found in {model_class_path}")
+
+        model = model_class()
+        model.load_state_dict(checkpoint.get('state_dict', checkpoint))
+        return model.eval()
+
+    @staticmethod
+    def _infer_row_shape(model: Any) -> Optional[tuple]:
+        """Return the input row shape implied by the first Linear layer, if any."""
+        import torch
+
+        for module in model.modules():
+            if isinstance(module, torch.nn.Linear):
+                return (module.in_features,)
+        return None
@@ -12,12 +12,16 @@ class ModelLoader:
             'tensorflow': self._load_tensorflow
         }
 
-    def load(self, model_path: str, framework: str) -> Any:
+    def load(self, model_path: str, framework: str, mmap: bool = False) -> Any:
         """Load a model based on its framework.
         
         Args:
             model_path: Path to the model file
             framework: Framework of the model ('sklearn', 'pytorch', or 'tensorflow')
+            mmap: Memory-map the model's arrays read-only instead of reading them into
+                  memory, so processes loading the same file share one page-cache copy.
+                  Needs an uncompressed joblib file or a zip-format torch.save file;
+                  ignored for TensorFlow models.
             
         Returns:
             Loaded model
@@ -36,31 +40,40 @@ class ModelLoader:
         if framework not in self._loaders:
             raise ValueError(f"Unsupported framework: {framework}. Must be one of {list(self._loaders.keys())}")
         
-        return self._loaders[framework](model_path)
+        return self._loaders[framework](model_path, mmap=mmap)
 
-    def _load_sklearn(self, model_path: str) -> Any:
+    def _load_sklearn(self, model_path: str, mmap: bool = False) -> Any:
         """Load a scikit-learn model."""
         try:
-            return joblib.load(model_path)
+            return joblib.load(model_path, mmap_mode='r' if mmap else None)
         except ImportError:
             raise ImportError("scikit-learn is required for sklearn models")
         except Exception as e:
             raise RuntimeError(f"Failed to load scikit-learn model: {str(e)}")
 
-    def _load_pytorch(self, model_path: str) -> Any:
+    def _load_pytorch(self, model_path: str, mmap: bool = False) -> Any:
         """Load a PyTorch model."""
         try:
+            if mmap:
+                try:
+                    return torch.load(model_path, mmap=True)
+                except (TypeError, RuntimeError):
+                    # PyTorch < 2.1, or a file saved without the zip format; read it normally
+                    pass
             return torch.load(model_path)
         except ImportError:
             raise ImportError("PyTorch is required for pytorch models")
         except Exception as e:
             raise RuntimeError(f"Failed to load PyTorch model: {str(e)}")
 
-    def _load_tensorflow(self, model_path: str) -> Any:
-        """Load a TensorFlow model."""
+    def _load_tensorflow(self, model_path: str, mmap: bool = False) -> Any:
+        """Load a TensorFlow model (TensorFlow manages its own memory, so mmap is ignored)."""
         try:
-            from tensorflow.keras.models import load_model
-            return load_model(model_path)
+            import tensorflow as tf
+            if Path(model_path).is_dir():
+                # SavedModel directory, served through its serving signature
+                return tf.saved_model.load(model_path)
+            return tf.keras.models.load_model(model_path)
         except ImportError:
             raise ImportError("TensorFlow is required for tensorflow models")
         except Exception as e:
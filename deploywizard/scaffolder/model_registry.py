@@ -1,44 +1,63 @@
-import json
 import os
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Dict, Iterator, List, Optional, Any
 from datetime import datetime, timezone
 
+from .registry_storage import JsonRegistryStorage, JournalRegistryStorage, ShardedRegistryStorage, SqliteRegistryStorage
+
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+
 class ModelRegistry:
     """
-    A simple model registry that stores model metadata in a JSON file.
+    A simple model registry that stores model metadata in a JSON file or a SQLite database.
     """
-    def __init__(self, registry_path: str = None):
+    def __init__(self, registry_path: str = None, backend: Optional[str] = None):
         """
         Initialize the model registry.
         
         Args:
-            registry_path: Path to the registry JSON file. If None, checks DEPLOYWIZARD_REGISTRY 
+            registry_path: Path to the registry file. If None, checks DEPLOYWIZARD_REGISTRY 
                           environment variable, otherwise defaults to "registry.json"
+            backend: Storage backend, "json", "journal", "sqlite" or "sharded". If None, checks
+                    DEPLOYWIZARD_REGISTRY_BACKEND environment variable, otherwise picks "sqlite" for
+                    .db/.sqlite paths, "sharded" for directories and .d paths, and "json" for
+                    anything else. SQLite and sharded registries import the JSON registry next to
+                    them (registry.json for registry.db or registry.d) the first time they are
+                    created. A journal registry uses the JSON file as its snapshot and compacts its
+                    journal every DEPLOYWIZARD_REGISTRY_COMPACT_THRESHOLD changes (default 1000).
         """
         # Use provided path, then check environment variable, then default
-        path = registry_path or os.environ.get("DEPLOYWIZARD_REGISTRY", "registry.json")
-        self.registry_path = Path(path).absolute()
-        self._registry = self._load_registry()
-
-    def _load_registry(self) -> Dict[str, Any]:
-        """Load the registry from the JSON file or create a new one if it doesn't exist."""
-        if self.registry_path.exists():
-            try:
-                with open(self.registry_path, 'r') as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                # If the file is corrupted, create a new registry
-                return {"models": {}, "next_id": 1}
-        return {"models": {}, "next_id": 1}
+        path = Path(registry_path or os.environ.get("DEPLOYWIZARD_REGISTRY", "registry.json")).absolute()
+        if not backend:
+            backend = os.environ.get("DEPLOYWIZARD_REGISTRY_BACKEND")
+        if not backend:
+            if path.suffix in SQLITE_SUFFIXES:
+                backend = "sqlite"
+            elif path.suffix == ".d" or path.is_dir():
+                backend = "sharded"
+            else:
+                backend = "json"
 
-    def _save_registry(self) -> None:
-        """Save the registry to the JSON file."""
-        # Create parent directories if they don't exist
-        self.registry_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        with open(self.registry_path, 'w') as f:
-            json.dump(self._registry, f, indent=2)
+        if backend == "json":
+            self.registry_path = path
+            self._storage = JsonRegistryStorage(path)
+        elif backend == "journal":
+            self.registry_path = path
+            self._storage = JournalRegistryStorage(
+                path, compact_threshold=int(os.environ.get("DEPLOYWIZARD_REGISTRY_COMPACT_THRESHOLD", "1000"))
+            )
+        elif backend == "sqlite":
+            self.registry_path = path if path.suffix in SQLITE_SUFFIXES else path.with_suffix(".db")
+            self._storage = SqliteRegistryStorage(
+                self.registry_path, migrate_from=self.registry_path.with_suffix(".json")
+            )
+        elif backend == "sharded":
+            self.registry_path = path if path.suffix == ".d" or path.is_dir() else path.with_suffix(".d")
+            self._storage = ShardedRegistryStorage(
+                self.registry_path, migrate_from=self.registry_path.with_suffix(".json")
+            )
+        else:
+            raise ValueError(f"Unsupported registry backend: {backend}. Use 'json', 'journal', 'sqlite' or 'sharded'")
 
     def register_model(self, name: str, version: str, path: str, framework: str, 
                       description: str = "") -> Dict[str, Any]:
@@ -58,16 +77,7 @@ class ModelRegistry:
         Raises:
             ValueError: If a model with the same name and version already exists
         """
-        # Check if model with same name and version already exists
-        if name in self._registry.get("models", {}) and \
-           version in self._registry["models"][name]:
-            raise ValueError(f"Model '{name}' version '{version}' already exists in registry")
-            
-        model_id = str(self._registry["next_id"])
-        self._registry["next_id"] += 1
-        
-        model_data = {
-            "id": model_id,
+        return self._storage.insert({
             "name": name,
             "version": version,
             "path": str(Path(path).absolute()),
@@ -75,20 +85,7 @@ class ModelRegistry:
             "description": description,
             "created_at": datetime.now(timezone.utc).isoformat(),
             "tags": []
-        }
-        
-        # Initialize models dictionary if it doesn't exist
-        if "models" not in self._registry:
-            self._registry["models"] = {}
-            
-        # Add model to registry
-        if name not in self._registry["models"]:
-            self._registry["models"][name] = {}
-            
-        self._registry["models"][name][version] = model_data
-        self._save_registry()
-        
-        return model_data
+        })
 
     def get_model(self, name: str, version: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """
@@ -96,38 +93,84 @@ class ModelRegistry:
         
         Args:
             name: Name of the model
-            version: Optional version string. If None, returns the latest version.
+            version: Optional version string. If None, returns the latest version,
+                     so "10.0.0" is preferred over "9.0.0" and "1.0.0" over "1.0.0rc1".
             
         Returns:
             Dictionary containing model metadata or None if not found
         """
-        if name not in self._registry.get("models", {}):
-            return None
-            
-        versions = self._registry["models"][name]
-        
-        if not versions:
-            return None
-            
         if version is None:
-            # Return the latest version (alphabetically highest version string)
-            latest_version = sorted(versions.keys(), reverse=True)[0]
-            return versions[latest_version]
-            
-        return versions.get(version)
+            # The storage keeps each model's highest version by PEP 440/semver order
+            version = self._storage.latest(name)
+            if version is None:
+                return None
+
+        return self._storage.get(name, version)
 
-    def list_models(self) -> List[Dict[str, Any]]:
+    def list_models(self, framework: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         List all models in the registry.
         
+        Args:
+            framework: Optional framework to filter by (e.g., "sklearn")
+            
         Returns:
             List of model metadata dictionaries
         """
-        result = []
-        for model_versions in self._registry.get("models", {}).values():
-            for version_data in model_versions.values():
-                result.append(version_data)
-        return result
+        return self._storage.list(framework)
+
+    def iter_models(self, framework: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate over the models in the registry without loading them all at once.
+        
+        Args:
+            framework: Optional framework to filter by (e.g., "sklearn")
+            
+        Returns:
+            Iterator of model metadata dictionaries, in the same order as list_models
+        """
+        return self._storage.iter(framework)
+
+    def update_model(self, name: str, version: Optional[str] = None, new_name: Optional[str] = None,
+                     new_version: Optional[str] = None, path: Optional[str] = None,
+                     framework: Optional[str] = None, description: Optional[str] = None,
+                     tags: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Update the metadata of a registered model version.
+        
+        Args:
+            name: Name of the model
+            version: Optional version string. If None, updates the latest version.
+            new_name: Optional new name for the model version
+            new_version: Optional new version string
+            path: Optional new path to the model file
+            framework: Optional new framework
+            description: Optional new description
+            tags: Optional new list of tags
+            
+        Returns:
+            Dictionary containing the updated model metadata or None if not found
+            
+        Raises:
+            ValueError: If the new name and version already exist in the registry
+        """
+        current = self.get_model(name, version)
+        if current is None:
+            return None
+
+        changes = {
+            "name": new_name,
+            "version": new_version,
+            "path": str(Path(path).absolute()) if path is not None else None,
+            "framework": framework,
+            "description": description,
+            "tags": tags
+        }
+        updated = {**current, **{k: v for k, v in changes.items() if v is not None}}
+        if not self._storage.update(current["name"], current["version"], updated):
+            # Deleted by another process since it was read
+            return None
+        return updated
     
     def delete_model(self, name: str, version: Optional[str] = None) -> bool:
         """
@@ -140,18 +183,4 @@ class ModelRegistry:
         Returns:
             True if any models were deleted, False otherwise
         """
-        if name not in self._registry.get("models", {}):
-            return False
-            
-        if version is None:
-            # Delete all versions of the model
-            del self._registry["models"][name]
-            self._save_registry()
-            return True
-            
-        if version in self._registry["models"][name]:
-            del self._registry["models"][name][version]
-            self._save_registry()
-            return True
-            
-        return False
+        return self._storage.delete(name, version)
@@ -0,0 +1,735 @@
+import bisect
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Any, Tuple
+from urllib.parse import quote
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+try:
+    from packaging.version import InvalidVersion, Version
+except ImportError:
+    Version = None
+
+logger = logging.getLogger(__name__)
+
+# Column order of a model record; get_model/list_models return dicts in this order.
+RECORD_FIELDS = ("id", "name", "version", "path", "framework", "description", "created_at", "tags")
+
+_UNLOADED = object()
+
+def version_key(version: str) -> tuple:
+    """
+    Sort key for version strings, so that "10.0.0" sorts after "9.0.0".
+
+    Versions are compared by PEP 440, which also accepts semver strings such as
+    "1.0.0-rc.1" (a pre-release of 1.0.0). Strings that are not valid versions,
+    or every string when ``packaging`` is not installed, sort before valid
+    versions in natural order ("run2" before "run10").
+    """
+    if Version is not None:
+        try:
+            return (1, Version(version), version)
+        except InvalidVersion:
+            pass
+    natural = tuple((0, int(part), "") if part.isdigit() else (1, 0, part)
+                    for part in re.split(r"(\d+)", version) if part)
+    return (0, natural, version)
+
+@contextmanager
+def _file_lock(path: Path) -> Iterator[None]:
+    """Hold an exclusive advisory lock on a lock file, creating it if needed."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK gives up after ten seconds; keep waiting like flock does
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+def _write_atomic(path: Path, data: str) -> None:
+    """Replace a file through a synced temporary file, so readers see either the old or the new content."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+class RegistryStorage:
+    """
+    Storage backend for ModelRegistry.
+
+    A backend stores one metadata record per (name, version) and hands out the
+    registry-wide model ids. Records are plain dictionaries with RECORD_FIELDS
+    plus any extra keys they were registered or migrated with.
+    """
+    def get(self, name: str, version: str) -> Optional[Dict[str, Any]]:
+        """Return the record for name/version or None."""
+        raise NotImplementedError
+
+    def versions(self, name: str) -> List[str]:
+        """Return every registered version of a model."""
+        raise NotImplementedError
+
+    def latest(self, name: str) -> Optional[str]:
+        """Return the highest version of a model by version_key, or None."""
+        raise NotImplementedError
+
+    def list(self, framework: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Return every record, optionally only those of one framework."""
+        raise NotImplementedError
+
+    def iter(self, framework: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Yield every record, optionally only those of one framework."""
+        yield from self.list(framework)
+
+    def insert(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Store a new record, assigning it the next model id.
+
+        Raises:
+            ValueError: If the name/version is already registered
+        """
+        raise NotImplementedError
+
+    def update(self, name: str, version: str, record: Dict[str, Any]) -> bool:
+        """
+        Replace the record stored under name/version, which may be renamed.
+
+        Returns:
+            False if name/version is not registered
+
+        Raises:
+            ValueError: If the record's new name/version is already registered
+        """
+        raise NotImplementedError
+
+    def delete(self, name: str, version: Optional[str] = None) -> bool:
+        """Delete one version, or every version when version is None."""
+        raise NotImplementedError
+
+class JsonRegistryStorage(RegistryStorage):
+    """
+    Keeps the whole registry in memory and rewrites the JSON file on every change.
+
+    Writers serialize on an advisory lock (``registry.json.lock`` for
+    ``registry.json``), reload the file if another process changed it, and
+    replace it atomically, so concurrent writers never lose each other's
+    changes and readers never see a partially written file.
+    """
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.lock_path = self.path.with_name(self.path.name + ".lock")
+        self._registry = {"models": {}, "next_id": 1}
+        # Per-model (version_key, version) lists in ascending order, built on first use
+        self._index: Optional[Dict[str, List[Tuple[tuple, str]]]] = None
+        self._snapshot_stat = _UNLOADED
+        # Without any registry files there is nothing to load, and no lock file is created
+        if self._files_exist():
+            with _file_lock(self.lock_path):
+                self._refresh()
+        else:
+            self._snapshot_stat = None
+
+    def _files_exist(self) -> bool:
+        return self.path.exists()
+
+    @staticmethod
+    def _stat(path: Path) -> Optional[tuple]:
+        """Identify the current version of a file, or None if it is missing."""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def _refresh(self) -> None:
+        """Reload the registry if the file changed since it was last read or written. Requires the lock."""
+        stat = self._stat(self.path)
+        if stat != self._snapshot_stat:
+            self._registry = self._load_registry()
+            self._index = None
+            self._snapshot_stat = self._stat(self.path)
+
+    def _load_registry(self) -> Dict[str, Any]:
+        """Load the registry from the JSON file or create a new one if it doesn't exist."""
+        # An empty file, e.g. one just created with touch, holds no models yet
+        if self.path.exists() and self.path.stat().st_size > 0:
+            try:
+                with open(self.path, 'r') as f:
+                    return json.load(f)
+            except json.JSONDecodeError:
+                # Keep the corrupted file for inspection and start a new registry
+                aside = self.path.with_name(
+                    f"{self.path.name}.corrupt-{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f')}"
+                )
+                os.replace(self.path, aside)
+                logger.warning(f"Registry file {self.path} is corrupted, moved it to {aside}")
+                return {"models": {}, "next_id": 1}
+        return {"models": {}, "next_id": 1}
+
+    def _save_registry(self) -> None:
+        """Save the registry to the JSON file."""
+        _write_atomic(self.path, json.dumps(self._registry, indent=2))
+        self._snapshot_stat = self._stat(self.path)
+
+    def get(self, name: str, version: str) -> Optional[Dict[str, Any]]:
+        return self._registry.get("models", {}).get(name, {}).get(version)
+
+    def versions(self, name: str) -> List[str]:
+        return list(self._registry.get("models", {}).get(name, {}))
+
+    def latest(self, name: str) -> Optional[str]:
+        if self._index is None:
+            self._index = {
+                model: sorted((version_key(version), version) for version in versions)
+                for model, versions in self._registry.get("models", {}).items()
+            }
+        entries = self._index.get(name)
+        return entries[-1][1] if entries else None
+
+    def list(self, framework: Optional[str] = None) -> List[Dict[str, Any]]:
+        result = []
+        for model_versions in self._registry.get("models", {}).values():
+            for version_data in model_versions.values():
+                if framework is None or version_data.get("framework") == framework:
+                    result.append(version_data)
+        return result
+
+    def insert(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        with _file_lock(self.lock_path):
+            self._refresh()
+            if self.get(record["name"], record["version"]) is not None:
+                raise ValueError(f"Model '{record['name']}' version '{record['version']}' already exists in registry")
+
+            record = {"id": str(self._registry.get("next_id", 1)), **record}
+            self._commit({"op": "insert", "record": record})
+        return record
+
+    def update(self, name: str, version: str, record: Dict[str, Any]) -> bool:
+        with _file_lock(self.lock_path):
+            self._refresh()
+            if self.get(name, version) is None:
+                return False
+            if (record["name"], record["version"]) != (name, version) and \
+               self.get(record["name"], record["version"]) is not None:
+                raise ValueError(f"Model '{record['name']}' version '{record['version']}' already exists in registry")
+
+            self._commit({"op": "update", "name": name, "version": version, "record": record})
+        return True
+
+    def delete(self, name: str, version: Optional[str] = None) -> bool:
+        with _file_lock(self.lock_path):
+            self._refresh()
+            models = self._registry.get("models", {})
+            if name not in models or (version is not None and version not in models[name]):
+                return False
+
+            self._commit({"op": "delete", "name": name, "version": version})
+        return True
+
+    def _apply(self, entry: Dict[str, Any]) -> None:
+        """
+        Apply one change to the in-memory registry.
+
+        Changes only ever set or remove whole records, so applying one that is
+        already reflected in the registry leaves it unchanged.
+        """
+        models = self._registry.setdefault("models", {})
+        if entry["op"] in ("update", "delete"):
+            versions = models.get(entry["name"], {})
+            if entry["version"] is None:
+                versions.clear()
+            elif versions.pop(entry["version"], None) is not None and self._index is not None:
+                index = self._index[entry["name"]]
+                del index[bisect.bisect_left(index, (version_key(entry["version"]), entry["version"]))]
+            if not versions:
+                models.pop(entry["name"], None)
+                if self._index is not None:
+                    self._index.pop(entry["name"], None)
+        if entry["op"] in ("insert", "update"):
+            record = entry["record"]
+            versions = models.setdefault(record["name"], {})
+            if record["version"] not in versions and self._index is not None:
+                bisect.insort(self._index.setdefault(record["name"], []), (version_key(record["version"]), record["version"]))
+            versions[record["version"]] = record
+            if str(record["id"]).isdigit():
+                self._registry["next_id"] = max(self._registry.get("next_id", 1), int(record["id"]) + 1)
+
+    def _commit(self, entry: Dict[str, Any]) -> None:
+        """Apply a change and persist it. Requires the lock."""
+        self._apply(entry)
+        self._save_registry()
+
+class JournalRegistryStorage(JsonRegistryStorage):
+    """
+    Appends every change as one JSON line to a journal next to the JSON registry.
+
+    The JSON registry file serves as the snapshot: on load it is read and the
+    journal (``registry.json.journal`` for ``registry.json``) is replayed on
+    top of it. A change costs one append however large the registry is, plus
+    replaying whatever other processes appended since. Once the journal holds
+    ``compact_threshold`` entries, it is folded into a new snapshot and emptied.
+    """
+    def __init__(self, path: Path, compact_threshold: int = 1000):
+        self.journal_path = Path(path).with_name(Path(path).name + ".journal")
+        self.compact_threshold = compact_threshold
+        self._journal_offset = 0
+        self._journal_entries = 0
+        super().__init__(path)
+
+    def _files_exist(self) -> bool:
+        return self.path.exists() or self.journal_path.exists()
+
+    def _refresh(self) -> None:
+        """Catch up with the snapshot and journal entries written by other processes. Requires the lock."""
+        journal_stat = self._stat(self.journal_path)
+        if self._stat(self.path) != self._snapshot_stat or \
+           (journal_stat is not None and journal_stat[1] < self._journal_offset):
+            # Another process compacted the journal
+            self._registry = self._load_registry()
+            self._index = None
+            self._snapshot_stat = self._stat(self.path)
+            self._journal_offset = 0
+            self._journal_entries = 0
+        self._replay()
+        if self._journal_entries >= self.compact_threshold:
+            self._compact()
+
+    def _replay(self) -> None:
+        """Apply the journal entries past the ones already applied."""
+        try:
+            with open(self.journal_path, 'rb') as f:
+                f.seek(self._journal_offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+
+        # A write cut short by a crash leaves a partial last line; it is skipped
+        # here and cut off by the next append
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            self._apply(entry)
+            self._journal_entries += 1
+        self._journal_offset += end
+
+    def _commit(self, entry: Dict[str, Any]) -> None:
+        self._apply(entry)
+        self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.journal_path, 'ab') as f:
+            if f.tell() > self._journal_offset:
+                f.truncate(self._journal_offset)
+            f.write(json.dumps(entry).encode() + b"\n")
+            self._journal_offset = f.tell()
+        self._journal_entries += 1
+        if self._journal_entries >= self.compact_threshold:
+            self._compact()
+
+    def compact(self) -> None:
+        """Write the current registry as the new snapshot and empty the journal."""
+        with _file_lock(self.lock_path):
+            self._refresh()
+            self._compact()
+
+    def _compact(self) -> None:
+        self._save_registry()
+        # Entries left behind by a crash at this point are replayed harmlessly onto the new snapshot
+        open(self.journal_path, 'w').close()
+        self._journal_offset = 0
+        self._journal_entries = 0
+
+class ShardedRegistryStorage(RegistryStorage):
+    """
+    Stores each model's versions in a file of its own under a registry directory.
+
+    The directory holds ``index.json``, the sorted list of model names;
+    ``next_id.json``, the id counter; and one shard per model under
+    ``models/``, at a path derived from the model name. A shard holds the
+    model's records and its latest version. Looking up a model reads only its
+    shard, listing reads one shard at a time, and a change rewrites the
+    affected shards and the counter, plus the index when a model name appears
+    or disappears. Writers serialize on ``.lock`` and replace files
+    atomically. When the directory is first created, the records of
+    ``migrate_from`` (a JSON registry file) are imported into it.
+    """
+    def __init__(self, path: Path, migrate_from: Optional[Path] = None):
+        self.path = Path(path)
+        self.index_path = self.path / "index.json"
+        self.lock_path = self.path / ".lock"
+        if not self.index_path.exists():
+            with _file_lock(self.lock_path):
+                if not self.index_path.exists():
+                    self._initialize(migrate_from)
+
+    def _initialize(self, migrate_from: Optional[Path]) -> None:
+        """Create the layout, importing a JSON registry if there is one. Requires the lock."""
+        shards: Dict[str, Dict[str, Any]] = {}
+        next_id = 1
+        if migrate_from is not None:
+            migrate_from = Path(migrate_from)
+            if migrate_from.exists() or migrate_from.with_name(migrate_from.name + ".journal").exists():
+                # Pending journal entries are part of the JSON registry's state
+                legacy = JournalRegistryStorage(migrate_from, compact_threshold=float("inf"))
+                for record in legacy.list():
+                    shards.setdefault(record["name"], {})[record["version"]] = record
+                    if str(record["id"]).isdigit():
+                        next_id = max(next_id, int(record["id"]) + 1)
+                next_id = max(next_id, legacy._registry.get("next_id", 1))
+
+        for name, versions in shards.items():
+            self._write_shard(name, versions)
+        _write_atomic(self.path / "next_id.json", json.dumps({"next_id": next_id}))
+        # The index is written last; its presence marks the layout as complete
+        self._write_index(sorted(shards))
+
+    def _shard_path(self, name: str) -> Path:
+        # Names are escaped for the file system; the hash keeps names that differ
+        # only in case apart on case-insensitive file systems and spreads shards
+        # over subdirectories
+        digest = hashlib.sha1(name.encode()).hexdigest()
+        return self.path / "models" / digest[:2] / f"{quote(name, safe='')[:100]}-{digest[:8]}.json"
+
+    @staticmethod
+    def _read_json(path: Path) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except json.JSONDecodeError:
+            logger.warning(f"Registry file {path} is corrupted, ignoring it")
+            return None
+
+    def _read_shard(self, name: str) -> Dict[str, Any]:
+        shard = self._read_json(self._shard_path(name))
+        return shard if shard and shard.get("name") == name else {"name": name, "latest": None, "versions": {}}
+
+    def _write_shard(self, name: str, versions: Dict[str, Any], latest: Optional[str] = None) -> None:
+        """Write a model's shard, or remove it once the model has no versions. Requires the lock."""
+        path = self._shard_path(name)
+        if not versions:
+            path.unlink(missing_ok=True)
+            return
+        if latest not in versions:
+            latest = max(versions, key=version_key)
+        _write_atomic(path, json.dumps({"name": name, "latest": latest, "versions": versions}))
+
+    def _read_index(self) -> List[str]:
+        return (self._read_json(self.index_path) or {}).get("models", [])
+
+    def _write_index(self, names: List[str]) -> None:
+        _write_atomic(self.index_path, json.dumps({"models": names}))
+
+    def get(self, name: str, version: str) -> Optional[Dict[str, Any]]:
+        return self._read_shard(name)["versions"].get(version)
+
+    def versions(self, name: str) -> List[str]:
+        return list(self._read_shard(name)["versions"])
+
+    def latest(self, name: str) -> Optional[str]:
+        return self._read_shard(name)["latest"]
+
+    def iter(self, framework: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        for name in self._read_index():
+            for record in self._read_shard(name)["versions"].values():
+                if framework is None or record.get("framework") == framework:
+                    yield record
+
+    def list(self, framework: Optional[str] = None) -> List[Dict[str, Any]]:
+        return list(self.iter(framework))
+
+    def _add(self, record: Dict[str, Any]) -> None:
+        """Add a record to its model's shard, registering new model names. Requires the lock."""
+        shard = self._read_shard(record["name"])
+        versions, latest = shard["versions"], shard["latest"]
+        versions[record["version"]] = record
+        if latest is None or version_key(record["version"]) > version_key(latest):
+            latest = record["version"]
+        self._write_shard(record["name"], versions, latest)
+        if len(versions) == 1:
+            names = self._read_index()
+            bisect.insort(names, record["name"])
+            self._write_index(names)
+
+    def _remove(self, name: str, version: Optional[str]) -> bool:
+        """Remove one or every version of a model, unregistering emptied names. Requires the lock."""
+        shard = self._read_shard(name)
+        versions = shard["versions"]
+        if not versions or (version is not None and version not in versions):
+            return False
+        if version is None:
+            versions.clear()
+        else:
+            del versions[version]
+        # A latest version that is still present stays the latest
+        self._write_shard(name, versions, shard["latest"])
+        if not versions:
+            names = self._read_index()
+            if name in names:
+                names.remove(name)
+                self._write_index(names)
+        return True
+
+    def insert(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        with _file_lock(self.lock_path):
+            if self.get(record["name"], record["version"]) is not None:
+                raise ValueError(f"Model '{record['name']}' version '{record['version']}' already exists in registry")
+
+            counter_path = self.path / "next_id.json"
+            next_id = (self._read_json(counter_path) or {}).get("next_id", 1)
+            record = {"id": str(next_id), **record}
+            _write_atomic(counter_path, json.dumps({"next_id": next_id + 1}))
+            self._add(record)
+        return record
+
+    def update(self, name: str, version: str, record: Dict[str, Any]) -> bool:
+        with _file_lock(self.lock_path):
+            if self.get(name, version) is None:
+                return False
+            if (record["name"], record["version"]) != (name, version) and \
+               self.get(record["name"], record["version"]) is not None:
+                raise ValueError(f"Model '{record['name']}' version '{record['version']}' already exists in registry")
+
+            if record["name"] == name:
+                versions = self._read_shard(name)["versions"]
+                del versions[version]
+                versions[record["version"]] = record
+                self._write_shard(name, versions)
+            else:
+                self._remove(name, version)
+                self._add(record)
+        return True
+
+    def delete(self, name: str, version: Optional[str] = None) -> bool:
+        with _file_lock(self.lock_path):
+            return self._remove(name, version)
+
+class SqliteRegistryStorage(RegistryStorage):
+    """
+    Stores one row per model version in a SQLite database.
+
+    Lookups go through the (name, version) primary key and the framework and
+    created_at indexes, and every change is a single-row statement, so the cost
+    of a CLI call no longer grows with the size of the registry. The ``latest``
+    table points at each model's highest version by version_key; it is updated
+    in the same transaction as every change. When the
+    database is first created, the records of ``migrate_from`` (a JSON registry
+    file) are imported into it; the JSON file itself is left untouched.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS models (
+            id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            version TEXT NOT NULL,
+            path TEXT NOT NULL,
+            framework TEXT NOT NULL,
+            description TEXT NOT NULL DEFAULT '',
+            created_at TEXT NOT NULL,
+            tags TEXT NOT NULL DEFAULT '[]',
+            extra TEXT NOT NULL DEFAULT '{}',
+            PRIMARY KEY (name, version)
+        );
+        CREATE INDEX IF NOT EXISTS models_framework ON models (framework);
+        CREATE INDEX IF NOT EXISTS models_created_at ON models (created_at);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS latest (
+            name TEXT PRIMARY KEY,
+            version TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, path: Path, migrate_from: Optional[Path] = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit mode: writes open their own BEGIN IMMEDIATE transactions
+        self._conn = sqlite3.connect(str(self.path), isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(self.SCHEMA)
+
+        if migrate_from is not None:
+            migrate_from = Path(migrate_from)
+            if migrate_from.exists() or migrate_from.with_name(migrate_from.name + ".journal").exists():
+                self._migrate(migrate_from)
+        self._index_latest()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        """Run the block in a write transaction, rolling it back on any error."""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def _migrate(self, json_path: Path) -> None:
+        """Import a JSON registry once, unless this database already holds data."""
+        with self._transaction():
+            done = self._conn.execute("SELECT 1 FROM meta WHERE key = 'next_id'").fetchone()
+            if done is None:
+                # Pending journal entries are part of the JSON registry's state
+                legacy = JournalRegistryStorage(json_path, compact_threshold=float("inf"))
+                records = legacy.list()
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO models VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [self._to_row(record) for record in records]
+                )
+                next_id = max([legacy._registry.get("next_id", 1)] + [int(r["id"]) + 1 for r in records])
+                self._set_next_id(next_id)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta VALUES ('migrated_from', ?)", (str(legacy.path),)
+                )
+
+    def _index_latest(self) -> None:
+        """Fill the latest table for databases created before it existed or just migrated."""
+        if self._conn.execute("SELECT 1 FROM meta WHERE key = 'latest_indexed'").fetchone():
+            return
+        with self._transaction():
+            if self._conn.execute("SELECT 1 FROM meta WHERE key = 'latest_indexed'").fetchone() is None:
+                self._conn.execute("DELETE FROM latest")
+                for (name,) in self._conn.execute("SELECT DISTINCT name FROM models").fetchall():
+                    self._refresh_latest(name)
+                self._conn.execute("INSERT INTO meta VALUES ('latest_indexed', '1')")
+
+    def _refresh_latest(self, name: str) -> None:
+        """Recompute one model's latest version from its rows."""
+        versions = self.versions(name)
+        if versions:
+            self._conn.execute("INSERT OR REPLACE INTO latest VALUES (?, ?)", (name, max(versions, key=version_key)))
+        else:
+            self._conn.execute("DELETE FROM latest WHERE name = ?", (name,))
+
+    def _set_next_id(self, next_id: int) -> None:
+        self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('next_id', ?)", (str(next_id),))
+
+    @staticmethod
+    def _to_row(record: Dict[str, Any]) -> tuple:
+        extra = {k: v for k, v in record.items() if k not in RECORD_FIELDS}
+        return (
+            int(record["id"]), record["name"], record["version"], record["path"],
+            record["framework"], record.get("description", ""), record["created_at"],
+            json.dumps(record.get("tags", [])), json.dumps(extra)
+        )
+
+    @staticmethod
+    def _from_row(row: tuple) -> Dict[str, Any]:
+        id_, name, version, path, framework, description, created_at, tags, extra = row
+        return {
+            "id": str(id_),
+            "name": name,
+            "version": version,
+            "path": path,
+            "framework": framework,
+            "description": description,
+            "created_at": created_at,
+            "tags": json.loads(tags),
+            **json.loads(extra)
+        }
+
+    def get(self, name: str, version: str) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute(
+            "SELECT * FROM models WHERE name = ? AND version = ?", (name, version)
+        ).fetchone()
+        return self._from_row(row) if row else None
+
+    def versions(self, name: str) -> List[str]:
+        rows = self._conn.execute("SELECT version FROM models WHERE name = ?", (name,))
+        return [version for (version,) in rows]
+
+    def list(self, framework: Optional[str] = None) -> List[Dict[str, Any]]:
+        if framework is None:
+            rows = self._conn.execute("SELECT * FROM models ORDER BY created_at, id")
+        else:
+            rows = self._conn.execute(
+                "SELECT * FROM models WHERE framework = ? ORDER BY created_at, id", (framework,)
+            )
+        return [self._from_row(row) for row in rows]
+
+    def latest(self, name: str) -> Optional[str]:
+        row = self._conn.execute("SELECT version FROM latest WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def insert(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            with self._transaction():
+                row = self._conn.execute("SELECT value FROM meta WHERE key = 'next_id'").fetchone()
+                record = {"id": row[0] if row else "1", **record}
+                self._conn.execute("INSERT INTO models VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", self._to_row(record))
+                self._set_next_id(int(record["id"]) + 1)
+                latest = self.latest(record["name"])
+                if latest is None or version_key(record["version"]) > version_key(latest):
+                    self._conn.execute("INSERT OR REPLACE INTO latest VALUES (?, ?)", (record["name"], record["version"]))
+        except sqlite3.IntegrityError:
+            raise ValueError(f"Model '{record['name']}' version '{record['version']}' already exists in registry")
+        return record
+
+    def update(self, name: str, version: str, record: Dict[str, Any]) -> bool:
+        try:
+            with self._transaction():
+                cursor = self._conn.execute(
+                    "UPDATE models SET id = ?, name = ?, version = ?, path = ?, framework = ?, "
+                    "description = ?, created_at = ?, tags = ?, extra = ? WHERE name = ? AND version = ?",
+                    self._to_row(record) + (name, version)
+                )
+                if cursor.rowcount and (record["name"], record["version"]) != (name, version):
+                    self._refresh_latest(name)
+                    if record["name"] != name:
+                        self._refresh_latest(record["name"])
+        except sqlite3.IntegrityError:
+            raise ValueError(f"Model '{record['name']}' version '{record['version']}' already exists in registry")
+        return cursor.rowcount > 0
+
+    def delete(self, name: str, version: Optional[str] = None) -> bool:
+        with self._transaction():
+            if version is None:
+                cursor = self._conn.execute("DELETE FROM models WHERE name = ?", (name,))
+                self._conn.execute("DELETE FROM latest WHERE name = ?", (name,))
+            else:
+                cursor = self._conn.execute("DELETE FROM models WHERE name = ? AND version = ?", (name, version))
+                if cursor.rowcount and self.latest(name) == version:
+                    self._refresh_latest(name)
+        return cursor.rowcount > 0
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self._conn.close()
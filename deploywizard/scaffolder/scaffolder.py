@@ -1,5 +1,6 @@
 from pathlib import Path
-from typing import Dict, Optional, Union, List, Any
+import json
+from typing import Dict, Optional, Union, List, Any, Sequence
 import shutil
 import os
 from datetime import datetime
@@ -7,7 +8,9 @@ from datetime import datetime
 from .model_loader import ModelLoader
 from .api_generator import APIGenerator
 from .docker_generator import DockerGenerator
+from .model_exporter import ModelExporter
 from .model_registry import ModelRegistry
+from .registry_storage import version_key
 from .template_utils import get_template_vars
 
 class Scaffolder:
@@ -16,14 +19,16 @@ class Scaffolder:
         Initialize the Scaffolder.
         
         Args:
-            registry_path: Path to the registry JSON file. If None, checks DEPLOYWIZARD_REGISTRY 
-                          environment variable, otherwise defaults to "registry.json"
+            registry_path: Path to the registry file. If None, checks DEPLOYWIZARD_REGISTRY 
+                          environment variable, otherwise defaults to "registry.json". Paths ending
+                          in .db or .sqlite use the SQLite registry backend.
         """
         # Use provided path, then check environment variable, then default
         path = registry_path or os.environ.get("DEPLOYWIZARD_REGISTRY", "registry.json")
         self._model_loader = ModelLoader()
         self._api_generator = APIGenerator()
         self._docker_generator = DockerGenerator()
+        self._model_exporter = ModelExporter()
         self._registry = ModelRegistry(registry_path=path)
 
     def register_model(self, name: str, version: str, model_path: str, 
@@ -71,14 +76,17 @@ class Scaffolder:
         """
         return self._registry.get_model(name, version)
 
-    def list_models(self) -> List[Dict[str, Any]]:
+    def list_models(self, framework: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         List all registered models.
         
+        Args:
+            framework: Optional framework to filter by (e.g., "sklearn")
+            
         Returns:
             List of model metadata dictionaries
         """
-        return self._registry.list_models()
+        return self._registry.list_models(framework)
 
     def generate_project(
         self, 
@@ -87,6 +95,27 @@ class Scaffolder:
         output_dir: str = ".", 
         api_type: str = "fastapi",
         model_class_path: Optional[str] = None,
+        batching: bool = False,
+        max_batch_size: int = 32,
+        max_batch_wait_ms: float = 5.0,
+        max_chunk_size: int = 1024,
+        inference_workers: int = 0,
+        fast_json: bool = False,
+        workers: Optional[int] = None,
+        preload: bool = True,
+        cache_size: int = 0,
+        torchscript: bool = True,
+        sample_shape: Optional[Sequence[int]] = None,
+        runtime: str = "native",
+        onnx_tolerance: float = 1e-4,
+        jit_compile: bool = False,
+        warmup_batch_sizes: Sequence[int] = (1, 8, 32),
+        watch_interval: float = 0,
+        mmap: bool = False,
+        quantize: Optional[str] = None,
+        max_in_flight: int = 0,
+        max_queue: int = 64,
+        request_deadline_ms: float = 10000,
     ) -> None:
         """
         Generate a deployment project for a registered model.
@@ -98,6 +127,49 @@ class Scaffolder:
             api_type: Type of API to generate (e.g., "fastapi", "flask")
             model_class_path: Optional path to a Python file containing model class definition
                             (required for PyTorch state_dict models)
+            batching: Whether the generated API should coalesce concurrent /predict
+                      requests into a single forward pass
+            max_batch_size: Maximum number of rows per micro-batch
+            max_batch_wait_ms: Maximum time in milliseconds a request waits for a batch to fill
+            max_chunk_size: Maximum rows per forward pass for the /predict/batch endpoint
+            inference_workers: Size of the thread pool that runs inference off the event loop
+                               (0 picks min(4, CPU count) at startup)
+            fast_json: Whether to serialize responses with orjson and skip response-model
+                       validation on the prediction endpoints
+            workers: Number of gunicorn worker processes to serve with (0 derives it from the
+                     container's CPU quota). If None, a single uvicorn process is used.
+            preload: Whether gunicorn loads the model once in the master so workers share it
+                     copy-on-write
+            cache_size: Maximum number of /predict results kept in an in-process LRU cache
+                        (0 disables the cache)
+            torchscript: For PyTorch models, trace the model to TorchScript at scaffold time
+                         and serve the traced archive (falls back to eager mode on failure)
+            sample_shape: Shape of one input row used for tracing or ONNX export, without the
+                          batch dimension. Inferred from the model if None.
+            runtime: "native" serves the model with its training framework; "onnx" converts
+                     sklearn and PyTorch models to ONNX and serves them with onnxruntime
+            onnx_tolerance: Maximum difference allowed between ONNX and original outputs;
+                            generation fails if the converted model diverges further
+            jit_compile: For TensorFlow models, compile the serving tf.function with XLA
+            warmup_batch_sizes: Batch sizes scored with synthetic inputs at startup, before the
+                                service accepts traffic (empty disables warmup). The input
+                                width comes from the model, or from sample_shape if given.
+            watch_interval: Seconds between checks of the model file for a new version, which
+                            is then loaded, warmed up and swapped in without downtime (0 = off)
+            mmap: Memory-map sklearn and PyTorch weights at load time so worker processes
+                  share one page-cache copy. The artifact is re-saved uncompressed (sklearn)
+                  or in the zip format (PyTorch), and PyTorch models are served eagerly,
+                  since TorchScript archives cannot be memory-mapped.
+            quantize: "dynamic-int8" quantizes the Linear and LSTM layers of a PyTorch model
+                      to int8 and serves the quantized TorchScript archive. Latency, size and
+                      output drift against the fp32 model are written to
+                      quantization_report.json in the project.
+            max_in_flight: Maximum prediction requests processed at once (0 derives it from
+                           the inference pool, times the batch size when batching)
+            max_queue: Maximum prediction requests waiting for a slot; further requests are
+                       rejected immediately with 503 and Retry-After
+            request_deadline_ms: Time a request may wait before it is dropped without running
+                                 inference (0 = no deadline)
         """
         # Get model info from registry
         model_info = self.get_model_info(model_name, version)
@@ -107,6 +179,16 @@ class Scaffolder:
         model_path = model_info['path']
         framework = model_info['framework']
         
+        if runtime not in ("native", "onnx"):
+            raise ValueError(f"Unsupported runtime: {runtime}. Must be 'native' or 'onnx'")
+        if quantize is not None:
+            if quantize != "dynamic-int8":
+                raise ValueError(f"Unsupported quantization: {quantize}. Must be 'dynamic-int8'")
+            if framework != 'pytorch' or runtime != 'native':
+                raise ValueError("dynamic-int8 quantization is only supported for PyTorch models on the native runtime")
+            if mmap:
+                raise ValueError("Quantized models are served as TorchScript archives, which cannot be memory-mapped")
+        
         # Create output directories
         output_path = Path(output_dir).absolute()
         app_dir = output_path / "app"
@@ -117,8 +199,11 @@ class Scaffolder:
         model_dest = app_dir / model_file.name
         
         try:
-            # Copy the model file
-            shutil.copy2(model_path, str(model_dest))
+            # Copy the model file (or SavedModel directory)
+            if model_file.is_dir():
+                shutil.copytree(model_path, str(model_dest), dirs_exist_ok=True)
+            else:
+                shutil.copy2(model_path, str(model_dest))
             
             # Copy model class file if provided (for PyTorch state_dict)
             if framework == 'pytorch' and model_class_path and Path(model_class_path).exists():
@@ -127,6 +212,86 @@ class Scaffolder:
                 shutil.copy2(model_class_path, str(model_class_dest))
                 print(f"[INFO] Copied model class from {model_class_path} to {model_class_dest}")
             
+            # Convert to ONNX and refuse to deploy a model that does not match the original
+            if runtime == 'onnx':
+                model_class_file = app_dir / "model.py"
+                report = self._model_exporter.export_onnx(
+                    model_path=str(model_dest),
+                    framework=framework,
+                    output_path=str(app_dir / f"{model_dest.stem}.onnx"),
+                    sample_shape=sample_shape,
+                    model_class_path=str(model_class_file) if model_class_file.exists() else None,
+                    tolerance=onnx_tolerance
+                )
+                if report['format'] != 'onnx':
+                    raise ValueError(f"ONNX export refused: {report['reason']}")
+                print(f"[INFO] ONNX export verified: max abs diff {report['max_abs_diff']:.3g} "
+                      f"(tolerance {onnx_tolerance:g})")
+                # Only the converted model ships with the service
+                model_dest.unlink()
+                model_dest = Path(report['path'])
+            
+            # Re-save the artifact in a layout the service can memory-map
+            if mmap and runtime == 'native' and framework in ('sklearn', 'pytorch'):
+                report = self._model_exporter.export_mmap(str(model_dest), framework, str(model_dest))
+                if report['format'] is None:
+                    print(f"[WARNING] {report['reason']}; the service will read the model into memory")
+                else:
+                    action = 'Re-saved' if report['rewritten'] else 'Kept'
+                    print(f"[INFO] {action} {model_dest.name} for memory-mapped loading "
+                          f"({report['size_bytes'] / 2**20:.1f} MiB shared between workers)")
+                if framework == 'pytorch' and torchscript:
+                    print("[INFO] Skipping TorchScript export: TorchScript archives cannot be memory-mapped")
+                    torchscript = False
+            
+            # Quantize once here; the int8 TorchScript archive is served instead of the fp32 model
+            torchscript_model = None
+            # Row shape the exported archive was checked with, used for warmup when not given
+            exported_shape = None
+            if quantize:
+                model_class_file = app_dir / "model.py"
+                report = self._model_exporter.quantize_dynamic(
+                    model_path=str(model_dest),
+                    output_path=str(app_dir / f"{model_dest.stem}.int8.torchscript.pt"),
+                    sample_shape=sample_shape,
+                    model_class_path=str(model_class_file) if model_class_file.exists() else None
+                )
+                if report['format'] is None:
+                    raise ValueError(f"Quantization failed: {report['reason']}")
+                with open(output_path / "quantization_report.json", 'w') as f:
+                    json.dump(report, f, indent=2)
+                torchscript_model = Path(report['path']).name
+                exported_shape = report['input_shape'][1:]
+                latency, size, drift = report['latency_ms'], report['size_bytes'], report['drift']
+                print(f"[INFO] Quantized {report['quantized_layers']} layer(s) to int8 -> {torchscript_model}")
+                print(f"[INFO] Latency p50/p99: fp32 {latency['fp32']['p50']:.3f}/{latency['fp32']['p99']:.3f}ms, "
+                      f"int8 {latency['int8']['p50']:.3f}/{latency['int8']['p99']:.3f}ms ({report['speedup']}x)")
+                print(f"[INFO] Weights: fp32 {size['fp32'] / 2**20:.2f} MiB, int8 {size['int8'] / 2**20:.2f} MiB; "
+                      f"max abs output drift {drift['max_abs_diff']:.3g}"
+                      + (f", top-1 agreement {drift['top1_agreement']:.1%}" if 'top1_agreement' in drift else ""))
+                for warning in report['warnings']:
+                    print(f"[WARNING] Quantization: {warning}")
+            
+            # Trace PyTorch models once here so the service skips eager loading at startup
+            if framework == 'pytorch' and torchscript and runtime == 'native' and not quantize:
+                model_class_file = app_dir / "model.py"
+                report = self._model_exporter.export_torchscript(
+                    model_path=str(model_dest),
+                    output_path=str(app_dir / f"{model_dest.stem}.torchscript.pt"),
+                    sample_shape=sample_shape,
+                    model_class_path=str(model_class_file) if model_class_file.exists() else None
+                )
+                if report['format'] == 'torchscript':
+                    torchscript_model = Path(report['path']).name
+                    exported_shape = report['input_shape'][1:]
+                    method = 'traced' if report['method'] == 'trace' else 'scripted'
+                    print(f"[INFO] TorchScript export: {method} with input shape "
+                          f"{tuple(report['input_shape'])} -> {torchscript_model}")
+                    for warning in report['warnings']:
+                        print(f"[WARNING] TorchScript export: {warning}")
+                else:
+                    print(f"[WARNING] TorchScript export failed, the service will run the eager model: {report['reason']}")
+            
             # Generate API code - pass the parent directory, not the app_dir
             self._api_generator.generate(
                 model_path=str(model_dest),
@@ -137,6 +302,24 @@ class Scaffolder:
                     'model_name': model_dest.name,
                     'framework': framework,
                     'model_class_available': framework == 'pytorch' and model_class_path and Path(model_class_path).exists(),
+                    'batching': batching,
+                    'max_batch_size': max_batch_size,
+                    'max_batch_wait_ms': max_batch_wait_ms,
+                    'max_chunk_size': max_chunk_size,
+                    'inference_workers': inference_workers,
+                    'fast_json': fast_json,
+                    'workers': workers,
+                    'cache_size': cache_size,
+                    'torchscript_model': torchscript_model,
+                    'runtime': runtime,
+                    'jit_compile': jit_compile,
+                    'warmup_batch_sizes': ",".join(str(size) for size in warmup_batch_sizes),
+                    'warmup_input_shape': ",".join(str(dim) for dim in sample_shape or exported_shape or ()),
+                    'watch_interval': watch_interval,
+                    'mmap': mmap,
+                    'max_in_flight': max_in_flight,
+                    'max_queue': max_queue,
+                    'request_deadline_ms': request_deadline_ms,
                 }
             )
             
@@ -146,11 +329,13 @@ class Scaffolder:
                 template_vars={
                     'model_name': model_dest.name,
                     'framework': framework,
+                    'workers': workers,
+                    'preload': preload,
                 }
             )
             
             # Generate README
-            self._generate_readme(str(output_path))
+            self._generate_readme(str(output_path), multi_worker=workers is not None)
             
             print("[SUCCESS] Project generated successfully in", output_dir)
             
@@ -161,7 +346,104 @@ class Scaffolder:
                 shutil.rmtree(output_path)
             raise
 
-    def _generate_readme(self, output_dir: str) -> None:
+    def generate_multi_project(
+        self,
+        models: Optional[Sequence[str]] = None,
+        output_dir: str = ".",
+        memory_budget_mb: float = 1024,
+        inference_workers: int = 0,
+    ) -> List[Dict[str, Any]]:
+        """
+        Generate one deployment project that serves many registered models.
+        
+        Every model version is copied to app/models/<name>/<version>/ and listed in
+        app/models.json. The service loads models on first use under
+        /models/{name}/{version}/predict and evicts the least recently used ones once
+        their estimated memory exceeds the budget.
+        
+        Args:
+            models: Models to host, as "name" (every version) or "name:version". If None,
+                   every registered model version is hosted.
+            output_dir: Directory to generate the project in
+            memory_budget_mb: Memory budget for loaded models, in MiB
+            inference_workers: Size of the thread pool that runs inference off the event loop
+                               (0 picks min(4, CPU count) at startup)
+        
+        Returns:
+            The manifest entries of the hosted models
+        """
+        registered = self.list_models()
+        if models is None:
+            selected = registered
+        else:
+            selected = []
+            for item in models:
+                name, _, version = item.partition(":")
+                matches = [m for m in registered if m['name'] == name and (not version or m['version'] == version)]
+                if not matches:
+                    raise ValueError(f"Model '{item}' not found in registry.")
+                selected.extend(m for m in matches if m not in selected)
+        if not selected:
+            raise ValueError("No models to deploy.")
+        
+        output_path = Path(output_dir).absolute()
+        app_dir = output_path / "app"
+        app_dir.mkdir(parents=True, exist_ok=True)
+        
+        try:
+            manifest = {"models": [], "latest": {}}
+            for info in selected:
+                source = Path(info['path'])
+                dest_dir = app_dir / "models" / info['name'] / info['version']
+                dest_dir.mkdir(parents=True, exist_ok=True)
+                if source.is_dir():
+                    shutil.copytree(source, dest_dir / source.name, dirs_exist_ok=True)
+                else:
+                    shutil.copy2(source, dest_dir / source.name)
+                entry = {
+                    'name': info['name'],
+                    'version': info['version'],
+                    'framework': info['framework'],
+                    'path': (dest_dir / source.name).relative_to(app_dir).as_posix(),
+                }
+                # State dict models need their class definition, registered next to the weights
+                model_class = source.parent / "model.py"
+                if info['framework'] == 'pytorch' and model_class.exists():
+                    shutil.copy2(model_class, dest_dir / "model.py")
+                    entry['model_class'] = (dest_dir / "model.py").relative_to(app_dir).as_posix()
+                manifest['models'].append(entry)
+            
+            for name in sorted({entry['name'] for entry in manifest['models']}):
+                latest = self.get_model_info(name)
+                hosted = [entry['version'] for entry in manifest['models'] if entry['name'] == name]
+                manifest['latest'][name] = latest['version'] if latest and latest['version'] in hosted else max(hosted, key=version_key)
+            
+            (app_dir / "models.json").write_text(json.dumps(manifest, indent=2))
+            
+            self._api_generator.generate_multi(
+                frameworks=[entry['framework'] for entry in manifest['models']],
+                output_dir=str(output_path),
+                template_vars={
+                    'memory_budget_mb': memory_budget_mb,
+                    'inference_workers': inference_workers,
+                }
+            )
+            self._docker_generator.generate(
+                output_dir=str(output_path),
+                template_vars={'model_name': 'models.json'}
+            )
+            self._generate_readme(str(output_path), multi_model=True)
+            
+            print(f"[SUCCESS] Multi-model project with {len(manifest['models'])} model version(s) generated in", output_dir)
+            return manifest['models']
+        
+        except Exception as e:
+            print("[ERROR] Failed to generate project:", str(e))
+            if output_path.exists():
+                shutil.rmtree(output_path)
+            raise
+
+    def _generate_readme(self, output_dir: str, multi_worker: bool = False, multi_model: bool = False) -> None:
         """Generate a basic README file for the project."""
         readme_path = Path(output_dir) / "README.md"
         content = """# ML Model Deployment
@@ -188,6 +470,60 @@ docker run -p 8000:8000 model-api
 
 ## API Endpoints
 
-- POST /predict - Make predictions using the model
+"""
+        if multi_model:
+            content += """- GET /models - List the hosted models (models.json) and whether each is loaded
+- POST /models/{name}/{version}/predict - Predict one row; use "latest" as the version for the newest
+- POST /models/{name}/{version}/predict/batch - Predict a 2-D matrix of rows in one call
+- GET /admin/models - Per-model load time, memory estimate, hits and evictions (requires ADMIN_TOKEN)
+- GET /live, GET /ready - Liveness and readiness probes
+
+Models are loaded on first use and evicted least recently used first once their estimated
+memory exceeds `MODEL_MEMORY_BUDGET_MB`.
+"""
+        else:
+            content += """- POST /predict - Make predictions using the model
+- POST /predict/batch - Make predictions for a 2-D matrix of rows in one call
+- POST /predict/stream - Score newline-delimited JSON rows and stream predictions back
+- GET /metrics - Request, latency and batching metrics in Prometheus text format
+- GET /live - Liveness probe, answers while the model is still loading
+- GET /ready - Readiness probe, 503 until the model is loaded and warmed up
+- POST /admin/reload - Load a new model file at MODEL_PATH and swap it in (requires ADMIN_TOKEN)
+"""
+        if multi_worker:
+            content += """
+## Multi-Worker Serving
+
+The container runs gunicorn with uvicorn workers (see `app/gunicorn.conf.py`). The worker
+count defaults to the container's CPU quota and can be set with `WEB_CONCURRENCY`.
+
+With preload enabled (`GUNICORN_PRELOAD=true`, the default) the model is loaded once in the
+gunicorn master before the workers are forked, so its memory is shared copy-on-write. With
+`GUNICORN_PRELOAD=false` every worker loads its own copy.
+
+### Measuring Memory per Worker
+
+RSS counts shared pages in every process, so compare PSS (proportional set size), which
+divides each shared page between the processes that map it:
+
+```bash
+docker exec <container> python -c "
+import glob
+for status in glob.glob('/proc/[0-9]*/cmdline'):
+    pid = status.split('/')[2]
+    if b'gunicorn' not in open(status, 'rb').read():
+        continue
+    fields = dict(line.split(':', 1) for line in open(f'/proc/{pid}/smaps_rollup') if ':' in line)
+    print(pid, 'Rss', fields['Rss'].strip(), 'Pss', fields['Pss'].strip())
+"
+```
+
+Run it once with the default settings and once with `-e GUNICORN_PRELOAD=false`, under the
+same load, and record the per-worker PSS for this model:
+
+| Preload | Workers | PSS per worker | Total PSS |
+|---------|---------|----------------|-----------|
+| on      |         |                |           |
+| off     |         |                |           |
 """
         readme_path.write_text(content)
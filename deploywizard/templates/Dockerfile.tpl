@@ -68,4 +68,9 @@ USER appuser
 EXPOSE 8000
 
 # Command to run the application
+{% if workers is not none %}
+# Pre-forked uvicorn workers managed by gunicorn, see gunicorn.conf.py
+CMD ["gunicorn", "main:app", "--config", "gunicorn.conf.py"]
+{% else %}
 CMD ["uvicorn", "main:app", "--host", "0.0.0.0", "--port", "8000"]
+{% endif %}
@@ -1,24 +1,113 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any, Union
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple, Union
 import numpy as np
+import asyncio
+import bisect
+import contextvars
+import hashlib
+import hmac
+import io
+import json
 import os
 import logging
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from pathlib import Path
 
+try:
+    import msgpack
+except ImportError:  # msgpack request bodies are rejected with 415 without it
+    msgpack = None
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run startup and shutdown hooks around the application's lifetime."""
+    await _on_startup()
+    try:
+        yield
+    finally:
+        await _on_shutdown()
+
+{% if fast_json %}
+import orjson
+
+class ORJSONResponse(Response):
+    """
+    JSON response rendered with orjson, which serializes numpy arrays and scalars natively.
+    
+    Uses the same options as ``fastapi.responses.ORJSONResponse``, which recent FastAPI
+    releases deprecate with a warning on every response it renders.
+    """
+    media_type = "application/json"
+    
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+{% else %}
+app = FastAPI(lifespan=lifespan)
+{% endif %}
 
 # Get model path from environment variable or use a default for local development
 MODEL_PATH = os.getenv("MODEL_PATH")
 
+# Micro-batching configuration (can be overridden with environment variables)
+ENABLE_BATCHING = os.getenv("ENABLE_BATCHING", "{{ 'true' if batching else 'false' }}").lower() in ("1", "true", "yes")
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "{{ max_batch_size | default(32) }}"))
+MAX_BATCH_WAIT_MS = float(os.getenv("MAX_BATCH_WAIT_MS", "{{ max_batch_wait_ms | default(5) }}"))
+
+# Maximum rows per forward pass for /predict/batch, bounds peak memory for large requests
+MAX_CHUNK_SIZE = int(os.getenv("MAX_CHUNK_SIZE", "{{ max_chunk_size | default(1024) }}"))
+
+# Rows scored per forward pass by /predict/stream
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "{{ stream_chunk_size | default(256) }}"))
+STREAM_MAX_LINE_BYTES = int(os.getenv("STREAM_MAX_LINE_BYTES", "{{ stream_max_line_bytes | default(1048576) }}"))
+
+# Number of threads that run inference off the event loop; this is the maximum
+# number of concurrent forward passes. 0 means min(4, CPU count).
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "{{ inference_workers | default(0) }}")) or min(4, os.cpu_count() or 1)
+
+# Admission control for the prediction endpoints: at most MAX_IN_FLIGHT requests are
+# processed at once and at most MAX_QUEUE wait for a slot; later requests are shed at once.
+# 0 in-flight derives the limit from the inference pool (times the batch size when batching).
+MAX_IN_FLIGHT = int(os.getenv("MAX_IN_FLIGHT", "{{ max_in_flight | default(0) }}")) or INFERENCE_WORKERS * (
+    MAX_BATCH_SIZE if ENABLE_BATCHING else 2
+)
+MAX_QUEUE = int(os.getenv("MAX_QUEUE", "{{ max_queue | default(64) }}"))
+# Time a request may spend queued before it is dropped without running inference, 0 = no deadline
+REQUEST_DEADLINE_MS = float(os.getenv("REQUEST_DEADLINE_MS", "{{ request_deadline_ms | default(10000) }}"))
+# Status code for shed requests: 503 (server overloaded) or 429 (too many requests)
+SHED_STATUS_CODE = int(os.getenv("SHED_STATUS_CODE", "{{ shed_status_code | default(503) }}"))
+
+# Prediction cache for repeated /predict inputs; 0 entries disables it
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "{{ cache_size | default(0) }}"))
+PREDICTION_CACHE_BYTES = int(os.getenv("PREDICTION_CACHE_BYTES", "{{ cache_bytes | default(67108864) }}"))
+
+# Warmup inferences run at startup, before the app accepts traffic ("" disables warmup)
+WARMUP_BATCH_SIZES = [int(size) for size in os.getenv("WARMUP_BATCH_SIZES", "{{ warmup_batch_sizes | default('1,8,32') }}").split(",") if size.strip()]
+WARMUP_ITERATIONS = int(os.getenv("WARMUP_ITERATIONS", "{{ warmup_iterations | default(2) }}"))
+# Shape of one input row used for warmup, e.g. "4" or "3,224,224"; inferred from the model if empty
+WARMUP_INPUT_SHAPE = os.getenv("WARMUP_INPUT_SHAPE", "{{ warmup_input_shape | default('') }}")
+
+# Memory-map model weights read-only, so worker processes share one page-cache copy of
+# them instead of each holding a private one (uncompressed joblib and zip torch.save files)
+MODEL_MMAP = os.getenv("MODEL_MMAP", "{{ 'true' if mmap else 'false' }}").lower() in ("1", "true", "yes")
+
 # Framework-specific imports and model loading
 model: Any = None
 model_loaded = False
 model_error = None
+# Incremented whenever a model is loaded; caches keyed on model output compare against it
+model_generation = 0
 
 # Define possible model paths to check
 model_name = "{{ model_name }}"
@@ -54,17 +143,22 @@ if not os.path.exists(MODEL_PATH):
     if os.getenv("ENV") == "production":
         raise FileNotFoundError(error_msg)
 
-{% if framework == 'sklearn' %}
+{% if runtime == 'onnx' %}
+import onnxruntime as ort
+
+def _load_model_from(path: str) -> Any:
+    """Create an ONNX Runtime session; the model was converted and checked against the original at deploy time."""
+    session_options = ort.SessionOptions()
+    session_options.intra_op_num_threads = int(os.getenv("ONNX_INTRA_OP_THREADS", "0"))  # 0 = onnxruntime default
+    return ort.InferenceSession(path, sess_options=session_options, providers=["CPUExecutionProvider"])
+
+{% elif framework == 'sklearn' %}
 import joblib
-try:
-    model = joblib.load(MODEL_PATH)
-    model_loaded = True
-    logger.info(f"Successfully loaded model from {MODEL_PATH}")
-except Exception as e:
-    model_error = str(e)
-    logger.error(f"Error loading model: {model_error}")
-    if os.getenv("ENV") == "production":
-        raise
+
+def _load_model_from(path: str) -> Any:
+    """Load a pickled scikit-learn model, with its numpy arrays memory-mapped if MODEL_MMAP is set."""
+    # joblib ignores mmap_mode (with a warning) for compressed files
+    return joblib.load(path, mmap_mode="r" if MODEL_MMAP else None)
 
 {% elif framework == 'pytorch' %}
 import torch
@@ -77,117 +171,288 @@ from pathlib import Path
 device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
 logger.info(f"Using device: {device}")
 
-# Try to load the model
-try:
-    model = None
-    model_loaded = False
-    model_error = None
-    
+# Tensors can only stay memory-mapped on the CPU; moving them to a GPU copies them anyway
+TORCH_MMAP = MODEL_MMAP and device.type == "cpu"
+
+def _torch_load(path: str) -> Any:
+    """Load a pickled model or checkpoint; PyTorch 2.6+ defaults to weights_only=True, which rejects nn.Module objects."""
+    if TORCH_MMAP:
+        try:
+            return torch.load(path, map_location=device, weights_only=False, mmap=True)
+        except TypeError:  # PyTorch < 2.1 has no mmap argument
+            logger.warning("This PyTorch version cannot memory-map checkpoints, loading it into memory")
+        except RuntimeError as e:  # files written with _use_new_zipfile_serialization=False
+            logger.warning(f"Could not memory-map {path}, loading it into memory: {str(e)}")
+    try:
+        return torch.load(path, map_location=device, weights_only=False)
+    except TypeError:  # PyTorch < 1.13 has no weights_only argument
+        return torch.load(path, map_location=device)
+
+def _load_state_dict(module: Any, state_dict: Dict[str, Any]) -> None:
+    """Load weights into a freshly built module, keeping memory-mapped tensors instead of copying them."""
+    if TORCH_MMAP:
+        try:
+            module.load_state_dict(state_dict, assign=True)
+            return
+        except TypeError:  # PyTorch < 2.1 has no assign argument
+            pass
+    module.load_state_dict(state_dict)
+{% if torchscript_model %}
+
+# TorchScript archive traced at scaffold time; loading it needs neither model.py nor the fallback chain
+TORCHSCRIPT_PATH = os.getenv("TORCHSCRIPT_PATH", os.path.join(os.path.dirname(MODEL_PATH), "{{ torchscript_model }}"))
+{% endif %}
+
+def _load_model_from(path: str) -> Any:
+    """
+    Load a PyTorch model: the TorchScript archive if one was exported, otherwise a full
+    pickled model, or a state dict loaded into the class defined in model.py next to it.
+    """
     # Debug: Print model path and check if file exists
-    logger.info(f"Looking for model at: {MODEL_PATH}")
-    logger.info(f"File exists: {os.path.exists(MODEL_PATH)}")
-    if os.path.exists(MODEL_PATH):
-        logger.info(f"File size: {os.path.getsize(MODEL_PATH) / (1024*1024):.2f} MB")
+    logger.info(f"Looking for model at: {path}")
+    logger.info(f"File exists: {os.path.exists(path)}")
+    if os.path.exists(path):
+        logger.info(f"File size: {os.path.getsize(path) / (1024*1024):.2f} MB")
+    
+    {% if torchscript_model %}
+    if os.path.exists(TORCHSCRIPT_PATH) and os.path.getmtime(path) > os.path.getmtime(TORCHSCRIPT_PATH):
+        # A retrained model was dropped in place, the archive traced at deploy time is stale
+        logger.warning(f"TorchScript archive {TORCHSCRIPT_PATH} is older than {path}, loading the model file instead")
+    elif os.path.exists(TORCHSCRIPT_PATH):
+        try:
+            loaded = torch.jit.load(TORCHSCRIPT_PATH, map_location=device)
+            loaded.eval()
+            logger.info(f"Successfully loaded TorchScript model from {TORCHSCRIPT_PATH}")
+            return loaded
+        except Exception as e:
+            logger.warning(f"Failed to load TorchScript model, falling back to eager loading: {str(e)}")
+    
+    {% endif %}
+    last_error = None
     
     # Strategy 1: Try loading as a full PyTorch model
     try:
         logger.info("Attempting to load as full PyTorch model...")
-        model = torch.load(MODEL_PATH, map_location=device)
-        if isinstance(model, torch.nn.Module):
-            model = model.to(device)
-            model.eval()
-            model_loaded = True
+        loaded = _torch_load(path)
+        if isinstance(loaded, torch.nn.Module):
+            loaded = loaded.to(device)
+            loaded.eval()
             logger.info("Successfully loaded as a full PyTorch model")
+            return loaded
     except Exception as e:
+        last_error = e
         logger.warning(f"Failed to load as full model: {str(e)}")
     
     # Strategy 2: Try loading with model class from model.py
-    if not model_loaded:
-        try:
-            logger.info("Attempting to load with model class...")
-            model_dir = Path(MODEL_PATH).parent
-            model_file = model_dir / "model.py"
+    try:
+        logger.info("Attempting to load with model class...")
+        model_dir = Path(path).parent
+        model_file = model_dir / "model.py"
+        
+        logger.info(f"Looking for model class in: {model_file}")
+        
+        if model_file.exists():
+            # Import the model class
+            spec = importlib.util.spec_from_file_location("model", str(model_file))
+            model_module = importlib.util.module_from_spec(spec)
+            sys.modules["model"] = model_module
+            spec.loader.exec_module(model_module)
             
-            logger.info(f"Looking for model class in: {model_file}")
+            # Find the model class (look for a class that inherits from nn.Module)
+            model_class = None
+            for name, obj in model_module.__dict__.items():
+                if (isinstance(obj, type) and 
+                    issubclass(obj, torch.nn.Module) and 
+                    obj != torch.nn.Module):
+                    model_class = obj
+                    break
             
-            if model_file.exists():
-                # Import the model class
-                spec = importlib.util.spec_from_file_location("model", str(model_file))
-                model_module = importlib.util.module_from_spec(spec)
-                sys.modules["model"] = model_module
-                spec.loader.exec_module(model_module)
-                
-                # Find the model class (look for a class that inherits from nn.Module)
-                model_class = None
-                for name, obj in model_module.__dict__.items():
-                    if (isinstance(obj, type) and 
-                        issubclass(obj, torch.nn.Module) and 
-                        obj != torch.nn.Module):
-                        model_class = obj
-                        break
-                
-                if model_class is None:
-                    raise ValueError("No PyTorch model class found in model.py")
-                
-                logger.info(f"Found model class: {model_class.__name__}")
-                
-                # Load the model state
-                checkpoint = torch.load(MODEL_PATH, map_location=device)
-                
-                # Handle different checkpoint formats
-                if isinstance(checkpoint, dict) and 'state_dict' in checkpoint:
-                    state_dict = checkpoint['state_dict']
-                    # Create model with parameters from checkpoint if available
-                    if hasattr(checkpoint, 'input_size') and hasattr(checkpoint, 'output_size'):
-                        model = model_class(
-                            input_size=checkpoint['input_size'],
-                            output_size=checkpoint['output_size']
-                        ).to(device)
-                    else:
-                        model = model_class().to(device)
-                    
-                    model.load_state_dict(state_dict)
-                    model.eval()
-                    model_loaded = True
-                    logger.info("Successfully loaded model using provided model class and state dict")
-                else:
-                    # Assume the file is just the state dict
-                    model = model_class().to(device)
-                    model.load_state_dict(checkpoint)
-                    model.eval()
-                    model_loaded = True
-                    logger.info("Successfully loaded model using provided model class with direct state dict")
+            if model_class is None:
+                raise ValueError("No PyTorch model class found in model.py")
             
-        except Exception as e:
-            logger.warning(f"Failed to load with model class: {str(e)}", exc_info=True)
-    
-    if not model_loaded:
-        raise ValueError(
-            "Failed to load model. Please ensure:\n"
-            "1. The model file is a valid PyTorch model or state dictionary\n"
-            "2. A model.py file with the model class is in the same directory\n"
-            f"Error details: {str(e) if 'e' in locals() else 'Unknown error'}"
-        )
-
-except Exception as e:
-    model_error = str(e)
-    logger.error(f"Error loading PyTorch model: {model_error}", exc_info=True)
-    if os.getenv("ENV") == "production":
-        raise
+            logger.info(f"Found model class: {model_class.__name__}")
+            
+            # Load the model state
+            checkpoint = _torch_load(path)
+            
+            # Handle different checkpoint formats
+            if isinstance(checkpoint, dict) and 'state_dict' in checkpoint:
+                state_dict = checkpoint['state_dict']
+                # Create model with parameters from checkpoint if available
+                if hasattr(checkpoint, 'input_size') and hasattr(checkpoint, 'output_size'):
+                    loaded = model_class(
+                        input_size=checkpoint['input_size'],
+                        output_size=checkpoint['output_size']
+                    ).to(device)
+                else:
+                    loaded = model_class().to(device)
+                
+                _load_state_dict(loaded, state_dict)
+                loaded.eval()
+                logger.info("Successfully loaded model using provided model class and state dict")
+            else:
+                # Assume the file is just the state dict
+                loaded = model_class().to(device)
+                _load_state_dict(loaded, checkpoint)
+                loaded.eval()
+                logger.info("Successfully loaded model using provided model class with direct state dict")
+            return loaded
+        
+    except Exception as e:
+        last_error = e
+        logger.warning(f"Failed to load with model class: {str(e)}", exc_info=True)
+    
+    raise ValueError(
+        "Failed to load model. Please ensure:\n"
+        "1. The model file is a valid PyTorch model or state dictionary\n"
+        "2. A model.py file with the model class is in the same directory\n"
+        f"Error details: {str(last_error) if last_error else 'Unknown error'}"
+    )
 
 {% elif framework == 'tensorflow' %}
 import tensorflow as tf
-try:
-    model = tf.keras.models.load_model(MODEL_PATH)
-    model_loaded = True
-    logger.info("Successfully loaded TensorFlow model")
-except Exception as e:
-    model_error = str(e)
-    logger.error(f"Error loading TensorFlow model: {model_error}")
-    if os.getenv("ENV") == "production":
-        raise
+
+# Compile the serving function with XLA (override with TF_JIT_COMPILE)
+TF_JIT_COMPILE = os.getenv("TF_JIT_COMPILE", "{{ 'true' if jit_compile | default(false) else 'false' }}").lower() in ("1", "true", "yes")
+# Signature used when MODEL_PATH is a SavedModel directory
+TF_SERVING_SIGNATURE = os.getenv("TF_SERVING_SIGNATURE", "serving_default")
+
+def _build_serving_fn(loaded: Any):
+    """
+    Return a function that maps a 2-D float batch to the model's output tensor.
+    
+    Keras models are wrapped in a tf.function with a fixed input signature, so the graph
+    is traced once for any batch size and called directly, without the data pipeline
+    that Model.predict builds on every call. SavedModels are called through their
+    serving signature, which is already a concrete graph function.
+    """
+    if hasattr(loaded, 'signatures') and not isinstance(loaded, tf.keras.Model):
+        signature = loaded.signatures[TF_SERVING_SIGNATURE]
+        input_name, input_spec = next(iter(signature.structured_input_signature[1].items()))
+        output_name = sorted(signature.structured_outputs)[0]
+        
+        def serve(features):
+            return signature(**{input_name: tf.convert_to_tensor(features, dtype=input_spec.dtype)})[output_name]
+        return serve
+    
+    try:
+        row_shape = list(loaded.inputs[0].shape[1:])
+    except (AttributeError, IndexError, TypeError, ValueError):  # Subclassed models without an Input layer
+        row_shape = None
+    input_signature = [tf.TensorSpec([None] + row_shape if row_shape is not None else None, tf.float32)]
+    
+    @tf.function(input_signature=input_signature, jit_compile=TF_JIT_COMPILE)
+    def compiled(features):
+        return loaded(features, training=False)
+    
+    if row_shape is not None:
+        compiled.get_concrete_function()  # Trace at load time rather than on the first request
+    
+    def serve(features):
+        return compiled(tf.convert_to_tensor(features, dtype=tf.float32))
+    return serve
+
+# Serving functions of the most recently used models, keyed by id(model). Two are kept so
+# requests still running on the old model during a reload do not retrace it.
+_serving: "OrderedDict[int, Tuple[Any, Any]]" = OrderedDict()
+
+def _serving_fn(loaded: Any):
+    entry = _serving.get(id(loaded))
+    if entry is None or entry[0] is not loaded:
+        entry = _serving[id(loaded)] = (loaded, _build_serving_fn(loaded))
+        while len(_serving) > 2:
+            _serving.popitem(last=False)
+    _serving.move_to_end(id(loaded))
+    return entry[1]
+
+def _load_model_from(path: str) -> Any:
+    """Load a Keras model or SavedModel directory and build its serving function."""
+    if os.path.isdir(path):
+        # SavedModel directory, e.g. exported with tf.saved_model.save or model.export
+        loaded = tf.saved_model.load(path)
+    else:
+        loaded = tf.keras.models.load_model(path)
+    _serving_fn(loaded)
+    logger.info(f"Successfully loaded TensorFlow model (jit_compile={TF_JIT_COMPILE})")
+    return loaded
 {% endif %}
 
+# "sync" loads the model while main.py is imported, which a preloading gunicorn master needs
+# so its workers share the model; "background" starts the server first and loads it in a
+# background task, so the port is bound immediately and /live answers during the load
+MODEL_LOAD_MODE = os.getenv("MODEL_LOAD_MODE", "{{ model_load_mode | default('background') }}").lower()
+# "loading" -> "warming" -> "ready", or "failed" if the model could not be loaded
+model_state = "loading"
+model_load_seconds: Optional[float] = None
+
+def _memory_stats() -> Dict[str, Optional[int]]:
+    """Return the current and peak resident set size in bytes, where /proc is available."""
+    stats: Dict[str, Optional[int]] = {"rss_bytes": None, "peak_rss_bytes": None}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    stats["rss_bytes"] = int(line.split()[1]) * 1024
+                elif line.startswith("VmHWM:"):
+                    stats["peak_rss_bytes"] = int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return stats
+
+def _memory_sharing() -> Dict[str, Optional[int]]:
+    """
+    Split this process's resident memory into pages shared with other processes and private ones.
+    
+    ``shared_bytes`` covers pages that other processes map too, such as memory-mapped model
+    weights in the page cache. ``pss_bytes`` divides shared pages evenly between the processes
+    mapping them, so it sums to the real footprint across workers. Reading smaps_rollup walks
+    every mapping, so this is only used for reporting.
+    """
+    stats: Dict[str, Optional[int]] = {"pss_bytes": None, "shared_bytes": None, "private_bytes": None}
+    try:
+        rollup: Dict[str, int] = {}
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if value.strip().endswith("kB"):
+                    rollup[key] = int(value.split()[0]) * 1024
+        stats["pss_bytes"] = rollup["Pss"]
+        stats["shared_bytes"] = rollup["Shared_Clean"] + rollup["Shared_Dirty"]
+        stats["private_bytes"] = rollup["Private_Clean"] + rollup["Private_Dirty"]
+    except (OSError, ValueError, IndexError, KeyError):  # Linux < 4.14 or no /proc
+        pass
+    return stats
+
+# Resident memory of the process around the last model load, reported by /health
+model_memory: Dict[str, Any] = {"mmap": MODEL_MMAP, "rss_before_load_bytes": None, "rss_after_load_bytes": None}
+
+def _load_model() -> bool:
+    """Load the model from MODEL_PATH into the module globals and record how long it took."""
+    global model, model_loaded, model_error, model_generation, model_state, model_load_seconds
+    model_state = "loading"
+    model_memory["rss_before_load_bytes"] = _memory_stats()["rss_bytes"]
+    start = time.perf_counter()
+    try:
+        loaded = _load_model_from(MODEL_PATH)
+    except Exception as e:
+        model_error = str(e)
+        model_state = "failed"
+        logger.error(f"Error loading model: {model_error}", exc_info=True)
+        if os.getenv("ENV") == "production" and MODEL_LOAD_MODE == "sync":
+            raise
+        return False
+    finally:
+        model_load_seconds = round(time.perf_counter() - start, 3)
+        model_memory["rss_after_load_bytes"] = _memory_stats()["rss_bytes"]
+    model, model_loaded, model_error = loaded, True, None
+    model_generation += 1
+    model_state = "ready"
+    logger.info(f"Loaded model from {MODEL_PATH} in {model_load_seconds:.2f}s (mmap={MODEL_MMAP})")
+    return True
+
+if MODEL_LOAD_MODE == "sync":
+    _load_model()
+
 class Input(BaseModel):
     features: List[float]
     
@@ -202,135 +467,1188 @@ class Prediction(BaseModel):
     prediction: Union[int, float, List[float]]
     probabilities: List[float] = None
 
+class BatchInput(BaseModel):
+    features: List[List[float]]
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "features": [[5.1, 3.5, 1.4, 0.2], [6.7, 3.0, 5.2, 2.3]]
+            }
+        }
+
+class BatchPrediction(BaseModel):
+    predictions: List[Union[int, float, List[float]]]
+    probabilities: Optional[List[List[float]]] = None
+
+{% if framework == 'pytorch' %}
+def _scores_to_predictions(output: np.ndarray, n_rows: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Turn raw network outputs into class predictions and probabilities."""
+    # One row of scores per input row
+    output = output.reshape(n_rows, -1)
+    
+    # For binary classification, return probabilities for both classes
+    if output.shape[1] == 1:
+        prob = output[:, 0].astype(float)
+        predictions = np.rint(prob).astype(int)  # Class prediction (0 or 1)
+        return predictions, np.stack([1 - prob, prob], axis=1)  # [P(class=0), P(class=1)]
+    
+    # Multi-class: apply softmax to get probabilities
+    exp_scores = np.exp(output - np.max(output, axis=1, keepdims=True))  # For numerical stability
+    probabilities = exp_scores / exp_scores.sum(axis=1, keepdims=True)
+    return np.argmax(probabilities, axis=1), probabilities
+
+{% endif %}
+def _predict_batch(model: Any, features: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Run a single vectorized forward pass over a 2-D feature matrix.
+    
+    Args:
+        model: The loaded model
+        features: Array of shape (n_rows, n_features)
+        
+    Returns:
+        Tuple of (predictions with one entry per row, probabilities with one row per input or None)
+    """
+    {% if runtime == 'onnx' %}
+    outputs = model.run(None, {model.get_inputs()[0].name: np.ascontiguousarray(features, dtype=np.float32)})
+    {% if framework == 'pytorch' %}
+    return _scores_to_predictions(np.asarray(outputs[0]), len(features))
+    {% else %}
+    if len(outputs) > 1:
+        # Classifiers are exported without ZipMap: [labels, probability matrix]
+        return np.asarray(outputs[0]), np.asarray(outputs[1], dtype=float)
+    predictions = np.asarray(outputs[0], dtype=float).reshape(len(features), -1)
+    return (predictions[:, 0] if predictions.shape[1] == 1 else predictions), None
+    {% endif %}
+    
+    {% elif framework == 'sklearn' %}
+    if hasattr(model, 'predict_proba'):
+        # Run the pipeline once and derive labels from the probabilities
+        probabilities = np.asarray(model.predict_proba(features))
+        classes = getattr(model, 'classes_', None)
+        if classes is not None and len(classes) == probabilities.shape[1]:
+            return np.asarray(classes)[np.argmax(probabilities, axis=1)], probabilities
+        return np.asarray(model.predict(features)), probabilities
+    return np.asarray(model.predict(features)), None
+    
+    {% elif framework == 'pytorch' %}
+    # Check if we have a state_dict that needs model initialization
+    if isinstance(model, dict) and 'state_dict' in model:
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "error": "Model initialization required",
+                "message": (
+                    "The model was loaded as a state dictionary. "
+                    "Please initialize the model class and load the state_dict before making predictions.\n"
+                    "Example:\n"
+                    "```python\n"
+                    "from model import SimpleTorchModel  # Import your model class\n"
+                    "model = SimpleTorchModel()  # Initialize model\n"
+                    "model.load_state_dict(torch.load('path/to/model.pt'))  # Load weights\n"
+                    "model.eval()  # Set to evaluation mode\n"
+                    "```"
+                ),
+                "model_path": MODEL_PATH
+            }
+        )
+    
+    with torch.no_grad():
+        # Convert input to tensor
+        features_tensor = torch.as_tensor(features, dtype=torch.float32)
+        
+        # Move input to the same device as the model; quantized modules expose no parameters
+        parameter = next(model.parameters(), None) if hasattr(model, 'parameters') else None
+        if parameter is not None and parameter.is_cuda:
+            features_tensor = features_tensor.cuda()
+        
+        # Get model prediction
+        output = model(features_tensor)
+    
+    # Handle different output types
+    if isinstance(output, (list, tuple)):
+        output = output[0]  # Take first output if model returns multiple values
+        
+    # Convert to numpy for easier handling
+    if hasattr(output, 'cpu'):
+        output = output.cpu()
+    if hasattr(output, 'numpy'):
+        output = output.numpy()
+    
+    return _scores_to_predictions(np.asarray(output), len(features))
+    
+    {% elif framework == 'tensorflow' %}
+    output = _serving_fn(model)(features)
+    if isinstance(output, dict):
+        output = output[sorted(output)[0]]
+    elif isinstance(output, (list, tuple)):
+        output = output[0]  # Take first output if model returns multiple values
+    prediction = np.asarray(output)
+    if len(prediction.shape) > 1:
+        if prediction.shape[1] > 1:  # Multi-class classification
+            return np.argmax(prediction, axis=1), prediction
+        # Binary classification
+        prob = prediction[:, 0].astype(float)
+        predictions = (prob >= 0.5).astype(int)
+        return predictions, np.stack([1 - prob, prob], axis=1)  # [prob_class_0, prob_class_1]
+    # Regression
+    return prediction.astype(float), None
+    {% endif %}
+
+def _input_row_shape(model: Any) -> Optional[Tuple[int, ...]]:
+    """Return the shape of one input row, from WARMUP_INPUT_SHAPE or the model itself, or None if unknown."""
+    if WARMUP_INPUT_SHAPE.strip():
+        return tuple(int(dim) for dim in WARMUP_INPUT_SHAPE.split(","))
+    try:
+        {% if runtime == 'onnx' %}
+        dims = tuple(model.get_inputs()[0].shape[1:])
+        {% elif framework == 'sklearn' %}
+        dims = (model.n_features_in_,)
+        {% elif framework == 'pytorch' %}
+        dims = None
+        for module in model.modules():
+            if isinstance(module, torch.nn.Linear):
+                dims = (module.in_features,)
+                break
+            # TorchScript submodules keep their original class name and parameters
+            if getattr(module, 'original_name', None) == 'Linear':
+                dims = (int(module.weight.shape[1]),)
+                break
+        {% elif framework == 'tensorflow' %}
+        if hasattr(model, 'signatures') and not isinstance(model, tf.keras.Model):
+            spec = next(iter(model.signatures[TF_SERVING_SIGNATURE].structured_input_signature[1].values()))
+            dims = tuple(spec.shape[1:])
+        else:
+            dims = tuple(model.inputs[0].shape[1:])
+        {% endif %}
+    except (AttributeError, IndexError, KeyError, TypeError, StopIteration):
+        return None
+    if not dims or not all(isinstance(dim, (int, np.integer)) and dim > 0 for dim in dims):
+        return None
+    return tuple(int(dim) for dim in dims)
+
+def _predict_chunked(model: Any, features: np.ndarray, chunk_size: int) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Run _predict_batch over bounded slices of a large matrix and concatenate the results."""
+    chunk_size = max(1, chunk_size)
+    if len(features) <= chunk_size:
+        return _predict_batch(model, features)
+    
+    predictions, probabilities = [], []
+    for start in range(0, len(features), chunk_size):
+        chunk_predictions, chunk_probabilities = _predict_batch(model, features[start:start + chunk_size])
+        predictions.append(chunk_predictions)
+        if chunk_probabilities is not None:
+            probabilities.append(chunk_probabilities)
+    return np.concatenate(predictions), (np.concatenate(probabilities) if probabilities else None)
+
+# Prometheus metrics, kept in-process. Every observation happens on the event loop thread
+# and costs a dictionary lookup, a bisect and a few additions.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096)
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, values)) + "}"
+
+class Counter:
+    """Monotonic counter with optional labels, rendered in Prometheus text format."""
+    kind = "counter"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+    
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+    
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value:g}")
+        return lines
+
+class Gauge(Counter):
+    """Value that can go up and down, such as the number of requests in flight."""
+    kind = "gauge"
+    
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+    
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+class Histogram:
+    """Fixed-bucket histogram with optional labels, rendered in Prometheus text format."""
+    kind = "histogram"
+    
+    def __init__(self, name: str, documentation: str, buckets: Tuple[float, ...], labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self.labelnames = tuple(labelnames)
+        # Per label set: [count per bucket..., count above the last bucket, sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+    
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+    
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return int(sum(series[:-1])) if series else 0
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for labels, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames + ('le',), labels + (le,))} {cumulative}")
+            suffix = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{suffix} {series[-1]:g}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+REQUESTS = Counter("model_requests_total", "HTTP requests by path and status code.", ("path", "status"))
+ERRORS = Counter("model_request_errors_total", "HTTP requests that failed, by path and client/server error.", ("path", "kind"))
+REQUESTS_IN_FLIGHT = Gauge("model_requests_in_flight", "HTTP requests currently being handled.", ("path",))
+REQUEST_SECONDS = Histogram("model_request_duration_seconds", "End-to-end request latency.", LATENCY_BUCKETS, ("path",))
+STAGE_SECONDS = Histogram(
+    "model_stage_duration_seconds", "Time spent per stage: parse, convert, inference, serialize.", LATENCY_BUCKETS, ("stage",)
+)
+BATCH_SIZE = Histogram("model_batch_size_rows", "Rows per model forward pass.", BATCH_SIZE_BUCKETS)
+INFERENCE_IN_FLIGHT = Gauge("model_inference_in_flight", "Forward passes queued or running on the inference pool.")
+ADMITTED_IN_FLIGHT = Gauge("model_admission_in_flight", "Prediction requests admitted and being processed.")
+ADMISSION_QUEUE_DEPTH = Gauge("model_admission_queue_depth", "Prediction requests waiting for an admission slot.")
+ADMISSION_WAIT_SECONDS = Histogram("model_admission_wait_seconds", "Time prediction requests waited for a slot.", LATENCY_BUCKETS)
+SHED_REQUESTS = Counter(
+    "model_requests_shed_total",
+    "Prediction requests shed: queue_full and deadline (waiting for a slot) are rejected on arrival, "
+    "expired ones are dropped after admission before inference.",
+    ("reason",)
+)
+MODEL_LOAD_SECONDS = Gauge("model_load_duration_seconds", "Time taken to load the model currently served.")
+MODEL_RELOADS = Counter("model_reloads_total", "Hot model reloads by result.", ("result",))
+RELOAD_PEAK_RSS = Gauge("model_reload_peak_rss_bytes", "Peak resident memory of the process during the last model reload.")
+METRICS = (REQUESTS, ERRORS, REQUESTS_IN_FLIGHT, REQUEST_SECONDS, STAGE_SECONDS, BATCH_SIZE, INFERENCE_IN_FLIGHT,
+           ADMITTED_IN_FLIGHT, ADMISSION_QUEUE_DEPTH, ADMISSION_WAIT_SECONDS, SHED_REQUESTS,
+           MODEL_LOAD_SECONDS, MODEL_RELOADS, RELOAD_PEAK_RSS)
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Create the inference thread pool on first use."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+    return _executor
+
+# Monotonic time by which the current request must have started inference, set on admission
+_request_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_deadline", default=None)
+
+def _deadline_exceeded() -> HTTPException:
+    """Build the error for an admitted request whose deadline passed before its inference started."""
+    SHED_REQUESTS.inc("expired")
+    return HTTPException(
+        status_code=SHED_STATUS_CODE,
+        detail={"error": "Deadline exceeded", "message": f"The request waited longer than {REQUEST_DEADLINE_MS:g}ms and was dropped"},
+        headers={"Retry-After": "1"}
+    )
+
+def _run_before_deadline(deadline: Optional[float], func, *args):
+    """Run func on a pool thread unless the request's deadline passed while it sat in the pool's queue."""
+    if deadline is not None and time.monotonic() > deadline:
+        raise _deadline_exceeded()
+    return func(*args)
+
+async def _run_inference(func, *args):
+    """
+    Run a blocking inference call on the inference thread pool so the event loop stays responsive.
+    
+    Work whose request deadline has passed is dropped, both before it is queued on the pool
+    and when a pool thread picks it up, so an overloaded pool does not run stale requests.
+    """
+    deadline = _request_deadline.get()
+    if deadline is not None and time.monotonic() > deadline:
+        raise _deadline_exceeded()
+    loop = asyncio.get_running_loop()
+    INFERENCE_IN_FLIGHT.inc()
+    start = time.perf_counter()
+    try:
+        return await loop.run_in_executor(_get_executor(), _run_before_deadline, deadline, func, *args)
+    finally:
+        INFERENCE_IN_FLIGHT.dec()
+        STAGE_SECONDS.observe(time.perf_counter() - start, "inference")
+
+def _format_row(predictions: np.ndarray, probabilities: Optional[np.ndarray], index: int) -> Dict[str, Any]:
+    """Convert one row of a batch result to JSON-serializable Python types."""
+    prediction = predictions[index]
+    # Convert numpy types to native Python types for JSON serialization
+    if hasattr(prediction, 'tolist'):
+        prediction = prediction.tolist()
+    result = {"prediction": prediction}
+    if probabilities is not None:
+        result["probabilities"] = probabilities[index].tolist()
+    return result
+
+NPY_MEDIA_TYPE = "application/x-npy"
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+def _media_types(header: Optional[str]) -> List[str]:
+    """Split a Content-Type or Accept header into bare, lower-cased media types."""
+    return [part.split(";")[0].strip().lower() for part in (header or "").split(",") if part.strip()]
+
+def _accepted_media_types(header: Optional[str]) -> List[str]:
+    """Return the media types of an Accept header, most preferred first, dropping q=0 entries."""
+    weighted = []
+    for part in (header or "").split(","):
+        media_type, *params = [item.strip() for item in part.split(";")]
+        if not media_type:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            weighted.append((quality, media_type.lower()))
+    # sorted() is stable, so equally weighted types keep the client's order
+    return [media_type for _, media_type in sorted(weighted, key=lambda item: -item[0])]
+
+def _unpack_tensor(payload: Any) -> np.ndarray:
+    """
+    Build an array from a decoded msgpack payload.
+    
+    Tensors are sent as ``{"dtype": "<f4", "shape": [rows, cols], "data": <raw bytes>}`` and are
+    wrapped with ``np.frombuffer`` without creating Python floats. ``{"features": [...]}`` is also
+    accepted for clients that send plain lists.
+    """
+    if isinstance(payload, dict) and "features" in payload:
+        payload = payload["features"]
+    if isinstance(payload, dict) and "data" in payload:
+        array = np.frombuffer(payload["data"], dtype=np.dtype(payload.get("dtype", "<f8")))
+        return array.reshape(payload["shape"]) if "shape" in payload else array
+    return np.asarray(payload, dtype=float)
+
+def _pack_tensor(array: Optional[np.ndarray]) -> Optional[Dict[str, Any]]:
+    """Encode an array in the same msgpack tensor layout that requests use."""
+    if array is None:
+        return None
+    array = np.ascontiguousarray(array)
+    return {"dtype": array.dtype.str, "shape": list(array.shape), "data": array.tobytes()}
+
+async def _read_features(request: Request, schema: type) -> np.ndarray:
+    """
+    Decode the request body into a feature array based on its Content-Type.
+    
+    ``application/x-npy`` and ``application/msgpack`` bodies are decoded straight into numpy
+    arrays; JSON (the default) is validated against ``schema``.
+    """
+    body = await request.body()
+    content_types = _media_types(request.headers.get("content-type"))
+    content_type = content_types[0] if content_types else "application/json"
+    
+    start = time.perf_counter()
+    try:
+        if content_type == NPY_MEDIA_TYPE:
+            features = np.load(io.BytesIO(body), allow_pickle=False)
+            STAGE_SECONDS.observe(time.perf_counter() - start, "parse")
+            return features
+        if content_type in MSGPACK_MEDIA_TYPES:
+            if msgpack is None:
+                raise HTTPException(
+                    status_code=415,
+                    detail={"error": "Unsupported media type", "message": "msgpack is not installed on the server"}
+                )
+            features = _unpack_tensor(msgpack.unpackb(body, raw=False))
+            STAGE_SECONDS.observe(time.perf_counter() - start, "parse")
+            return features
+        if not content_type.endswith("json"):
+            raise HTTPException(
+                status_code=415,
+                detail={
+                    "error": "Unsupported media type",
+                    "message": f"Use application/json, {NPY_MEDIA_TYPE} or {MSGPACK_MEDIA_TYPES[0]}"
+                }
+            )
+        payload = json.loads(body)
+        validate = getattr(schema, "model_validate", None) or schema.parse_obj
+        data = validate(payload)
+    except HTTPException:
+        raise
+    except json.JSONDecodeError as e:
+        # Same error FastAPI reports for malformed JSON on its own endpoints
+        raise RequestValidationError([{
+            "type": "json_invalid",
+            "loc": ("body", e.pos),
+            "msg": "JSON decode error",
+            "input": {},
+            "ctx": {"error": e.msg},
+        }])
+    except Exception as e:
+        if hasattr(e, "errors"):
+            errors = [{**error, "loc": ("body",) + tuple(error["loc"])} for error in e.errors()]
+        else:
+            errors = [{"type": "value_error", "loc": ("body",), "msg": str(e), "input": None}]
+        raise RequestValidationError(errors)
+    
+    converted = time.perf_counter()
+    STAGE_SECONDS.observe(converted - start, "parse")
+    try:
+        features = np.asarray(data.features, dtype=float)
+    except ValueError:
+        raise HTTPException(
+            status_code=422,
+            detail={"error": "Ragged batch", "message": "All rows must have the same number of features"}
+        )
+    STAGE_SECONDS.observe(time.perf_counter() - converted, "convert")
+    return features
+
+def _encode_response(request: Request, predictions: np.ndarray, probabilities: Optional[np.ndarray], single: bool) -> Any:
+    """
+    Encode a prediction result according to the request's Accept header.
+    
+    Accepted types are tried in order of their q-value. ``application/x-npy`` responses
+    carry the predictions array; ``application/msgpack`` responses carry both predictions
+    and probabilities as tensors. Anything else gets JSON.
+    """
+    for media_type in _accepted_media_types(request.headers.get("accept")):
+        if media_type in ("application/json", "application/*", "*/*"):
+            break
+        if media_type == NPY_MEDIA_TYPE:
+            buffer = io.BytesIO()
+            np.save(buffer, predictions, allow_pickle=False)
+            return Response(content=buffer.getvalue(), media_type=NPY_MEDIA_TYPE)
+        if media_type in MSGPACK_MEDIA_TYPES and msgpack is not None:
+            content = msgpack.packb({"predictions": _pack_tensor(predictions), "probabilities": _pack_tensor(probabilities)})
+            return Response(content=content, media_type=media_type)
+    
+    {% if fast_json %}
+    # Hand arrays to orjson directly; returning a Response also skips response-model validation
+    if single:
+        return ORJSONResponse({
+            "prediction": _orjson_array(predictions)[0],
+            "probabilities": _orjson_array(probabilities[0]) if probabilities is not None else None
+        })
+    return ORJSONResponse({
+        "predictions": _orjson_array(predictions),
+        "probabilities": _orjson_array(probabilities) if probabilities is not None else None
+    })
+    {% else %}
+    if single:
+        return _format_row(predictions, probabilities, 0)
+    return {
+        "predictions": predictions.tolist(),
+        "probabilities": probabilities.tolist() if probabilities is not None else None
+    }
+    {% endif %}
+
+{% if fast_json %}
+# dtypes orjson.OPT_SERIALIZE_NUMPY accepts; float16, complex, object, etc. are not among them
+ORJSON_NATIVE_DTYPES = frozenset(np.dtype(t) for t in (
+    np.bool_, np.int8, np.int16, np.int32, np.int64,
+    np.uint8, np.uint16, np.uint32, np.uint64, np.float32, np.float64,
+))
+
+def _orjson_array(array: np.ndarray) -> Any:
+    """Return arrays orjson can serialize natively as-is, falling back to lists for other dtypes."""
+    if array.dtype in ORJSON_NATIVE_DTYPES and array.flags["C_CONTIGUOUS"]:
+        return array
+    return array.tolist()
+
+{% endif %}
+def _request_body_docs(schema: type) -> Dict[str, Any]:
+    """OpenAPI request body description for endpoints that read the raw request."""
+    json_schema = schema.model_json_schema() if hasattr(schema, "model_json_schema") else schema.schema()
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": json_schema},
+                NPY_MEDIA_TYPE: {"schema": {"type": "string", "format": "binary"}},
+                MSGPACK_MEDIA_TYPES[0]: {"schema": {"type": "string", "format": "binary"}},
+            }
+        }
+    }
+
+class PredictionCache:
+    """
+    LRU cache of single-row prediction results keyed by a hash of the input array.
+    
+    Entries are evicted least recently used first once either ``max_entries`` or
+    ``max_bytes`` is exceeded. The cache empties itself when ``model_generation``
+    changes, so results from a previous model are never served.
+    """
+    
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max(0, max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[bytes, Tuple[np.ndarray, Optional[np.ndarray], int]]" = OrderedDict()
+        self._bytes = 0
+        self._generation = model_generation
+    
+    @staticmethod
+    def key(features: np.ndarray) -> bytes:
+        """Hash the raw bytes together with shape and dtype, so equal bytes of different arrays differ."""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{features.dtype.str}{features.shape}".encode())
+        digest.update(np.ascontiguousarray(features).tobytes())
+        return digest.digest()
+    
+    def _check_generation(self) -> None:
+        if self._generation != model_generation:
+            self.clear()
+            self._generation = model_generation
+    
+    def get(self, key: bytes) -> Optional[Tuple[np.ndarray, Optional[np.ndarray]]]:
+        self._check_generation()
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0], entry[1]
+    
+    def put(self, key: bytes, predictions: np.ndarray, probabilities: Optional[np.ndarray], generation: int) -> None:
+        """Store a result computed by model ``generation``; results from a since-replaced model are dropped."""
+        self._check_generation()
+        if generation != self._generation:
+            return
+        # Copy so the entry does not keep a whole micro-batch result alive through a view
+        predictions = np.array(predictions, copy=True)
+        probabilities = np.array(probabilities, copy=True) if probabilities is not None else None
+        size = len(key) + predictions.nbytes + (probabilities.nbytes if probabilities is not None else 0)
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[2]
+        self._entries[key] = (predictions, probabilities, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, _, evicted) = self._entries.popitem(last=False)
+            self._bytes -= evicted
+    
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+prediction_cache = PredictionCache(PREDICTION_CACHE_SIZE, PREDICTION_CACHE_BYTES) if PREDICTION_CACHE_SIZE > 0 else None
+
+class MicroBatcher:
+    """
+    Collects concurrent single-row requests into one array and runs a single forward pass.
+    
+    A batch is flushed as soon as it holds ``max_batch_size`` rows or the oldest
+    request has waited ``max_wait_ms`` milliseconds, whichever comes first. Up to
+    ``max_concurrency`` batches run at once; while every slot is busy, new requests
+    keep queueing and are picked up as one larger batch when a slot frees.
+    """
+    
+    def __init__(self, max_batch_size: int, max_wait_ms: float, max_concurrency: int = 1):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.max_concurrency = max(1, max_concurrency)
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._tasks: set = set()
+        self._in_flight: set = set()
+    
+    def start(self) -> None:
+        """Start the background task that drains the request queue."""
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._worker = asyncio.create_task(self._run())
+    
+    async def stop(self) -> None:
+        """Stop the background task and fail every request that has not been answered yet."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        
+        # Snapshot before cancelling, since cancelled batches stop tracking their rows
+        pending = list(self._in_flight)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        
+        shutdown_error = HTTPException(
+            status_code=503,
+            detail={"error": "Service shutting down", "message": "The request was not processed"}
+        )
+        for future in pending:
+            if not future.done():
+                future.set_exception(shutdown_error)
+        self._in_flight.clear()
+        while self._queue is not None and not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(shutdown_error)
+    
+    async def submit(self, row: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Queue a single feature row and wait for its own slice of the batch result."""
+        if self._worker is None:
+            raise RuntimeError("MicroBatcher.submit() called before start(); the application lifespan has not run")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((row, future))
+        deadline = _request_deadline.get()
+        if deadline is not None:
+            await asyncio.wait((future,), timeout=max(0.0, deadline - time.monotonic()))
+            if not future.done() and future not in self._in_flight:
+                # Still queued at the deadline: drop the row, _process skips cancelled futures
+                future.cancel()
+                raise _deadline_exceeded()
+        return await future
+    
+    async def _collect(self) -> List[Tuple[np.ndarray, asyncio.Future]]:
+        """Wait for the first request, then gather more until the batch is full or the window closes."""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        # Dequeued requests are tracked so stop() can still answer them
+        self._in_flight.add(batch[0][1])
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+            self._in_flight.add(batch[-1][1])
+        return batch
+    
+    async def _run(self) -> None:
+        while True:
+            # Wait for a free inference slot before collecting, so a busy pool grows the next batch
+            await self._slots.acquire()
+            try:
+                batch = await self._collect()
+            except BaseException:
+                self._slots.release()
+                raise
+            task = asyncio.create_task(self._dispatch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+    
+    async def _dispatch(self, batch: List[Tuple[np.ndarray, asyncio.Future]]) -> None:
+        try:
+            # Rows of different widths cannot be stacked, so run one pass per width
+            groups: Dict[int, List[Tuple[np.ndarray, asyncio.Future]]] = {}
+            for row, future in batch:
+                groups.setdefault(row.shape[-1], []).append((row, future))
+            
+            for items in groups.values():
+                await self._process(items)
+        finally:
+            self._slots.release()
+    
+    async def _process(self, items: List[Tuple[np.ndarray, asyncio.Future]]) -> None:
+        """Score one group of rows and resolve each caller's future with its own result."""
+        for _, future in items:
+            if future.done():
+                self._in_flight.discard(future)
+        items = [item for item in items if not item[1].done()]
+        if not items:
+            return
+        try:
+            try:
+                features = np.vstack([row for row, _ in items])
+                BATCH_SIZE.observe(len(features))
+                predictions, probabilities = await _run_inference(_predict_batch, model, features)
+            except Exception:
+                if len(items) == 1:
+                    raise
+                # Retry row by row so only the caller that sent a bad row sees the error
+                for item in items:
+                    await self._process([item])
+                return
+            for i, (_, future) in enumerate(items):
+                if not future.done():
+                    future.set_result((
+                        predictions[i:i + 1],
+                        probabilities[i:i + 1] if probabilities is not None else None
+                    ))
+        except Exception as e:
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            for _, future in items:
+                self._in_flight.discard(future)
+
+batcher = MicroBatcher(MAX_BATCH_SIZE, MAX_BATCH_WAIT_MS, INFERENCE_WORKERS) if ENABLE_BATCHING else None
+
+class Overloaded(Exception):
+    """Raised when a request cannot be admitted; ``reason`` is "queue_full" or "deadline"."""
+    
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+class AdmissionController:
+    """
+    Limits how many prediction requests are processed at once, with a bounded FIFO wait queue.
+    
+    Up to ``max_in_flight`` requests hold a slot. Up to ``max_queue`` more wait for one in
+    arrival order, and a request arriving when the queue is full is rejected immediately, so
+    overload fails a few requests fast instead of slowing every request down. A released
+    slot is handed straight to the oldest waiter.
+    """
+    
+    def __init__(self, max_in_flight: int, max_queue: int):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max(0, max_queue)
+        self.in_flight = 0
+        self._waiters: deque = deque()
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {"queue_full": 0, "deadline": 0}
+    
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+    
+    async def acquire(self, timeout: Optional[float] = None) -> None:
+        """
+        Take a slot, waiting at most ``timeout`` seconds for one.
+        
+        Raises:
+            Overloaded: If the wait queue is full, or no slot freed up within the timeout
+        """
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            self._admit(0.0)
+            return
+        if len(self._waiters) >= self.max_queue:
+            self._reject("queue_full")
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        ADMISSION_QUEUE_DEPTH.set(len(self._waiters))
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # the slot was handed over just as the wait ended
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            ADMISSION_QUEUE_DEPTH.set(len(self._waiters))
+            if isinstance(e, asyncio.TimeoutError):
+                self._reject("deadline")
+            raise
+        self._admit(time.perf_counter() - start)
+    
+    def release(self) -> None:
+        """Give the slot to the oldest waiter, or free it."""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                ADMISSION_QUEUE_DEPTH.set(len(self._waiters))
+                return
+        self.in_flight -= 1
+        ADMISSION_QUEUE_DEPTH.set(0)
+        ADMITTED_IN_FLIGHT.set(self.in_flight)
+    
+    def _admit(self, waited: float) -> None:
+        self.admitted += 1
+        ADMITTED_IN_FLIGHT.set(self.in_flight)
+        ADMISSION_WAIT_SECONDS.observe(waited)
+    
+    def _reject(self, reason: str) -> None:
+        self.rejected[reason] += 1
+        SHED_REQUESTS.inc(reason)
+        raise Overloaded(reason)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "deadline_ms": REQUEST_DEADLINE_MS,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "expired": int(SHED_REQUESTS.value("expired")),
+        }
+
+admission = AdmissionController(MAX_IN_FLIGHT, MAX_QUEUE)
+
+warmup_status: Dict[str, Any] = {"completed": False, "seconds": None, "batch_sizes": [], "error": None}
+
+async def _warm(candidate: Any) -> List[int]:
+    """
+    Score synthetic inputs so lazy allocations, graph tracing and thread start-up happen before traffic.
+    
+    Every batch size is run WARMUP_ITERATIONS times on all inference threads at once, so each
+    pool thread exists and has run the model before it serves requests.
+    
+    Returns:
+        The batch sizes scored; empty if warmup is disabled or the input shape is unknown
+    """
+    sizes = sorted(set(WARMUP_BATCH_SIZES + ([MAX_BATCH_SIZE] if batcher is not None else [])))
+    if not sizes:
+        return []
+    row_shape = _input_row_shape(candidate)
+    if row_shape is None:
+        logger.warning("Skipping warmup: could not infer the input shape from the model, set WARMUP_INPUT_SHAPE")
+        return []
+    
+    start = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    rng = np.random.default_rng(0)
+    for size in sizes:
+        features = rng.standard_normal((size, *row_shape))
+        for _ in range(WARMUP_ITERATIONS):
+            await asyncio.gather(*(
+                loop.run_in_executor(_get_executor(), _predict_batch, candidate, features)
+                for _ in range(INFERENCE_WORKERS)
+            ))
+    logger.info(f"Warmup finished in {time.perf_counter() - start:.2f}s (batch sizes {sizes}, input shape {row_shape})")
+    return sizes
+
+async def _warmup() -> None:
+    """Warm up the model loaded at startup and record the result; failures are logged and do not stop the app."""
+    global model_state
+    if model_state == "ready":
+        model_state = "warming"
+    start = time.perf_counter()
+    try:
+        if model_loaded:
+            warmup_status["batch_sizes"] = await _warm(model)
+    except Exception as e:
+        warmup_status["error"] = str(e)
+        logger.warning(f"Warmup failed, serving without it: {e}", exc_info=True)
+    warmup_status.update(completed=True, seconds=round(time.perf_counter() - start, 3))
+    if model_state == "warming":
+        model_state = "ready"
+
+# Seconds between checks of the model artifact for changes, 0 disables the watcher
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "{{ watch_interval | default(0) }}"))
+# Bearer token for the /admin endpoints, which are disabled while it is unset
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+reload_status: Dict[str, Any] = {"reloads": 0, "failures": 0, "last": None}
+_reload_lock: Optional[asyncio.Lock] = None
+
+def _reset_peak_rss() -> bool:
+    """Reset the kernel's peak RSS counter (VmHWM) for this process; False where that is unsupported."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+async def _reload_model(reason: str) -> Dict[str, Any]:
+    """
+    Load the artifact at MODEL_PATH next to the serving model, warm it up and swap it in.
+    
+    Requests already running hold a reference to the model they started with and finish on
+    it; requests arriving after the swap use the new model. If loading or warmup fails the
+    old model keeps serving. Reloads are serialized.
+    
+    Returns:
+        Report with the outcome, load and warmup durations, and process memory before,
+        at the peak of and after the reload
+    """
+    global model, model_loaded, model_error, model_generation, model_state, model_load_seconds, _reload_lock
+    if _reload_lock is None:
+        _reload_lock = asyncio.Lock()
+    async with _reload_lock:
+        report: Dict[str, Any] = {
+            "reason": reason, "success": False, "error": None, "generation": model_generation,
+            "load_seconds": None, "warmup_seconds": None, "seconds": None,
+            "rss_before_bytes": None, "peak_rss_bytes": None, "rss_after_bytes": None,
+        }
+        peak_tracked = _reset_peak_rss()
+        report["rss_before_bytes"] = _memory_stats()["rss_bytes"]
+        samples = [report["rss_before_bytes"]]
+        start = time.perf_counter()
+        try:
+            candidate = await asyncio.get_running_loop().run_in_executor(None, _load_model_from, MODEL_PATH)
+            report["load_seconds"] = round(time.perf_counter() - start, 3)
+            samples.append(_memory_stats()["rss_bytes"])
+            await _warm(candidate)
+            report["warmup_seconds"] = round(time.perf_counter() - start - report["load_seconds"], 3)
+            samples.append(_memory_stats()["rss_bytes"])
+        except Exception as e:
+            report["error"] = str(e)
+            reload_status["failures"] += 1
+            MODEL_RELOADS.inc("failure")
+            logger.error(f"Model reload ({reason}) failed, still serving generation {model_generation}: {e}", exc_info=True)
+        else:
+            # A single assignment: no request ever sees a partially swapped model
+            model, model_loaded, model_error = candidate, True, None
+            model_generation += 1
+            model_state = "ready"
+            model_load_seconds = report["load_seconds"]
+            report.update(success=True, generation=model_generation)
+            reload_status["reloads"] += 1
+            MODEL_RELOADS.inc("success")
+            logger.info(f"Model reloaded ({reason}) as generation {model_generation} in {time.perf_counter() - start:.2f}s")
+        candidate = None
+        
+        memory = _memory_stats()
+        report["rss_after_bytes"] = memory["rss_bytes"]
+        known = [sample for sample in samples + [memory["rss_bytes"]] if sample is not None]
+        report["peak_rss_bytes"] = memory["peak_rss_bytes"] if peak_tracked else (max(known) if known else None)
+        if report["peak_rss_bytes"] is not None:
+            RELOAD_PEAK_RSS.set(report["peak_rss_bytes"])
+        report["seconds"] = round(time.perf_counter() - start, 3)
+        reload_status["last"] = report
+        return report
+
+def _artifact_paths() -> List[str]:
+    {% if framework == 'pytorch' and torchscript_model %}
+    return [MODEL_PATH, TORCHSCRIPT_PATH]
+    {% else %}
+    return [MODEL_PATH]
+    {% endif %}
+
+def _artifact_signature() -> Optional[Tuple[Tuple[str, int, int], ...]]:
+    """Return (path, mtime, size) of every model file, including files inside a SavedModel directory."""
+    entries = []
+    for root in _artifact_paths():
+        paths = [root]
+        if os.path.isdir(root):
+            paths = [os.path.join(dirpath, name) for dirpath, _, names in os.walk(root) for name in names]
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(sorted(entries)) or None
+
+async def _watch_model() -> None:
+    """Reload the model when its artifact changes and then stays unchanged for one more interval."""
+    served = _artifact_signature()
+    pending = None
+    while True:
+        await asyncio.sleep(MODEL_WATCH_INTERVAL)
+        current = _artifact_signature()
+        if current is None or current == served:
+            pending = None
+            continue
+        if current != pending or model_state == "loading":
+            # Still being written (or the first load is running), check again next interval
+            pending = current
+            continue
+        await _reload_model("watch")
+        # Remember the artifact even if the reload failed, so a bad file is not retried in a loop
+        served, pending = current, None
+
+_background_tasks: List[asyncio.Task] = []
+
+async def _load_in_background() -> None:
+    """Load the model on a separate thread, then warm it up; /ready answers 200 once both are done."""
+    await asyncio.get_running_loop().run_in_executor(None, _load_model)
+    await _warmup()
+
+async def _on_startup() -> None:
+    """
+    Start background services and get the model ready.
+    
+    A model loaded at import time is warmed up here, before the server accepts traffic.
+    Otherwise loading and warmup run in a background task and the server starts at once.
+    """
+    if MODEL_LOAD_MODE == "sync":
+        await _warmup()
+    else:
+        _background_tasks.append(asyncio.create_task(_load_in_background()))
+    if MODEL_WATCH_INTERVAL > 0:
+        _background_tasks.append(asyncio.create_task(_watch_model()))
+        logger.info(f"Watching {MODEL_PATH} for new model versions every {MODEL_WATCH_INTERVAL:g}s")
+    if batcher is not None:
+        batcher.start()
+        logger.info(f"Micro-batching enabled (max_batch_size={MAX_BATCH_SIZE}, max_wait_ms={MAX_BATCH_WAIT_MS})")
+
+async def _on_shutdown() -> None:
+    """Stop background services and release the inference thread pool."""
+    global _executor
+    while _background_tasks:
+        task = _background_tasks.pop()
+        if not task.done():
+            task.cancel()
+    if batcher is not None:
+        await batcher.stop()
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
+
+def _require_ready() -> None:
+    """Fail fast with 503 until the model is loaded and warmed up."""
+    if model_state == "ready":
+        return
+    if model_state == "failed":
+        raise HTTPException(
+            status_code=503,
+            detail={
+                "error": "Model not loaded",
+                "message": model_error or "Model failed to load",
+                "model_path": MODEL_PATH
+            }
+        )
+    raise HTTPException(
+        status_code=503,
+        detail={"error": "Model not ready", "message": f"The model is {model_state}, retry shortly"},
+        headers={"Retry-After": "1"}
+    )
+
+@app.get("/live")
+async def liveness():
+    """
+    Liveness probe, answered as soon as the server is up, including while the model loads.
+    
+    In production a model that failed to load reports 503 so the orchestrator restarts the container.
+    """
+    if model_state == "failed" and os.getenv("ENV") == "production":
+        return JSONResponse(status_code=503, content={"status": "failed", "error": model_error})
+    return {"status": "alive"}
+
+@app.get("/ready")
+async def readiness():
+    """Readiness probe: 200 once the model is loaded and warmed up, 503 before then or if loading failed."""
+    content = {
+        "status": model_state,
+        "model_load_seconds": model_load_seconds,
+        "warmup_seconds": warmup_status["seconds"],
+        "error": model_error,
+    }
+    if model_state != "ready":
+        return JSONResponse(status_code=503, content=content, headers={"Retry-After": "1"})
+    return content
+
+def _require_admin(request: Request) -> None:
+    """Accept only requests carrying the ADMIN_TOKEN bearer token; /admin is disabled without one."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(
+            status_code=403,
+            detail={"error": "Admin endpoints disabled", "message": "Set ADMIN_TOKEN to enable them"}
+        )
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(
+            status_code=401,
+            detail={"error": "Unauthorized", "message": "A valid bearer token is required"},
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+
+@app.post("/admin/reload")
+async def admin_reload(request: Request):
+    """Load the artifact at MODEL_PATH, warm it up and swap it in without dropping requests."""
+    _require_admin(request)
+    if model_state == "loading":
+        raise HTTPException(status_code=409, detail={"error": "Model is loading", "message": "Retry once /ready succeeds"})
+    report = await _reload_model("admin")
+    if not report["success"]:
+        return JSONResponse(status_code=500, content={"error": "Reload failed", **report})
+    return report
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
     return {
         "status": "healthy",
+        "ready": model_state == "ready",
+        "model_state": model_state,
         "model_loaded": model_loaded,
+        "model_load_seconds": model_load_seconds,
         "model_path": MODEL_PATH,
-        "error": model_error if not model_loaded else None
+        "error": model_error if not model_loaded else None,
+        "warmup": warmup_status,
+        "reload": reload_status,
+        # Per process: with several workers, each one answers for itself
+        "memory": {"pid": os.getpid(), **model_memory, **_memory_stats(), **_memory_sharing()},
+        "admission": admission.stats(),
+        "prediction_cache": prediction_cache.stats() if prediction_cache is not None else None
     }
 
-@app.post("/predict", response_model=Prediction)
-async def predict(data: Input):
+@app.post("/predict", response_model=Prediction, openapi_extra=_request_body_docs(Input))
+async def predict(request: Request):
     """
     Make predictions using the loaded model.
     
+    The body may be JSON (``{"features": [...]}``), a NumPy ``.npy`` array or a msgpack
+    tensor, selected by Content-Type. The Accept header selects the response format.
+    
     Args:
-        data: Input data containing features for prediction
+        request: Request whose body contains features for prediction
         
     Returns:
         Dictionary containing the prediction and optionally class probabilities
     """
-    if not model_loaded:
+    _require_ready()
+    
+    features = await _read_features(request, Input)
+    if features.ndim not in (1, 2) or (features.ndim == 2 and features.shape[0] != 1):
         raise HTTPException(
-            status_code=503,
-            detail={
-                "error": "Model not loaded",
-                "message": model_error or "Model failed to load",
-                "model_path": MODEL_PATH
-            }
+            status_code=422,
+            detail={"error": "Invalid shape", "message": "Expected a single row of features, use /predict/batch for many rows"}
         )
+    if features.size == 0:
+        raise HTTPException(status_code=422, detail={"error": "Empty input", "message": "Expected at least one feature"})
     
     try:
-        # Convert input to numpy array and reshape if needed
-        features = np.array(data.features).reshape(1, -1)
+        # Reshape to a single-row matrix
+        features = features.reshape(1, -1)
         
-        # Make prediction based on framework
-        {% if framework == 'sklearn' %}
-        if hasattr(model, 'predict_proba'):
-            proba = model.predict_proba(features)[0].tolist()
-            prediction = model.predict(features)[0]
-            # Convert numpy types to native Python types for JSON serialization
-            if hasattr(prediction, 'item'):
-                prediction = prediction.item()
-            return {"prediction": prediction, "probabilities": proba}
+        cache_key = cached = None
+        generation = model_generation
+        if prediction_cache is not None:
+            cache_key = prediction_cache.key(features)
+            cached = prediction_cache.get(cache_key)
+        
+        if cached is not None:
+            predictions, probabilities = cached
+        elif batcher is not None:
+            predictions, probabilities = await batcher.submit(features)
         else:
-            prediction = model.predict(features)[0]
-            if hasattr(prediction, 'item'):
-                prediction = prediction.item()
-            return {"prediction": prediction}
-                
-        {% elif framework == 'pytorch' %}
-        with torch.no_grad():
-            # Convert input to tensor
-            features_tensor = torch.tensor(features, dtype=torch.float32)
-            
-            # Check if we have a state_dict that needs model initialization
-            if isinstance(model, dict) and 'state_dict' in model:
-                raise HTTPException(
-                    status_code=500,
-                    detail={
-                        "error": "Model initialization required",
-                        "message": (
-                            "The model was loaded as a state dictionary. "
-                            "Please initialize the model class and load the state_dict before making predictions.\n"
-                            "Example:\n"
-                            "```python\n"
-                            "from model import SimpleTorchModel  # Import your model class\n"
-                            "model = SimpleTorchModel()  # Initialize model\n"
-                            "model.load_state_dict(torch.load('path/to/model.pt'))  # Load weights\n"
-                            "model.eval()  # Set to evaluation mode\n"
-                            "```"
-                        ),
-                        "model_path": MODEL_PATH
-                    }
-                )
-            
-            # Move input to the same device as the model
-            if hasattr(model, 'parameters') and next(model.parameters()).is_cuda:
-                features_tensor = features_tensor.cuda()
-            
-            # Get model prediction
-            output = model(features_tensor)
-            
-            # Handle different output types
-            if isinstance(output, (list, tuple)):
-                output = output[0]  # Take first output if model returns multiple values
-                
-            # Convert to numpy for easier handling
-            if hasattr(output, 'cpu'):
-                output = output.cpu()
-            if hasattr(output, 'numpy'):
-                output = output.numpy()
-            
-            # Handle different output shapes
-            output = np.squeeze(output)
-            
-            # For binary classification, return probabilities for both classes
-            if output.size == 1:  # Binary classification
-                prob = float(output)
-                return {
-                    "prediction": round(prob),  # Class prediction (0 or 1)
-                    "probabilities": [1 - prob, prob]  # [P(class=0), P(class=1)]
-                }
-            else:  # Multi-class
-                # Apply softmax to get probabilities
-                exp_scores = np.exp(output - np.max(output))  # For numerical stability
-                probabilities = exp_scores / exp_scores.sum()
-                predicted_class = int(np.argmax(probabilities))
-                return {
-                    "prediction": predicted_class,
-                    "probabilities": probabilities.tolist()
-                }
-                
-        {% elif framework == 'tensorflow' %}
-        prediction = model.predict(features, verbose=0)
-        if len(prediction.shape) > 1:
-            if prediction.shape[1] > 1:  # Multi-class classification
-                proba = prediction[0].tolist()
-                return {"prediction": int(np.argmax(prediction[0])), "probabilities": proba}
-            else:  # Binary classification
-                prob = float(prediction[0][0])
-                return {
-                    "prediction": 1 if prob >= 0.5 else 0,
-                    "probabilities": [1 - prob, prob]  # [prob_class_0, prob_class_1]
-                }
-        else:  # Regression
-            return {"prediction": float(prediction[0]), "probabilities": None}
-        {% endif %}
+            BATCH_SIZE.observe(1)
+            predictions, probabilities = await _run_inference(_predict_batch, model, features)
+        
+        if cache_key is not None and cached is None:
+            prediction_cache.put(cache_key, predictions, probabilities, generation)
+        
+        start = time.perf_counter()
+        response = _encode_response(request, predictions, probabilities, single=True)
+        STAGE_SECONDS.observe(time.perf_counter() - start, "serialize")
+        return response
             
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Prediction error: {str(e)}", exc_info=True)
         raise HTTPException(
@@ -342,6 +1660,281 @@ async def predict(data: Input):
             }
         )
 
+@app.post("/predict/batch", response_model=BatchPrediction, openapi_extra=_request_body_docs(BatchInput))
+async def predict_batch(request: Request):
+    """
+    Make predictions for many rows in a single call.
+    
+    Rows are scored with one vectorized forward pass per chunk of at most
+    MAX_CHUNK_SIZE rows. JSON, ``.npy`` and msgpack bodies are accepted as for /predict.
+    
+    Args:
+        request: Request whose body contains a 2-D matrix of features, one row per sample
+        
+    Returns:
+        Dictionary containing one prediction per row and optionally class probabilities
+    """
+    _require_ready()
+    
+    features = await _read_features(request, BatchInput)
+    if features.ndim != 2 and features.size > 0:
+        raise HTTPException(
+            status_code=422,
+            detail={"error": "Invalid shape", "message": f"Expected a 2-D matrix of rows, got {features.ndim} dimension(s)"}
+        )
+    if features.size == 0:
+        raise HTTPException(
+            status_code=422,
+            detail={"error": "Empty batch", "message": "Expected at least one row with at least one feature"}
+        )
+    
+    try:
+        chunk_size = max(1, MAX_CHUNK_SIZE)
+        for offset in range(0, len(features), chunk_size):
+            BATCH_SIZE.observe(min(chunk_size, len(features) - offset))
+        predictions, probabilities = await _run_inference(_predict_chunked, model, features, MAX_CHUNK_SIZE)
+        
+        start = time.perf_counter()
+        response = _encode_response(request, predictions, probabilities, single=False)
+        STAGE_SECONDS.observe(time.perf_counter() - start, "serialize")
+        return response
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Batch prediction error: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "error": "Prediction failed",
+                "message": str(e),
+                "model_path": MODEL_PATH
+            }
+        )
+
+class NDJSONLineError(ValueError):
+    """Raised when an NDJSON input line cannot be read; carries the 1-based line number."""
+    
+    def __init__(self, line: int, message: str):
+        super().__init__(message)
+        self.line = line
+
+def _parse_ndjson_row(line: bytes) -> List[float]:
+    """Parse one NDJSON line, either a bare list of features or {"features": [...]}."""
+    row = json.loads(line)
+    if isinstance(row, dict):
+        row = row["features"]
+    if not row:
+        raise ValueError("expected at least one feature")
+    return row
+
+async def _ndjson_lines(receive) -> AsyncIterator[Tuple[int, bytes]]:
+    """
+    Yield (line_number, line) pairs from the raw ASGI body as it arrives.
+    
+    Only newly received bytes are scanned for newlines, and a line longer than
+    STREAM_MAX_LINE_BYTES is rejected so memory stays bounded for any input size.
+    """
+    parts: List[bytes] = []
+    pending_size = 0
+    line_number = 0
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return
+        chunk = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            if end < 0:
+                break
+            line_number += 1
+            if pending_size + end - start > STREAM_MAX_LINE_BYTES:
+                raise NDJSONLineError(line_number, f"Line exceeds {STREAM_MAX_LINE_BYTES} bytes")
+            parts.append(chunk[start:end])
+            yield line_number, b"".join(parts)
+            parts, pending_size = [], 0
+            start = end + 1
+        
+        if start < len(chunk):
+            pending_size += len(chunk) - start
+            if pending_size > STREAM_MAX_LINE_BYTES:
+                raise NDJSONLineError(line_number + 1, f"Line exceeds {STREAM_MAX_LINE_BYTES} bytes")
+            parts.append(chunk[start:])
+    
+    if parts:
+        yield line_number + 1, b"".join(parts)
+
+async def _score_ndjson_chunk(rows: List[List[float]]) -> bytes:
+    """Score a chunk of rows with one forward pass and encode the results as NDJSON lines."""
+    start = time.perf_counter()
+    features = np.asarray(rows, dtype=float)
+    STAGE_SECONDS.observe(time.perf_counter() - start, "convert")
+    BATCH_SIZE.observe(len(features))
+    predictions, probabilities = await _run_inference(_predict_batch, model, features)
+    
+    start = time.perf_counter()
+    lines = [json.dumps(_format_row(predictions, probabilities, i)) for i in range(len(rows))]
+    encoded = ("\n".join(lines) + "\n").encode()
+    STAGE_SECONDS.observe(time.perf_counter() - start, "serialize")
+    return encoded
+
+async def _score_ndjson_stream(receive) -> AsyncIterator[bytes]:
+    """Read NDJSON rows from the request body, score them in chunks and yield encoded results."""
+    rows: List[List[float]] = []
+    first_line = last_line = 0
+    try:
+        async for line_number, line in _ndjson_lines(receive):
+            if not line.strip():
+                continue
+            try:
+                rows.append(_parse_ndjson_row(line))
+            except Exception as e:
+                raise NDJSONLineError(line_number, f"Invalid row: {e}")
+            first_line = first_line or line_number
+            last_line = line_number
+            if len(rows) >= STREAM_CHUNK_SIZE:
+                yield await _score_ndjson_chunk(rows)
+                rows, first_line = [], 0
+        if rows:
+            yield await _score_ndjson_chunk(rows)
+    except NDJSONLineError as e:
+        logger.error(f"Streaming prediction error on line {e.line}: {str(e)}")
+        yield (json.dumps({"error": "Invalid input", "message": str(e), "line": e.line}) + "\n").encode()
+    except Exception as e:
+        logger.error(f"Streaming prediction error on lines {first_line}-{last_line}: {str(e)}", exc_info=True)
+        yield (json.dumps({"error": "Prediction failed", "message": str(e), "lines": [first_line, last_line]}) + "\n").encode()
+
+class NDJSONScoringResponse(StreamingResponse):
+    """
+    Streaming response that reads the request body itself while it streams results.
+    
+    StreamingResponse listens for client disconnects by calling ``receive()`` in parallel,
+    which would race with reading the body, so this response owns ``receive()`` instead.
+    """
+    
+    def __init__(self):
+        super().__init__(iter(()), media_type="application/x-ndjson")
+    
+    async def __call__(self, scope, receive, send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        async for chunk in _score_ndjson_stream(receive):
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+@app.post("/predict/stream")
+async def predict_stream(request: Request):
+    """
+    Score a newline-delimited JSON stream of rows.
+    
+    Each input line is a list of features or ``{"features": [...]}``. Rows are read
+    incrementally, scored in chunks of STREAM_CHUNK_SIZE and streamed back as one NDJSON
+    prediction per line, so memory use does not depend on the size of the input.
+    If a line cannot be parsed, an ``{"error": ..., "line": n}`` line is emitted and the
+    stream ends; a scoring failure reports the ``lines`` range of the failing chunk.
+    """
+    _require_ready()
+    
+    return NDJSONScoringResponse()
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Expose request, stage latency and batching metrics in Prometheus text format."""
+    if model_load_seconds is not None:
+        MODEL_LOAD_SECONDS.set(model_load_seconds)
+    lines: List[str] = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return Response(content="\n".join(lines) + "\n", media_type="text/plain; version=0.0.4; charset=utf-8")
+
+class MetricsMiddleware:
+    """
+    Count and time every HTTP request.
+    
+    This is plain ASGI middleware: ``receive`` is passed through untouched, so streaming
+    endpoints that read the body themselves keep working, and streamed responses are
+    timed until their last chunk is sent.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+        self._paths: Optional[set] = None
+    
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if self._paths is None:
+            self._paths = {getattr(route, "path", None) for route in app.routes}
+        # Unknown paths share one label so scanners cannot grow the label set without bound
+        path = scope["path"] if scope["path"] in self._paths else "other"
+        status = [500]
+        
+        async def send_with_status(message) -> None:
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+        
+        REQUESTS_IN_FLIGHT.inc(path)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUESTS_IN_FLIGHT.dec(path)
+            REQUEST_SECONDS.observe(time.perf_counter() - start, path)
+            REQUESTS.inc(path, str(status[0]))
+            if status[0] >= 400:
+                ERRORS.inc(path, "server" if status[0] >= 500 else "client")
+
+class AdmissionMiddleware:
+    """
+    Admit prediction requests through the AdmissionController before their body is read.
+    
+    A request that finds the wait queue full, or that is still queued when its deadline
+    passes, is answered with SHED_STATUS_CODE and a Retry-After header without doing any
+    work. Admitted requests carry their deadline into inference, where work that has
+    expired by the time it would run is dropped. Streams hold their slot until the last
+    chunk is sent; the deadline only limits their wait for a slot.
+    """
+    
+    paths = ("/predict", "/predict/batch", "/predict/stream")
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        timeout = REQUEST_DEADLINE_MS / 1000.0 if REQUEST_DEADLINE_MS > 0 else None
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        try:
+            await admission.acquire(timeout)
+        except Overloaded as e:
+            message = (
+                "Too many requests are waiting, retry shortly" if e.reason == "queue_full"
+                else f"No capacity freed up within {REQUEST_DEADLINE_MS:g}ms, retry shortly"
+            )
+            response = JSONResponse(
+                status_code=SHED_STATUS_CODE,
+                content={"detail": {"error": "Overloaded", "message": message}},
+                headers={"Retry-After": "1"}
+            )
+            await response(scope, receive, send)
+            return
+        token = _request_deadline.set(deadline if scope["path"] != "/predict/stream" else None)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_deadline.reset(token)
+            admission.release()
+
+app.add_middleware(AdmissionMiddleware)
+app.add_middleware(MetricsMiddleware)
+
 # Add CORS middleware if needed
 from fastapi.middleware.cors import CORSMiddleware
 app.add_middleware(
@@ -0,0 +1,412 @@
+from fastapi import FastAPI, HTTPException, Request
+from pydantic import BaseModel
+from typing import List, Dict, Any, Callable, Optional, Tuple, Union
+import numpy as np
+import asyncio
+import hmac
+import importlib.util
+import json
+import os
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Manifest listing the hosted models; paths in it are relative to the manifest's directory
+MODEL_PATH = os.path.abspath(os.getenv("MODEL_PATH", os.path.join(os.path.dirname(__file__), "models.json")))
+
+# Loaded models are evicted least recently used first once their estimated memory exceeds this
+MODEL_MEMORY_BUDGET_MB = float(os.getenv("MODEL_MEMORY_BUDGET_MB", "{{ memory_budget_mb | default(1024) }}"))
+
+# Number of threads that run inference off the event loop. 0 means min(4, CPU count).
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "{{ inference_workers | default(0) }}")) or min(4, os.cpu_count() or 1)
+
+# Bearer token for the /admin endpoints, which are disabled while it is unset
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+with open(MODEL_PATH, encoding="utf-8") as f:
+    manifest = json.load(f)
+MODEL_SPECS: Dict[Tuple[str, str], Dict[str, Any]] = {
+    (spec["name"], spec["version"]): spec for spec in manifest["models"]
+}
+# Version served for /models/{name}/latest/..., chosen by the registry at deploy time
+LATEST_VERSIONS: Dict[str, str] = manifest.get("latest", {})
+logger.info(f"Hosting {len(MODEL_SPECS)} model version(s) from {MODEL_PATH}")
+
+class Input(BaseModel):
+    features: List[float]
+
+class Prediction(BaseModel):
+    prediction: Union[int, float, str, List[float]]
+    probabilities: Optional[List[float]] = None
+
+class BatchInput(BaseModel):
+    features: List[List[float]]
+
+class BatchPrediction(BaseModel):
+    predictions: List[Union[int, float, str, List[float]]]
+    probabilities: Optional[List[List[float]]] = None
+
+PredictFn = Callable[[np.ndarray], Tuple[np.ndarray, Optional[np.ndarray]]]
+
+def _artifact_path(spec: Dict[str, Any], key: str = "path") -> str:
+    return os.path.join(os.path.dirname(MODEL_PATH), spec[key])
+
+def _scores_to_predictions(output: np.ndarray, n_rows: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Turn raw network outputs into class predictions and probabilities."""
+    output = output.reshape(n_rows, -1)
+    if output.shape[1] == 1:
+        prob = output[:, 0].astype(float)
+        return np.rint(prob).astype(int), np.stack([1 - prob, prob], axis=1)
+    exp_scores = np.exp(output - np.max(output, axis=1, keepdims=True))
+    probabilities = exp_scores / exp_scores.sum(axis=1, keepdims=True)
+    return np.argmax(probabilities, axis=1), probabilities
+
+def _load_sklearn(spec: Dict[str, Any]) -> PredictFn:
+    import joblib
+    model = joblib.load(_artifact_path(spec))
+
+    def predict(features: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        if hasattr(model, 'predict_proba'):
+            probabilities = np.asarray(model.predict_proba(features))
+            classes = getattr(model, 'classes_', None)
+            if classes is not None and len(classes) == probabilities.shape[1]:
+                return np.asarray(classes)[np.argmax(probabilities, axis=1)], probabilities
+            return np.asarray(model.predict(features)), probabilities
+        return np.asarray(model.predict(features)), None
+    return predict
+
+def _load_pytorch(spec: Dict[str, Any]) -> PredictFn:
+    import torch
+    path = _artifact_path(spec)
+    try:
+        model = torch.load(path, map_location="cpu", weights_only=False)
+    except TypeError:  # PyTorch < 1.13 has no weights_only argument
+        model = torch.load(path, map_location="cpu")
+
+    if not isinstance(model, torch.nn.Module):
+        # A state dict: rebuild the network from the class file shipped next to it
+        if not spec.get("model_class"):
+            raise ValueError("Model is a state_dict and no model class file was deployed with it")
+        module_name = f"model_class_{spec['name']}_{spec['version']}".replace(".", "_").replace("-", "_")
+        module_spec = importlib.util.spec_from_file_location(module_name, _artifact_path(spec, "model_class"))
+        module = importlib.util.module_from_spec(module_spec)
+        sys.modules[module_name] = module
+        module_spec.loader.exec_module(module)
+        model_class = next(
+            (obj for obj in vars(module).values()
+             if isinstance(obj, type) and issubclass(obj, torch.nn.Module) and obj is not torch.nn.Module),
+            None
+        )
+        if model_class is None:
+            raise ValueError(f"No PyTorch model class found in {spec['model_class']}")
+        state_dict = model
+        model = model_class()
+        model.load_state_dict(state_dict.get('state_dict', state_dict))
+    model.eval()
+
+    def predict(features: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        with torch.no_grad():
+            output = model(torch.as_tensor(features, dtype=torch.float32))
+        if isinstance(output, (list, tuple)):
+            output = output[0]
+        return _scores_to_predictions(output.cpu().numpy(), len(features))
+    return predict
+
+def _load_tensorflow(spec: Dict[str, Any]) -> PredictFn:
+    import tensorflow as tf
+    path = _artifact_path(spec)
+    if os.path.isdir(path):
+        signature = tf.saved_model.load(path).signatures["serving_default"]
+        input_name, input_spec = next(iter(signature.structured_input_signature[1].items()))
+        output_name = sorted(signature.structured_outputs)[0]
+
+        def serve(features):
+            return signature(**{input_name: tf.convert_to_tensor(features, dtype=input_spec.dtype)})[output_name]
+    else:
+        model = tf.keras.models.load_model(path)
+        try:
+            row_shape = list(model.inputs[0].shape[1:])
+        except (AttributeError, IndexError, TypeError, ValueError):
+            row_shape = None
+
+        @tf.function(input_signature=[tf.TensorSpec([None] + row_shape if row_shape is not None else None, tf.float32)])
+        def serve(features):
+            return model(features, training=False)
+
+    def predict(features: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        output = serve(tf.convert_to_tensor(features, dtype=tf.float32))
+        prediction = np.asarray(output[0] if isinstance(output, (list, tuple)) else output)
+        if prediction.ndim > 1:
+            if prediction.shape[1] > 1:
+                return np.argmax(prediction, axis=1), prediction
+            prob = prediction[:, 0].astype(float)
+            return (prob >= 0.5).astype(int), np.stack([1 - prob, prob], axis=1)
+        return prediction.astype(float), None
+    return predict
+
+LOADERS: Dict[str, Callable[[Dict[str, Any]], PredictFn]] = {
+    'sklearn': _load_sklearn,
+    'pytorch': _load_pytorch,
+    'tensorflow': _load_tensorflow,
+}
+
+def _rss_bytes() -> Optional[int]:
+    """Return the resident set size of this process in bytes, where /proc is available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+def _artifact_bytes(path: str) -> int:
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+    return os.path.getsize(path)
+
+# Loads run one at a time so each RSS delta is attributed to a single model
+_load_lock = threading.Lock()
+
+def _load_model(spec: Dict[str, Any]) -> Tuple[PredictFn, float, int]:
+    """
+    Load one model and estimate the memory it holds.
+
+    The estimate is the growth in RSS while loading, but never less than the artifact's size
+    on disk, because memory freed by evicted models is reused without growing RSS.
+
+    Returns:
+        Tuple of (predict function, load seconds, estimated bytes)
+    """
+    with _load_lock:
+        before = _rss_bytes()
+        start = time.perf_counter()
+        predict = LOADERS[spec["framework"]](spec)
+        seconds = time.perf_counter() - start
+        after = _rss_bytes()
+    grown = after - before if before is not None and after is not None else 0
+    return predict, seconds, max(grown, _artifact_bytes(_artifact_path(spec)))
+
+class ModelCache:
+    """
+    Loaded models, evicted least recently used first to stay within a memory budget.
+
+    Models load on first use, off the event loop. Concurrent requests for a model that is
+    loading wait for that single load. Requests still running on an evicted model keep it
+    alive until they finish. A model larger than the whole budget is still served, alone.
+    """
+
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = budget_bytes
+        self.used_bytes = 0
+        self._models: "OrderedDict[Tuple[str, str], Tuple[PredictFn, int]]" = OrderedDict()
+        self._loading: Dict[Tuple[str, str], asyncio.Future] = {}
+        self.stats: Dict[Tuple[str, str], Dict[str, Any]] = {
+            key: {"loaded": False, "hits": 0, "loads": 0, "evictions": 0, "load_seconds": None,
+                  "memory_bytes": None, "last_used": None, "error": None}
+            for key in MODEL_SPECS
+        }
+
+    async def get(self, key: Tuple[str, str]) -> PredictFn:
+        """Return the predict function for a model, loading it (and evicting others) if needed."""
+        stats = self.stats[key]
+        stats["last_used"] = time.time()
+        cached = self._models.get(key)
+        if cached is not None:
+            self._models.move_to_end(key)
+            stats["hits"] += 1
+            return cached[0]
+
+        pending = self._loading.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading[key] = future
+        try:
+            predict, seconds, memory_bytes = await asyncio.get_running_loop().run_in_executor(
+                None, _load_model, MODEL_SPECS[key]
+            )
+        except Exception as e:
+            stats["error"] = str(e)
+            future.set_exception(e)
+            future.exception()  # Retrieved here; waiters, if any, re-raise it
+            raise
+        else:
+            stats.update(loaded=True, loads=stats["loads"] + 1, load_seconds=round(seconds, 3),
+                         memory_bytes=memory_bytes, error=None)
+            self._models[key] = (predict, memory_bytes)
+            self.used_bytes += memory_bytes
+            self._evict(keep=key)
+            logger.info(f"Loaded {key[0]} v{key[1]} in {seconds:.2f}s (~{memory_bytes / 2**20:.1f} MiB, "
+                        f"{self.used_bytes / 2**20:.1f}/{self.budget_bytes / 2**20:.0f} MiB in use)")
+            future.set_result(predict)
+            return predict
+        finally:
+            del self._loading[key]
+
+    def _evict(self, keep: Tuple[str, str]) -> None:
+        while self.used_bytes > self.budget_bytes and len(self._models) > 1:
+            key = next(iter(self._models))
+            if key == keep:
+                break
+            _, memory_bytes = self._models.pop(key)
+            self.used_bytes -= memory_bytes
+            self.stats[key]["loaded"] = False
+            self.stats[key]["evictions"] += 1
+            logger.info(f"Evicted {key[0]} v{key[1]} (~{memory_bytes / 2**20:.1f} MiB) to stay within the memory budget")
+
+model_cache = ModelCache(int(MODEL_MEMORY_BUDGET_MB * 2**20))
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Create the inference thread pool on first use."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+    return _executor
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Release the inference thread pool on shutdown."""
+    global _executor
+    try:
+        yield
+    finally:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+
+app = FastAPI(lifespan=lifespan)
+
+def _resolve(name: str, version: str) -> Tuple[str, str]:
+    """Map a URL's model name and version (or "latest") to a manifest key, or raise 404."""
+    if version == "latest":
+        version = LATEST_VERSIONS.get(name, "")
+    key = (name, version)
+    if key not in MODEL_SPECS:
+        raise HTTPException(status_code=404, detail={"error": "Model not found", "message": f"No model {name} version {version or 'latest'}"})
+    return key
+
+async def _score(name: str, version: str, features: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    key = _resolve(name, version)
+    try:
+        predict = await model_cache.get(key)
+    except Exception as e:
+        logger.error(f"Failed to load {name} v{key[1]}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail={"error": "Model failed to load", "message": str(e)})
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_executor(), predict, features)
+    except Exception as e:
+        logger.error(f"Prediction error for {name} v{key[1]}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail={"error": "Prediction failed", "message": str(e)})
+
+def _to_python(value: Any) -> Any:
+    return value.item() if hasattr(value, "item") else value
+
+@app.get("/live")
+async def liveness():
+    """Liveness probe."""
+    return {"status": "alive"}
+
+@app.get("/ready")
+async def readiness():
+    """Readiness probe; models load on first use, so the service is ready once the manifest is read."""
+    return {"status": "ready", "models": len(MODEL_SPECS)}
+
+@app.get("/health")
+async def health_check():
+    """Health check endpoint"""
+    return {
+        "status": "healthy",
+        "models": len(MODEL_SPECS),
+        "loaded": sum(stats["loaded"] for stats in model_cache.stats.values()),
+        "memory_used_bytes": model_cache.used_bytes,
+        "memory_budget_bytes": model_cache.budget_bytes,
+    }
+
+@app.get("/models")
+async def list_models():
+    """List the hosted models and whether each is currently loaded."""
+    return {"models": [
+        {
+            "name": spec["name"],
+            "version": spec["version"],
+            "framework": spec["framework"],
+            "latest": LATEST_VERSIONS.get(spec["name"]) == spec["version"],
+            "loaded": model_cache.stats[key]["loaded"],
+        }
+        for key, spec in MODEL_SPECS.items()
+    ]}
+
+@app.post("/models/{name}/{version}/predict", response_model=Prediction)
+async def predict(name: str, version: str, payload: Input):
+    """Predict one row with the given model version ("latest" for the newest)."""
+    features = np.asarray(payload.features, dtype=float).reshape(1, -1)
+    predictions, probabilities = await _score(name, version, features)
+    prediction = predictions[0]
+    return {
+        "prediction": prediction.tolist() if isinstance(prediction, np.ndarray) else _to_python(prediction),
+        "probabilities": probabilities[0].tolist() if probabilities is not None else None,
+    }
+
+@app.post("/models/{name}/{version}/predict/batch", response_model=BatchPrediction)
+async def predict_batch(name: str, version: str, payload: BatchInput):
+    """Predict many rows with the given model version in one forward pass."""
+    try:
+        features = np.asarray(payload.features, dtype=float)
+    except ValueError:
+        raise HTTPException(status_code=422, detail={"error": "Ragged batch", "message": "All rows must have the same number of features"})
+    if features.ndim != 2 or features.size == 0:
+        raise HTTPException(status_code=422, detail={"error": "Empty batch", "message": "Expected at least one row of features"})
+    predictions, probabilities = await _score(name, version, features)
+    return {
+        "predictions": predictions.tolist(),
+        "probabilities": probabilities.tolist() if probabilities is not None else None,
+    }
+
+def _require_admin(request: Request) -> None:
+    """Accept only requests carrying the ADMIN_TOKEN bearer token; /admin is disabled without one."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(
+            status_code=403,
+            detail={"error": "Admin endpoints disabled", "message": "Set ADMIN_TOKEN to enable them"}
+        )
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(
+            status_code=401,
+            detail={"error": "Unauthorized", "message": "A valid bearer token is required"},
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+
+@app.get("/admin/models")
+async def admin_models(request: Request):
+    """Per-model load time, estimated memory, hit, load and eviction counts, and cache totals."""
+    _require_admin(request)
+    return {
+        "memory_budget_bytes": model_cache.budget_bytes,
+        "memory_used_bytes": model_cache.used_bytes,
+        "rss_bytes": _rss_bytes(),
+        "models": [
+            {"name": name, "version": version, **stats}
+            for (name, version), stats in model_cache.stats.items()
+        ],
+    }
+
+# Add CORS middleware if needed
+from fastapi.middleware.cors import CORSMiddleware
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],  # In production, replace with specific origins
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
@@ -0,0 +1,58 @@
+# Gunicorn configuration for the generated API
+#
+# Runs several uvicorn worker processes behind one gunicorn master. With preload enabled
+# the master imports main.py, and therefore loads the model, once before forking, so
+# workers share the model's memory pages copy-on-write instead of each holding a copy.
+import gc
+import math
+import os
+from pathlib import Path
+
+def _cpu_limit(cgroup_root: str = "/sys/fs/cgroup") -> int:
+    """Return the number of CPUs this container may use, honouring cgroup CPU quotas."""
+    root = Path(cgroup_root)
+    quota = period = None
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        value, period_value = (root / "cpu.max").read_text().split()
+        if value != "max":
+            quota, period = int(value), int(period_value)
+    except (OSError, ValueError):
+        try:
+            # cgroup v1: quota is -1 when unlimited
+            value = int((root / "cpu" / "cpu.cfs_quota_us").read_text())
+            if value > 0:
+                quota, period = value, int((root / "cpu" / "cpu.cfs_period_us").read_text())
+        except (OSError, ValueError):
+            pass
+
+    try:
+        available = len(os.sched_getaffinity(0))
+    except AttributeError:  # Not available on every platform
+        available = os.cpu_count() or 1
+    if quota and period:
+        available = min(available, math.ceil(quota / period))
+    return max(1, available)
+
+# One worker per usable CPU unless WEB_CONCURRENCY is set; 0 means derive from the CPU quota
+workers = int(os.getenv("WEB_CONCURRENCY", "{{ workers | default(0) }}")) or _cpu_limit()
+worker_class = "uvicorn_worker.UvicornWorker"
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+preload_app = os.getenv("GUNICORN_PRELOAD", "{{ 'true' if preload | default(true) else 'false' }}").lower() in ("1", "true", "yes")
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+
+# Split the CPUs between workers so inference threads and BLAS pools do not oversubscribe them
+_threads_per_worker = str(max(1, _cpu_limit() // workers))
+os.environ.setdefault("INFERENCE_WORKERS", _threads_per_worker)
+os.environ.setdefault("OMP_NUM_THREADS", _threads_per_worker)
+
+# A preloading master must load the model while importing the app for workers to share it;
+# without preload each worker loads it in the background after binding
+os.environ.setdefault("MODEL_LOAD_MODE", "sync" if preload_app else "background")
+
+def when_ready(server):
+    """Freeze objects created while preloading so worker reference counting does not copy their pages."""
+    if preload_app:
+        gc.freeze()
+    server.log.info(f"Serving with {workers} worker(s), preload={'on' if preload_app else 'off'}")
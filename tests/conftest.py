@@ -15,11 +15,12 @@ def temp_registry():
     
     yield registry
     
-    # Clean up
-    try:
-        os.unlink(registry_path)
-    except:
-        pass
+    # Clean up the registry and its lock file
+    for path in (registry_path, registry_path + '.lock'):
+        try:
+            os.unlink(path)
+        except:
+            pass
 
 @pytest.fixture
 def sample_model():
@@ -31,3 +32,61 @@ def sample_model():
         'framework': 'sklearn',
         'description': 'A test model'
     }
+
+@pytest.fixture
+def generated_app(tmp_path, monkeypatch):
+    """Return a factory that renders the FastAPI template for a model and imports it."""
+    import importlib.util
+    import uuid
+    import joblib
+    from deploywizard.scaffolder.api_generator import APIGenerator
+
+    monkeypatch.delenv("MODEL_PATH", raising=False)
+
+    def _generate(model, framework='sklearn', model_name='model.pkl', env=None, **template_vars):
+        # Load at import so tests can use the model without running the app's lifespan
+        env = {"MODEL_LOAD_MODE": "sync", **(env or {})}
+        for key, value in env.items():
+            monkeypatch.setenv(key, str(value))
+
+        app_dir = tmp_path / "app"
+        app_dir.mkdir(exist_ok=True)
+        model_path = app_dir / model_name
+        if isinstance(model, bytes):
+            model_path.write_bytes(model)
+        elif framework == 'pytorch':
+            import torch
+            torch.save(model, model_path)
+        elif framework == 'tensorflow':
+            model.save(model_path)
+        else:
+            joblib.dump(model, model_path)
+
+        APIGenerator().generate(
+            model_path=str(model_path),
+            framework=framework,
+            output_dir=str(tmp_path),
+            template_vars={'model_name': model_name, **template_vars}
+        )
+
+        module_name = f"generated_main_{uuid.uuid4().hex[:8]}"
+        spec = importlib.util.spec_from_file_location(module_name, str(app_dir / "main.py"))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+
+    return _generate
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--run-benchmarks", action="store_true", default=False,
+        help="run timing-sensitive benchmarks marked with @pytest.mark.benchmark"
+    )
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--run-benchmarks"):
+        return
+    skip_benchmark = pytest.mark.skip(reason="timing-sensitive benchmark, use --run-benchmarks to run")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip_benchmark)
@@ -101,7 +101,16 @@ def test_generate_with_custom_vars(tmp_path):
         )
         
         # Verify requirements were generated
-        mock_gen_reqs.assert_called_once_with(Path(str(output_dir)) / "app", "pytorch")
+        mock_gen_reqs.assert_called_once_with(
+            Path(str(output_dir)) / "app",
+            "pytorch",
+            {
+                "framework": "pytorch",
+                "model_name": "model.pkl",
+                "model_class_available": True,
+                "custom_var": "value"
+            }
+        )
 
 def test_template_loading_error():
     """Test error handling when template is not found."""
@@ -120,3 +129,88 @@ def test_template_loading_error():
                 api_type="fastapi"
             )
         assert "Template not found" in str(excinfo.value)
+
+@pytest.mark.parametrize("framework", ["sklearn", "pytorch", "tensorflow"])
+@pytest.mark.parametrize("template_vars", [
+    {},
+    {"batching": True, "max_batch_size": 16, "max_batch_wait_ms": 2},
+    {"fast_json": True},
+    {"cache_size": 128, "torchscript_model": "model.torchscript.pt"},
+    {"runtime": "onnx"},
+    {"jit_compile": True},
+    {"warmup_batch_sizes": "", "warmup_input_shape": "3,224,224"},
+    {"watch_interval": 5, "torchscript_model": "model.torchscript.pt"},
+    {"mmap": True},
+    {"max_in_flight": 8, "max_queue": 0, "request_deadline_ms": 0, "shed_status_code": 429},
+])
+def test_generated_main_is_valid_python(tmp_path, framework, template_vars):
+    """Test that the rendered application compiles for every framework and option set."""
+    generator = APIGenerator()
+    generator.generate(
+        model_path="model.pkl",
+        framework=framework,
+        output_dir=str(tmp_path),
+        template_vars=template_vars
+    )
+    
+    source = (tmp_path / "app" / "main.py").read_text()
+    compile(source, "main.py", "exec")
+
+def test_fast_json_adds_orjson_requirement(tmp_path):
+    """Test that the fast JSON option adds orjson to the generated requirements."""
+    generator = APIGenerator()
+    generator.generate(model_path="model.pkl", framework="sklearn", output_dir=str(tmp_path / "default"))
+    generator.generate(
+        model_path="model.pkl",
+        framework="sklearn",
+        output_dir=str(tmp_path / "fast"),
+        template_vars={"fast_json": True}
+    )
+    
+    assert "orjson" not in (tmp_path / "default" / "app" / "requirements.txt").read_text()
+    assert "orjson>=3.6.0" in (tmp_path / "fast" / "app" / "requirements.txt").read_text()
+
+def test_workers_add_gunicorn_requirements(tmp_path):
+    """Test that multi-worker serving adds gunicorn and the uvicorn worker class."""
+    generator = APIGenerator()
+    generator.generate(
+        model_path="model.pkl",
+        framework="sklearn",
+        output_dir=str(tmp_path),
+        template_vars={"workers": 0}
+    )
+    
+    requirements = (tmp_path / "app" / "requirements.txt").read_text()
+    assert "gunicorn>=20.1.0" in requirements
+    assert "uvicorn-worker>=0.2.0" in requirements
+
+def test_onnx_runtime_requirements(tmp_path):
+    """Test that the ONNX runtime replaces the training framework in the requirements."""
+    generator = APIGenerator()
+    generator.generate(
+        model_path="model.onnx",
+        framework="pytorch",
+        output_dir=str(tmp_path),
+        template_vars={"runtime": "onnx"}
+    )
+    
+    requirements = (tmp_path / "app" / "requirements.txt").read_text()
+    assert "onnxruntime>=1.10.0" in requirements
+    assert "torch" not in requirements
+    assert "import torch" not in (tmp_path / "app" / "main.py").read_text()
+
+def test_generate_multi_renders_multi_model_app(tmp_path):
+    """Test that the multi-model template compiles and lists every framework's requirements."""
+    generator = APIGenerator()
+    generator.generate_multi(
+        frameworks=["sklearn", "pytorch", "tensorflow"],
+        output_dir=str(tmp_path),
+        template_vars={"memory_budget_mb": 256}
+    )
+    
+    source = (tmp_path / "app" / "main.py").read_text()
+    compile(source, "main.py", "exec")
+    assert 'MODEL_MEMORY_BUDGET_MB", "256"' in source
+    requirements = (tmp_path / "app" / "requirements.txt").read_text()
+    for package in ("scikit-learn", "torch", "tensorflow"):
+        assert package in requirements
@@ -0,0 +1,325 @@
+"""
+Micro-benchmarks for generated services.
+
+Each test prints its measurements. Tests whose assertions depend on wall-clock
+timing are marked ``benchmark`` and only run with ``pytest --run-benchmarks``.
+"""
+import asyncio
+import json
+import os
+import time
+import pytest
+import numpy as np
+
+pytest.importorskip("fastapi")
+httpx = pytest.importorskip("httpx")
+
+class SlowModel:
+    """Regressor whose predict blocks for a fixed time, like a heavy native forward pass."""
+    
+    def __init__(self, delay: float):
+        self.delay = delay
+    
+    def predict(self, features):
+        time.sleep(self.delay)
+        return np.zeros(len(features))
+
+def _percentile(samples, q):
+    return float(np.percentile(np.asarray(samples), q))
+
+async def _health_latencies(client, count, interval=0.005):
+    """Probe /health on a fixed schedule, timing each probe from when it was due."""
+    latencies = []
+    for _ in range(count):
+        due = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        response = await client.get("/health")
+        latencies.append(time.perf_counter() - due)
+        assert response.status_code == 200
+    return latencies
+
+@pytest.mark.benchmark
+def test_health_latency_flat_while_predict_saturated(generated_app):
+    """Benchmark /health p99 latency while every inference thread is busy."""
+    delay = 0.1
+    main = generated_app(SlowModel(delay), env={"INFERENCE_WORKERS": "2"})
+    
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            idle = await _health_latencies(client, 20)
+            
+            async def load():
+                # Keep both inference threads busy for the whole probing window
+                pending = []
+                for _ in range(24):
+                    pending.append(asyncio.ensure_future(client.post("/predict", json={"features": [0.0, 1.0]})))
+                    await asyncio.sleep(0.01)
+                return await asyncio.gather(*pending)
+            
+            load_task = asyncio.ensure_future(load())
+            await asyncio.sleep(0.02)
+            saturated = await _health_latencies(client, 40)
+            responses = await load_task
+        return idle, saturated, responses
+    
+    idle, saturated, responses = asyncio.run(run())
+    
+    assert all(r.status_code == 200 for r in responses)
+    idle_p99 = _percentile(idle, 99)
+    saturated_p99 = _percentile(saturated, 99)
+    print(f"\n/health p99 idle={idle_p99 * 1000:.2f}ms saturated={saturated_p99 * 1000:.2f}ms "
+          f"(inference={delay * 1000:.0f}ms, 24 requests on 2 workers)")
+    
+    # If inference ran on the event loop, /health would wait behind whole forward passes
+    assert saturated_p99 < delay * 0.75
+
+@pytest.mark.benchmark
+def test_admission_control_bounds_latency_under_overload(generated_app):
+    """Benchmark served-request latency for a burst beyond capacity, with and without a bounded queue."""
+    delay, burst = 0.02, 120
+    
+    async def run(main):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            async def post():
+                start = time.perf_counter()
+                response = await client.post("/predict", json={"features": [0.0, 1.0]})
+                return response.status_code, time.perf_counter() - start
+            return await asyncio.gather(*(post() for _ in range(burst)))
+    
+    served_p99 = {}
+    for label, env in [
+        ("unbounded", {"MAX_IN_FLIGHT": "1000", "MAX_QUEUE": "1000", "REQUEST_DEADLINE_MS": "0"}),
+        ("bounded", {"MAX_IN_FLIGHT": "4", "MAX_QUEUE": "4"}),
+    ]:
+        main = generated_app(SlowModel(delay), env={"INFERENCE_WORKERS": "2", "WARMUP_BATCH_SIZES": "", **env})
+        results = asyncio.run(run(main))
+        served = [seconds for status, seconds in results if status == 200]
+        shed = [seconds for status, seconds in results if status == 503]
+        served_p99[label] = _percentile(served, 99)
+        print(f"\n{label}: {len(served)} served (p99 {served_p99[label] * 1000:.0f}ms), {len(shed)} shed"
+              + (f" (p99 {_percentile(shed, 99) * 1000:.1f}ms)" if shed else ""))
+        if label == "bounded":
+            assert shed and _percentile(shed, 99) < delay
+        else:
+            assert len(served) == burst
+    
+    # Without a bound every request queues behind the whole burst
+    assert served_p99["bounded"] < served_p99["unbounded"] / 3
+
+def _sklearn_model():
+    from sklearn.datasets import load_iris
+    X, y = load_iris(return_X_y=True)
+    model = CountingForest(n_estimators=50, random_state=0).fit(X, y)
+    return model, 'model.pkl', X[:1], lambda m: (lambda: m.forward_passes)
+
+def _pytorch_model():
+    torch = pytest.importorskip("torch")
+    model = torch.nn.Sequential(torch.nn.Linear(4, 16), torch.nn.ReLU(), torch.nn.Linear(16, 3)).eval()
+    
+    def instrument(m):
+        calls = []
+        m.register_forward_hook(lambda module, inputs, output: calls.append(1))
+        return lambda: len(calls)
+    
+    return model, 'model.pt', np.random.RandomState(0).rand(1, 4), instrument
+
+def _tensorflow_model():
+    tf = pytest.importorskip("tensorflow")
+    
+    @tf.keras.utils.register_keras_serializable(package="deploywizard_tests")
+    class CountingLayer(tf.keras.layers.Layer):
+        """Identity layer whose counter is part of the graph, so it counts compiled executions too."""
+        
+        def build(self, input_shape):
+            self.calls = self.add_weight(name="calls", shape=(), initializer="zeros",
+                                         trainable=False, dtype="int64")
+        
+        def call(self, inputs):
+            self.calls.assign_add(1)
+            return inputs
+    
+    model = tf.keras.Sequential([
+        tf.keras.Input(shape=(4,)),
+        CountingLayer(),
+        tf.keras.layers.Dense(3, activation="softmax"),
+    ])
+    
+    def instrument(m):
+        counter = m.layers[0].calls
+        start = int(counter.numpy())
+        return lambda: int(counter.numpy()) - start
+    
+    return model, 'model.keras', np.random.RandomState(0).rand(1, 4), instrument
+
+try:
+    from sklearn.ensemble import RandomForestClassifier
+    
+    class CountingForest(RandomForestClassifier):
+        """Random forest that counts how many times the ensemble is evaluated."""
+        
+        forward_passes = 0
+        
+        def predict_proba(self, X):
+            self.forward_passes += 1
+            return super().predict_proba(X)
+        
+        def predict(self, X):
+            self.forward_passes += 1
+            return super().predict(X)
+except ImportError:  # pragma: no cover
+    CountingForest = None
+
+@pytest.mark.parametrize("framework,builder", [
+    ("sklearn", _sklearn_model),
+    ("pytorch", _pytorch_model),
+    ("tensorflow", _tensorflow_model),
+])
+def test_single_forward_pass_per_prediction(generated_app, framework, builder):
+    """Benchmark per-request inference latency and check each request runs the model once."""
+    model, model_name, features, instrument = builder()
+    main = generated_app(model, framework=framework, model_name=model_name)
+    forward_passes = instrument(model)
+    
+    iterations = 50
+    start = time.perf_counter()
+    for _ in range(iterations):
+        predictions, probabilities = main._predict_batch(model, features)
+    elapsed = time.perf_counter() - start
+    
+    print(f"\n{framework}: {elapsed / iterations * 1000:.3f}ms per single-row prediction")
+    assert forward_passes() == iterations
+    assert probabilities is not None
+    if framework == "sklearn":
+        expected = model.predict(features)
+    elif framework == "pytorch":
+        import torch
+        with torch.no_grad():
+            expected = model(torch.as_tensor(features, dtype=torch.float32)).argmax(dim=1).numpy()
+    else:
+        expected = np.argmax(model(features).numpy(), axis=1)
+    np.testing.assert_array_equal(predictions, expected)
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("jit_compile", [False, True])
+def test_tensorflow_serving_function_faster_than_predict(generated_app, jit_compile):
+    """Benchmark single-row latency of Keras Model.predict against the compiled serving function."""
+    tf = pytest.importorskip("tensorflow")
+    model = tf.keras.Sequential([
+        tf.keras.Input(shape=(16,)),
+        tf.keras.layers.Dense(64, activation="relu"),
+        tf.keras.layers.Dense(3, activation="softmax"),
+    ])
+    main = generated_app(model, framework="tensorflow", model_name="model.keras",
+                         env={"TF_JIT_COMPILE": "true" if jit_compile else "false"})
+    features = np.random.RandomState(0).rand(1, 16).astype(np.float32)
+    
+    def latencies(fn, iterations=200):
+        fn()  # Exclude one-off tracing and compilation
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - start)
+        return samples
+    
+    old = latencies(lambda: main.model.predict(features, verbose=0))
+    new = latencies(lambda: main._predict_batch(main.model, features))
+    
+    print(f"\ntensorflow jit_compile={jit_compile}: Model.predict p50={_percentile(old, 50) * 1000:.3f}ms "
+          f"p99={_percentile(old, 99) * 1000:.3f}ms, tf.function p50={_percentile(new, 50) * 1000:.3f}ms "
+          f"p99={_percentile(new, 99) * 1000:.3f}ms")
+    np.testing.assert_allclose(main._predict_batch(main.model, features)[1],
+                               main.model.predict(features, verbose=0), rtol=1e-5, atol=1e-6)
+    assert _percentile(new, 50) < _percentile(old, 50)
+
+_WORKER_SCRIPT = """
+import importlib.util, json, sys
+import numpy as np
+spec = importlib.util.spec_from_file_location("main", sys.argv[1])
+main = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(main)
+main._predict_batch(main.model, np.zeros((1, main.model.n_features_in_)))
+print("loaded", flush=True)
+sys.stdin.readline()  # report once every worker has loaded, so shared pages count as shared
+print(json.dumps({**main.model_memory, **main._memory_stats(), **main._memory_sharing()}), flush=True)
+sys.stdin.readline()
+"""
+
+@pytest.mark.benchmark
+@pytest.mark.skipif(not os.path.exists("/proc/self/smaps_rollup"), reason="needs /proc/self/smaps_rollup")
+def test_mmap_workers_share_model_weights(generated_app, tmp_path):
+    """Benchmark per-worker memory of three processes serving one model, with and without mmap."""
+    import subprocess
+    import sys
+    from sklearn.linear_model import LinearRegression
+    n_features = 4_000_000  # 32 MB of float64 weights
+    model = LinearRegression()
+    model.coef_, model.intercept_, model.n_features_in_ = np.random.rand(n_features), 0.0, n_features
+    main = generated_app(model, env={"WARMUP_BATCH_SIZES": ""})
+    main_path = os.path.join(os.path.dirname(main.MODEL_PATH), "main.py")
+    
+    private = {}
+    for mmap in (False, True):
+        env = {**os.environ, "MODEL_LOAD_MODE": "sync", "MODEL_MMAP": str(mmap).lower()}
+        workers = [
+            subprocess.Popen([sys.executable, "-c", _WORKER_SCRIPT, main_path], env=env,
+                             stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+            for _ in range(3)
+        ]
+        try:
+            for worker in workers:
+                assert worker.stdout.readline().strip() == "loaded"
+            reports = []
+            for worker in workers:
+                worker.stdin.write("\n")
+                worker.stdin.flush()
+                reports.append(json.loads(worker.stdout.readline()))
+        finally:
+            for worker in workers:
+                worker.communicate("\n", timeout=30)
+        for report in reports:
+            print(f"\nmmap={mmap}: RSS {report['rss_before_load_bytes'] / 2**20:.0f} -> "
+                  f"{report['rss_after_load_bytes'] / 2**20:.0f} MiB on load, now {report['rss_bytes'] / 2**20:.0f} MiB "
+                  f"(private {report['private_bytes'] / 2**20:.0f} MiB, shared {report['shared_bytes'] / 2**20:.0f} MiB, "
+                  f"PSS {report['pss_bytes'] / 2**20:.0f} MiB)")
+        private[mmap] = np.mean([report["private_bytes"] for report in reports])
+    
+    assert private[False] - private[True] > 0.75 * model.coef_.nbytes
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("total_versions", [10_000, 100_000])
+def test_sharded_registry_cold_info_latency(tmp_path, total_versions):
+    """Benchmark a cold `info` lookup in a sharded registry against the monolithic JSON file."""
+    from deploywizard.scaffolder.model_registry import ModelRegistry
+    versions_per_model = 20
+    models = {}
+    for i in range(total_versions):
+        name, version = f"model{i // versions_per_model}", f"{i % versions_per_model}.0.0"
+        models.setdefault(name, {})[version] = {
+            "id": str(i + 1), "name": name, "version": version, "path": f"/models/{name}/{version}/model.pkl",
+            "framework": "sklearn", "description": "", "created_at": "2024-01-01T00:00:00+00:00", "tags": []
+        }
+    json_path = tmp_path / "registry.json"
+    json_path.write_text(json.dumps({"models": models, "next_id": total_versions + 1}, indent=2))
+    
+    start = time.perf_counter()
+    ModelRegistry(str(json_path), backend="sharded")  # imports registry.json into registry.d
+    migration = time.perf_counter() - start
+    
+    target = f"model{total_versions // versions_per_model // 2}"
+    latencies = {}
+    for backend in ("json", "sharded"):
+        samples = []
+        for _ in range(5):
+            # A new ModelRegistry holds no state, like a fresh `deploywizard info` process
+            start = time.perf_counter()
+            info = ModelRegistry(str(json_path), backend=backend).get_model(target)
+            samples.append(time.perf_counter() - start)
+            assert info["version"] == f"{versions_per_model - 1}.0.0"
+        latencies[backend] = _percentile(samples, 50)
+    
+    print(f"\n{total_versions} versions: cold info json={latencies['json'] * 1000:.2f}ms "
+          f"sharded={latencies['sharded'] * 1000:.2f}ms (migration {migration:.1f}s)")
+    assert latencies["sharded"] * 10 < latencies["json"]
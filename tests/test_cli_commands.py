@@ -126,6 +126,36 @@ def test_deploy_command(mock_scaffolder, tmp_path):
     mock_instance.get_model_info.assert_called_once_with("test_model", "1.0.0")
     mock_instance.generate_project.assert_called_once()
 
+@patch('deploywizard.cli.Scaffolder')
+def test_deploy_command_batching_options(mock_scaffolder, tmp_path):
+    """Test that micro-batching options are passed through to project generation."""
+    mock_instance = MagicMock()
+    mock_instance.get_model_info.return_value = {
+        'name': 'test_model',
+        'version': '1.0.0',
+        'path': str(tmp_path / 'model.pkl'),
+        'framework': 'sklearn'
+    }
+    mock_scaffolder.return_value = mock_instance
+    
+    result = runner.invoke(app, [
+        "deploy",
+        "--name", "test_model",
+        "--output", str(tmp_path / "deployment"),
+        "--batching",
+        "--max-batch-size", "64",
+        "--max-batch-wait-ms", "10"
+    ])
+    
+    assert result.exit_code == 0
+    call_args = mock_instance.generate_project.call_args[1]
+    assert call_args['batching'] is True
+    assert call_args['max_batch_size'] == 64
+    assert call_args['max_batch_wait_ms'] == 10.0
+    assert call_args['workers'] is None
+    assert call_args['preload'] is True
+    assert (call_args['max_in_flight'], call_args['max_queue'], call_args['request_deadline_ms']) == (0, 64, 10000.0)
+
 @patch('deploywizard.cli.Scaffolder')
 def test_delete_command(mock_scaffolder):
     """Test the delete command."""
@@ -147,6 +177,32 @@ def test_delete_command(mock_scaffolder):
     assert result.exit_code == 0
     mock_instance._registry.delete_model.assert_called_once_with("test_model", "1.0.0")
 
+@patch('deploywizard.cli.Scaffolder')
+def test_update_command(mock_scaffolder):
+    """Test that the update command saves its changes through the registry."""
+    # Setup mock
+    mock_instance = MagicMock()
+    current = {'id': '1', 'name': 'test_model', 'version': '1.0.0', 'path': '/m.pkl',
+               'framework': 'sklearn', 'description': '', 'created_at': '2024-01-01T00:00:00'}
+    mock_instance.get_model_info.side_effect = lambda name, version=None: current if name == 'test_model' and version in (None, '1.0.0') else None
+    mock_instance._registry.update_model.return_value = {**current, 'version': '1.1.0', 'description': 'tuned'}
+    mock_scaffolder.return_value = mock_instance
+    
+    # Run command
+    result = runner.invoke(app, [
+        "update",
+        "--name", "test_model",
+        "--new-version", "1.1.0",
+        "--description", "tuned"
+    ])
+    
+    # Verify
+    assert result.exit_code == 0, result.output
+    assert "Successfully updated test_model v1.1.0" in result.output
+    mock_instance._registry.update_model.assert_called_once_with(
+        "test_model", "1.0.0", new_version="1.1.0", description="tuned"
+    )
+
 def test_version_command():
     """Test the version command."""
     # Test version flag
@@ -467,3 +523,49 @@ def test_init_command_with_defaults(mock_scaffolder, tmp_path):
     assert generate_args['version'] == '1.0.0'
     assert generate_args['api_type'] == 'fastapi'  # Default
     assert generate_args['model_class_path'] == str(model_class_path)
+
+@patch('deploywizard.cli.Scaffolder')
+def test_deploy_multi_command(mock_scaffolder, tmp_path):
+    """Test that deploy-multi passes the selected models and memory budget through."""
+    mock_instance = MagicMock()
+    mock_instance.generate_multi_project.return_value = [
+        {'name': 'a', 'version': '1.0.0', 'framework': 'sklearn'},
+        {'name': 'b', 'version': '2.0.0', 'framework': 'pytorch'},
+    ]
+    mock_scaffolder.return_value = mock_instance
+    
+    result = runner.invoke(app, [
+        "deploy-multi",
+        "--model", "a",
+        "--model", "b:2.0.0",
+        "--output", str(tmp_path / "service"),
+        "--memory-budget-mb", "256"
+    ])
+    
+    assert result.exit_code == 0
+    assert "/models/b/2.0.0/predict" in result.stdout
+    call_args = mock_instance.generate_multi_project.call_args[1]
+    assert call_args['models'] == ["a", "b:2.0.0"]
+    assert call_args['memory_budget_mb'] == 256.0
+
+@patch('deploywizard.cli.Scaffolder')
+def test_deploy_command_quantize_option(mock_scaffolder, tmp_path):
+    """Test that --quantize is passed through to project generation."""
+    mock_instance = MagicMock()
+    mock_instance.get_model_info.return_value = {
+        'name': 'test_model',
+        'version': '1.0.0',
+        'path': str(tmp_path / 'model.pt'),
+        'framework': 'pytorch'
+    }
+    mock_scaffolder.return_value = mock_instance
+    
+    result = runner.invoke(app, [
+        "deploy",
+        "--name", "test_model",
+        "--output", str(tmp_path / "deployment"),
+        "--quantize", "dynamic-int8"
+    ])
+    
+    assert result.exit_code == 0
+    assert mock_instance.generate_project.call_args[1]['quantize'] == "dynamic-int8"
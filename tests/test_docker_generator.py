@@ -210,3 +210,50 @@ def test_docker_generator_with_extra_args(tmp_path):
     # Verify the template variables were used correctly
     assert 'COPY --chown=appuser:appuser app/requirements.txt .' in dockerfile_content
     assert 'COPY --chown=appuser:appuser app/model.pkl /app/' in dockerfile_content
+
+def test_generate_gunicorn_workers(tmp_path, monkeypatch):
+    """Test that requesting workers switches the container to gunicorn with a config file."""
+    # The config sets thread-count defaults in os.environ, keep them out of other tests
+    monkeypatch.setattr(os, "environ", dict(os.environ))
+    generator = DockerGenerator()
+    output_dir = tmp_path / "output"
+    
+    generator.generate(
+        output_dir=str(output_dir),
+        template_vars={'model_name': 'model.pkl', 'workers': 0, 'preload': True}
+    )
+    
+    dockerfile_content = (output_dir / "Dockerfile").read_text()
+    assert 'CMD ["gunicorn", "main:app", "--config", "gunicorn.conf.py"]' in dockerfile_content
+    assert 'CMD ["uvicorn"' not in dockerfile_content
+    
+    config_path = output_dir / "app" / "gunicorn.conf.py"
+    config = {}
+    exec(compile(config_path.read_text(), str(config_path), "exec"), config)
+    assert config['worker_class'] == "uvicorn_worker.UvicornWorker"
+    assert config['preload_app'] is True
+    assert config['workers'] >= 1
+    assert os.environ["MODEL_LOAD_MODE"] == "sync"
+
+@pytest.mark.parametrize("files,expected", [
+    ({"cpu.max": "200000 100000\n"}, 2),
+    ({"cpu.max": "150000 100000\n"}, 2),
+    ({"cpu/cpu.cfs_quota_us": "100000\n", "cpu/cpu.cfs_period_us": "100000\n"}, 1),
+])
+def test_gunicorn_workers_follow_cpu_quota(tmp_path, monkeypatch, files, expected):
+    """Test that the generated config derives CPUs from cgroup v2 and v1 quotas."""
+    monkeypatch.setattr(os, "environ", dict(os.environ))
+    generator = DockerGenerator()
+    generator.generate_gunicorn_config(output_dir=str(tmp_path), workers=4, preload=False)
+    config = {}
+    exec((tmp_path / "app" / "gunicorn.conf.py").read_text(), config)
+    
+    cgroup = tmp_path / "cgroup"
+    for name, content in files.items():
+        (cgroup / name).parent.mkdir(parents=True, exist_ok=True)
+        (cgroup / name).write_text(content)
+    
+    assert config['workers'] == 4
+    assert config['preload_app'] is False
+    assert os.environ["MODEL_LOAD_MODE"] == "background"
+    assert config['_cpu_limit'](str(cgroup)) == min(expected, config['_cpu_limit'](str(tmp_path / "missing")))
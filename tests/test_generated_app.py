@@ -0,0 +1,927 @@
+import asyncio
+import io
+import os
+import threading
+import time
+import pytest
+from pathlib import Path
+import numpy as np
+from sklearn.datasets import load_iris
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LinearRegression
+
+pytest.importorskip("fastapi")
+httpx = pytest.importorskip("httpx")
+from fastapi.testclient import TestClient
+
+LOAD_GATE = threading.Event()
+
+class GatedModel:
+    """Regressor whose unpickling blocks until LOAD_GATE is set, like a slow-loading large model."""
+    
+    def __init__(self):
+        self.n_features_in_ = 2
+    
+    def __setstate__(self, state):
+        LOAD_GATE.wait(timeout=10)
+        self.__dict__.update(state)
+    
+    def predict(self, features):
+        return np.zeros(len(features))
+
+class ConstantModel:
+    """Regressor that predicts a constant, optionally after blocking like a slow forward pass."""
+    
+    def __init__(self, value, delay=0.0):
+        self.value = value
+        self.delay = delay
+        self.n_features_in_ = 2
+        self.calls = 0
+    
+    def predict(self, features):
+        self.calls += 1
+        time.sleep(self.delay)
+        return np.full(len(features), self.value)
+
+@pytest.fixture(scope="module")
+def iris_model():
+    """A small fitted classifier with class probabilities."""
+    X, y = load_iris(return_X_y=True)
+    return RandomForestClassifier(n_estimators=5, random_state=0).fit(X, y), X
+
+def test_predict_single_row(generated_app, iris_model):
+    """Test that /predict returns a prediction and probabilities for one row."""
+    model, X = iris_model
+    main = generated_app(model)
+    
+    with TestClient(main.app) as client:
+        response = client.post("/predict", json={"features": X[0].tolist()})
+    
+    assert response.status_code == 200
+    body = response.json()
+    assert body["prediction"] == int(model.predict(X[:1])[0])
+    assert np.allclose(body["probabilities"], model.predict_proba(X[:1])[0])
+
+def test_predict_regression(generated_app):
+    """Test that regressors without predict_proba return only a prediction."""
+    X = np.random.RandomState(0).rand(20, 3)
+    model = LinearRegression().fit(X, X.sum(axis=1))
+    main = generated_app(model)
+    
+    with TestClient(main.app) as client:
+        response = client.post("/predict", json={"features": [0.1, 0.2, 0.3]})
+    
+    assert response.status_code == 200
+    assert response.json()["prediction"] == pytest.approx(0.6)
+
+def test_predict_torchscript_model(generated_app, tmp_path):
+    """Test that a PyTorch app loads the TorchScript archive traced at scaffold time."""
+    torch = pytest.importorskip("torch")
+    from deploywizard.scaffolder.model_exporter import ModelExporter
+    model = torch.nn.Sequential(torch.nn.Linear(4, 8), torch.nn.ReLU(), torch.nn.Linear(8, 3)).eval()
+    source = tmp_path / "source.pt"
+    torch.save(model, source)
+    report = ModelExporter().export_torchscript(str(source), str(tmp_path / "app" / "model.torchscript.pt"))
+    assert report['format'] == 'torchscript'
+    
+    # As in a scaffolded project, the archive is newer than the model file it was traced from
+    future = time.time() + 60
+    os.utime(report['path'], (future, future))
+    
+    main = generated_app(model, framework='pytorch', model_name='model.pt', torchscript_model='model.torchscript.pt')
+    assert isinstance(main.model, torch.jit.ScriptModule)
+    
+    features = np.random.RandomState(0).rand(4).astype(np.float32)
+    with TestClient(main.app) as client:
+        response = client.post("/predict", json={"features": features.tolist()})
+    
+    assert response.status_code == 200
+    expected = model(torch.as_tensor(features).reshape(1, -1)).argmax(dim=1).item()
+    assert response.json()["prediction"] == expected
+
+def test_predict_quantized_torchscript_model(generated_app, tmp_path):
+    """Test that the app serves a dynamically quantized archive, whose modules expose no parameters."""
+    torch = pytest.importorskip("torch")
+    from deploywizard.scaffolder.model_exporter import ModelExporter
+    model = torch.nn.Sequential(torch.nn.Linear(4, 8), torch.nn.ReLU(), torch.nn.Linear(8, 3)).eval()
+    source = tmp_path / "source.pt"
+    torch.save(model, source)
+    report = ModelExporter().quantize_dynamic(str(source), str(tmp_path / "app" / "model.int8.torchscript.pt"),
+                                              iterations=5)
+    assert report['format'] == 'torchscript-int8'
+    future = time.time() + 60
+    os.utime(report['path'], (future, future))
+    
+    main = generated_app(model, framework='pytorch', model_name='model.pt',
+                         torchscript_model='model.int8.torchscript.pt', warmup_input_shape='4')
+    assert list(main.model.parameters()) == []
+    
+    features = np.random.RandomState(0).rand(4).astype(np.float32)
+    with TestClient(main.app) as client:
+        response = client.post("/predict", json={"features": features.tolist()})
+    
+    assert response.status_code == 200
+    assert main.warmup_status["batch_sizes"]
+    expected = model(torch.as_tensor(features).reshape(1, -1)).softmax(dim=1)
+    assert np.allclose(response.json()["probabilities"], expected.detach().numpy()[0], atol=0.05)
+
+def test_predict_onnx_runtime(generated_app, iris_model, tmp_path):
+    """Test that the ONNX runtime app returns the same predictions as the original model."""
+    pytest.importorskip("skl2onnx")
+    pytest.importorskip("onnxruntime")
+    import joblib
+    from deploywizard.scaffolder.model_exporter import ModelExporter
+    model, X = iris_model
+    joblib.dump(model, tmp_path / "source.pkl")
+    report = ModelExporter().export_onnx(str(tmp_path / "source.pkl"), 'sklearn', str(tmp_path / "model.onnx"))
+    assert report['format'] == 'onnx', report['reason']
+    
+    main = generated_app(Path(report['path']).read_bytes(), model_name='model.onnx', runtime='onnx')
+    assert main.model_loaded
+    
+    with TestClient(main.app) as client:
+        single = client.post("/predict", json={"features": X[0].tolist()})
+        batch = client.post("/predict/batch", json={"features": X[:10].tolist()})
+    
+    assert single.json()["prediction"] == int(model.predict(X[:1])[0])
+    assert batch.json()["predictions"] == model.predict(X[:10]).tolist()
+    assert np.allclose(batch.json()["probabilities"], model.predict_proba(X[:10]), atol=1e-5)
+
+def test_micro_batching_coalesces_concurrent_requests(generated_app, iris_model):
+    """Test that concurrent requests share one forward pass and each gets its own row."""
+    model, X = iris_model
+    main = generated_app(model, batching=True, max_batch_size=8, max_batch_wait_ms=50)
+    assert main.ENABLE_BATCHING
+    
+    batch_sizes = []
+    original = main._predict_batch
+    
+    def counting_predict_batch(m, features):
+        batch_sizes.append(len(features))
+        return original(m, features)
+    
+    main._predict_batch = counting_predict_batch
+    
+    async def run():
+        main.batcher.start()
+        try:
+            return await asyncio.gather(*(main.batcher.submit(X[i:i + 1]) for i in range(8)))
+        finally:
+            await main.batcher.stop()
+    
+    results = asyncio.run(run())
+    
+    assert batch_sizes == [8]
+    expected = model.predict(X[:8])
+    assert [predictions[0] for predictions, _ in results] == expected.tolist()
+
+def test_micro_batching_runs_batches_concurrently(generated_app, iris_model):
+    """Test that the batcher keeps up to INFERENCE_WORKERS batches in flight at once."""
+    import threading
+    import time
+    model, X = iris_model
+    main = generated_app(model, batching=True, max_batch_size=1, max_batch_wait_ms=0,
+                         env={"INFERENCE_WORKERS": "2"})
+    original = main._predict_batch
+    lock = threading.Lock()
+    active = [0]
+    peak = [0]
+    
+    def slow_predict_batch(m, features):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return original(m, features)
+    
+    main._predict_batch = slow_predict_batch
+    
+    async def run():
+        main.batcher.start()
+        try:
+            return await asyncio.gather(*(main.batcher.submit(X[i:i + 1]) for i in range(6)))
+        finally:
+            await main.batcher.stop()
+    
+    results = asyncio.run(run())
+    
+    assert peak[0] == 2
+    assert [predictions[0] for predictions, _ in results] == model.predict(X[:6]).tolist()
+
+def test_micro_batching_env_override(generated_app, iris_model):
+    """Test that batching settings can be overridden through environment variables."""
+    model, X = iris_model
+    main = generated_app(model, env={"ENABLE_BATCHING": "true", "MAX_BATCH_SIZE": "4", "MAX_BATCH_WAIT_MS": "1"})
+    
+    assert main.batcher is not None
+    assert main.batcher.max_batch_size == 4
+    
+    with TestClient(main.app) as client:
+        response = client.post("/predict", json={"features": X[0].tolist()})
+    
+    assert response.status_code == 200
+    assert response.json()["prediction"] == int(model.predict(X[:1])[0])
+
+def test_micro_batching_isolates_failing_rows(generated_app, iris_model):
+    """Test that a bad row in a shared batch only fails its own request."""
+    model, X = iris_model
+    main = generated_app(model, batching=True, max_batch_size=8, max_batch_wait_ms=50)
+    original = main._predict_batch
+    
+    def failing_predict_batch(m, features):
+        if np.isnan(features).any():
+            raise ValueError("NaN in input")
+        return original(m, features)
+    
+    main._predict_batch = failing_predict_batch
+    rows = [X[0:1], np.full((1, 4), np.nan), X[1:2]]
+    
+    async def run():
+        main.batcher.start()
+        try:
+            return await asyncio.gather(*(main.batcher.submit(row) for row in rows), return_exceptions=True)
+        finally:
+            await main.batcher.stop()
+    
+    results = asyncio.run(run())
+    
+    assert isinstance(results[1], ValueError)
+    assert results[0][0][0] == model.predict(X[0:1])[0]
+    assert results[2][0][0] == model.predict(X[1:2])[0]
+
+def test_micro_batching_stop_fails_pending_requests(generated_app, iris_model):
+    """Test that stopping the batcher answers queued requests with 503 instead of leaving them hanging."""
+    from fastapi import HTTPException
+    model, X = iris_model
+    main = generated_app(model, batching=True, max_batch_size=8, max_batch_wait_ms=10000)
+    
+    async def run():
+        main.batcher.start()
+        pending = [asyncio.ensure_future(main.batcher.submit(X[i:i + 1])) for i in range(3)]
+        await asyncio.sleep(0.05)
+        await main.batcher.stop()
+        return await asyncio.wait_for(asyncio.gather(*pending, return_exceptions=True), timeout=5)
+    
+    results = asyncio.run(run())
+    
+    assert all(isinstance(r, HTTPException) and r.status_code == 503 for r in results)
+
+def test_micro_batching_submit_before_start(generated_app, iris_model):
+    """Test that submitting to a batcher that was never started raises a clear error."""
+    model, X = iris_model
+    main = generated_app(model, batching=True)
+    
+    with pytest.raises(RuntimeError, match="before start"):
+        asyncio.run(main.batcher.submit(X[0:1]))
+
+def test_predict_batch_endpoint(generated_app, iris_model):
+    """Test that /predict/batch scores every row with one forward pass per chunk."""
+    model, X = iris_model
+    main = generated_app(model, env={"MAX_CHUNK_SIZE": "4", "WARMUP_BATCH_SIZES": ""})
+    
+    batch_sizes = []
+    original = main._predict_batch
+    
+    def counting_predict_batch(m, features):
+        batch_sizes.append(len(features))
+        return original(m, features)
+    
+    main._predict_batch = counting_predict_batch
+    
+    with TestClient(main.app) as client:
+        response = client.post("/predict/batch", json={"features": X[:10].tolist()})
+    
+    assert response.status_code == 200
+    body = response.json()
+    assert body["predictions"] == model.predict(X[:10]).tolist()
+    assert np.allclose(body["probabilities"], model.predict_proba(X[:10]))
+    assert batch_sizes == [4, 4, 2]
+
+def test_predict_batch_rejects_ragged_rows(generated_app, iris_model):
+    """Test that rows of different widths are rejected."""
+    model, _ = iris_model
+    main = generated_app(model)
+    
+    with TestClient(main.app) as client:
+        ragged = client.post("/predict/batch", json={"features": [[1.0, 2.0, 3.0, 4.0], [1.0]]})
+        empty = client.post("/predict/batch", json={"features": []})
+    
+    assert ragged.status_code == 422
+    assert empty.status_code == 422
+
+def test_predict_rejects_bad_shapes(generated_app, iris_model):
+    """Test that wrong dimensionality and zero-width rows are 422s with distinct errors."""
+    model, X = iris_model
+    main = generated_app(model)
+    
+    def npy(array):
+        buffer = io.BytesIO()
+        np.save(buffer, array)
+        return buffer.getvalue()
+    
+    headers = {"Content-Type": "application/x-npy"}
+    with TestClient(main.app) as client:
+        flat = client.post("/predict/batch", content=npy(X[0]), headers=headers)
+        cube = client.post("/predict/batch", content=npy(X[:4].reshape(2, 2, 4)), headers=headers)
+        no_columns = client.post("/predict/batch", json={"features": [[]]})
+        empty_row = client.post("/predict", json={"features": []})
+    
+    assert flat.status_code == 422
+    assert flat.json()["detail"]["error"] == "Invalid shape"
+    assert cube.status_code == 422
+    assert cube.json()["detail"]["error"] == "Invalid shape"
+    assert no_columns.status_code == 422
+    assert no_columns.json()["detail"]["error"] == "Empty batch"
+    assert empty_row.status_code == 422
+    assert empty_row.json()["detail"]["error"] == "Empty input"
+
+def test_predict_accepts_npy_body(generated_app, iris_model):
+    """Test that .npy request bodies are decoded and JSON stays the default response."""
+    model, X = iris_model
+    main = generated_app(model)
+    buffer = io.BytesIO()
+    np.save(buffer, X[:1].astype(np.float32))
+    
+    with TestClient(main.app) as client:
+        response = client.post("/predict", content=buffer.getvalue(), headers={"Content-Type": "application/x-npy"})
+    
+    assert response.status_code == 200
+    assert response.json()["prediction"] == int(model.predict(X[:1])[0])
+
+def test_predict_batch_npy_round_trip(generated_app, iris_model):
+    """Test that Accept: application/x-npy returns the predictions array."""
+    model, X = iris_model
+    main = generated_app(model)
+    buffer = io.BytesIO()
+    np.save(buffer, X[:5])
+    
+    with TestClient(main.app) as client:
+        response = client.post(
+            "/predict/batch",
+            content=buffer.getvalue(),
+            headers={"Content-Type": "application/x-npy", "Accept": "application/x-npy"}
+        )
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-npy"
+    assert np.array_equal(np.load(io.BytesIO(response.content)), model.predict(X[:5]))
+
+def test_predict_batch_msgpack_round_trip(generated_app, iris_model):
+    """Test that msgpack tensors are accepted and returned."""
+    msgpack = pytest.importorskip("msgpack")
+    model, X = iris_model
+    main = generated_app(model)
+    rows = np.ascontiguousarray(X[:3], dtype=np.float32)
+    body = msgpack.packb({"dtype": rows.dtype.str, "shape": list(rows.shape), "data": rows.tobytes()})
+    
+    with TestClient(main.app) as client:
+        response = client.post(
+            "/predict/batch",
+            content=body,
+            headers={"Content-Type": "application/msgpack", "Accept": "application/msgpack"}
+        )
+    
+    assert response.status_code == 200
+    payload = msgpack.unpackb(response.content, raw=False)
+    probabilities = np.frombuffer(payload["probabilities"]["data"], dtype=payload["probabilities"]["dtype"])
+    assert np.allclose(probabilities.reshape(payload["probabilities"]["shape"]), model.predict_proba(rows))
+
+def test_predict_rejects_unsupported_media_type(generated_app, iris_model):
+    """Test that unknown request formats are rejected with 415."""
+    model, _ = iris_model
+    main = generated_app(model)
+    
+    with TestClient(main.app) as client:
+        response = client.post("/predict", content=b"1,2,3,4", headers={"Content-Type": "text/csv"})
+        invalid = client.post("/predict", json={"rows": [1, 2]})
+    
+    assert response.status_code == 415
+    assert invalid.status_code == 422
+
+def test_predict_validation_errors_use_standard_shape(generated_app, iris_model):
+    """Test that invalid JSON bodies get FastAPI's usual 422 error list."""
+    model, _ = iris_model
+    main = generated_app(model)
+    
+    with TestClient(main.app) as client:
+        missing = client.post("/predict", json={"rows": [1, 2]})
+        malformed = client.post("/predict", content=b'{"features": [1, 2', headers={"Content-Type": "application/json"})
+    
+    assert missing.status_code == 422
+    assert missing.json()["detail"][0]["loc"] == ["body", "features"]
+    assert malformed.status_code == 422
+    assert malformed.json()["detail"][0]["type"] == "json_invalid"
+    assert malformed.json()["detail"][0]["loc"][0] == "body"
+
+def test_accept_header_respects_quality_values(generated_app, iris_model):
+    """Test that the response format follows Accept q-values rather than header order."""
+    model, X = iris_model
+    main = generated_app(model)
+    
+    with TestClient(main.app) as client:
+        preferred_json = client.post(
+            "/predict/batch", json={"features": X[:2].tolist()},
+            headers={"Accept": "application/x-npy;q=0.5, application/json"}
+        )
+        preferred_npy = client.post(
+            "/predict/batch", json={"features": X[:2].tolist()},
+            headers={"Accept": "application/json;q=0.1, application/x-npy;q=0.9"}
+        )
+    
+    assert preferred_json.headers["content-type"] == "application/json"
+    assert preferred_npy.headers["content-type"] == "application/x-npy"
+    assert np.array_equal(np.load(io.BytesIO(preferred_npy.content)), model.predict(X[:2]))
+
+def test_fast_json_responses(generated_app, iris_model):
+    """Test that the orjson app returns the same payloads as the default app."""
+    pytest.importorskip("orjson")
+    model, X = iris_model
+    main = generated_app(model, fast_json=True)
+    
+    with TestClient(main.app) as client:
+        single = client.post("/predict", json={"features": X[0].tolist()})
+        batch = client.post("/predict/batch", json={"features": X[:3].tolist()})
+    
+    assert single.status_code == 200
+    assert single.json()["prediction"] == int(model.predict(X[:1])[0])
+    assert np.allclose(single.json()["probabilities"], model.predict_proba(X[:1])[0])
+    assert batch.json()["predictions"] == model.predict(X[:3]).tolist()
+
+def test_fast_json_handles_unsupported_dtypes(generated_app, iris_model):
+    """Test that dtypes orjson cannot serialize natively, like float16, still render."""
+    orjson = pytest.importorskip("orjson")
+    model, _ = iris_model
+    main = generated_app(model, fast_json=True)
+    
+    probabilities = np.array([[0.25, 0.75]], dtype=np.float16)
+    body = main.ORJSONResponse({"probabilities": main._orjson_array(probabilities)}).body
+    
+    assert orjson.loads(body) == {"probabilities": [[0.25, 0.75]]}
+
+def test_metrics_endpoint(generated_app, iris_model):
+    """Test that /metrics reports request counts, stage latencies and batch sizes in Prometheus format."""
+    model, X = iris_model
+    main = generated_app(model, max_chunk_size=4)
+    
+    with TestClient(main.app) as client:
+        client.post("/predict", json={"features": X[0].tolist()})
+        client.post("/predict/batch", json={"features": X[:10].tolist()})
+        client.post("/predict", json={"features": []})
+        response = client.get("/metrics")
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    assert 'model_requests_total{path="/predict",status="200"} 1' in text
+    assert 'model_requests_total{path="/predict",status="422"} 1' in text
+    assert 'model_request_errors_total{path="/predict",kind="client"} 1' in text
+    for stage in ("parse", "convert", "inference", "serialize"):
+        assert f'model_stage_duration_seconds_count{{stage="{stage}"}}' in text
+    assert 'model_batch_size_rows_bucket{le="4"} 4' in text
+    assert "model_batch_size_rows_count 4" in text
+    assert 'model_requests_in_flight{path="/metrics"} 1' in text
+
+def test_prediction_cache_hits_and_invalidation(generated_app, iris_model):
+    """Test that repeated inputs skip the model and a new model generation empties the cache."""
+    model, X = iris_model
+    main = generated_app(model, cache_size=2, env={"WARMUP_BATCH_SIZES": ""})
+    
+    calls = []
+    original = main._predict_batch
+    
+    def counting_predict_batch(m, features):
+        calls.append(len(features))
+        return original(m, features)
+    
+    main._predict_batch = counting_predict_batch
+    
+    with TestClient(main.app) as client:
+        first = client.post("/predict", json={"features": X[0].tolist()})
+        repeat = client.post("/predict", json={"features": X[0].tolist()})
+        for row in X[1:3]:
+            client.post("/predict", json={"features": row.tolist()})
+        evicted = client.post("/predict", json={"features": X[0].tolist()})
+        stats = client.get("/health").json()["prediction_cache"]
+        model_calls = len(calls)
+        
+        # X[2] is cached, but not for the new model generation
+        main.model_generation += 1
+        client.post("/predict", json={"features": X[2].tolist()})
+    
+    assert repeat.json() == first.json() == evicted.json()
+    assert model_calls == 4
+    assert stats == {"entries": 2, "bytes": stats["bytes"], "hits": 1, "misses": 4}
+    assert len(calls) == 5
+    assert main.prediction_cache.stats()["entries"] == 1
+
+def test_prediction_cache_byte_budget(generated_app, iris_model):
+    """Test that the cache evicts least recently used entries to stay within its byte budget."""
+    model, X = iris_model
+    main = generated_app(model, cache_size=100)
+    cache = main.PredictionCache(max_entries=100, max_bytes=200)
+    
+    for i in range(10):
+        features = X[i:i + 1]
+        cache.put(cache.key(features), np.zeros(1), np.zeros((1, 3)), main.model_generation)
+    
+    assert cache.stats()["bytes"] <= 200
+    assert cache.get(cache.key(X[9:10])) is not None
+    assert cache.get(cache.key(X[0:1])) is None
+    assert cache.key(X[0:1]) != cache.key(X[0:1].astype(np.float32))
+
+def _post_with_timeout(client, url, timeout=20, **kwargs):
+    """POST from a daemon thread so a hung streaming response fails the test instead of the suite."""
+    import threading
+    result = {}
+    
+    def target():
+        try:
+            result["response"] = client.post(url, **kwargs)
+        except Exception as e:  # pragma: no cover - surfaced below
+            result["error"] = e
+    
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), f"POST {url} did not complete within {timeout}s"
+    if "error" in result:
+        raise result["error"]
+    return result["response"]
+
+def test_predict_stream_ndjson(generated_app, iris_model):
+    """Test that /predict/stream scores NDJSON rows in fixed-size chunks."""
+    import json
+    model, X = iris_model
+    main = generated_app(model, env={"STREAM_CHUNK_SIZE": "4", "WARMUP_BATCH_SIZES": ""})
+    
+    batch_sizes = []
+    original = main._predict_batch
+    
+    def counting_predict_batch(m, features):
+        batch_sizes.append(len(features))
+        return original(m, features)
+    
+    main._predict_batch = counting_predict_batch
+    lines = [json.dumps(row) if i % 2 else json.dumps({"features": row}) for i, row in enumerate(X[:10].tolist())]
+    
+    with TestClient(main.app) as client:
+        response = _post_with_timeout(
+            client,
+            "/predict/stream",
+            content=("\n".join(lines) + "\n").encode(),
+            headers={"Content-Type": "application/x-ndjson"}
+        )
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["prediction"] for r in results] == model.predict(X[:10]).tolist()
+    assert batch_sizes == [4, 4, 2]
+
+def test_predict_stream_reports_bad_rows(generated_app, iris_model):
+    """Test that an unparseable row ends the stream with an error naming its line."""
+    import json
+    model, X = iris_model
+    main = generated_app(model, env={"STREAM_CHUNK_SIZE": "1"})
+    
+    with TestClient(main.app) as client:
+        response = _post_with_timeout(client, "/predict/stream", content=(json.dumps(X[0].tolist()) + "\nnot json\n").encode())
+    
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert "prediction" in results[0]
+    assert results[1]["error"] == "Invalid input"
+    assert results[1]["line"] == 2
+
+def test_predict_stream_rejects_long_lines(generated_app, iris_model):
+    """Test that a line longer than STREAM_MAX_LINE_BYTES ends the stream."""
+    import json
+    model, _ = iris_model
+    main = generated_app(model, env={"STREAM_MAX_LINE_BYTES": "16"})
+    
+    with TestClient(main.app) as client:
+        response = _post_with_timeout(client, "/predict/stream", content=b"[1, 2, 3, 4]\n" + b"[" + b"1.0, " * 20 + b"1.0]\n")
+    
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert results[-1]["line"] == 2
+    assert "exceeds" in results[-1]["message"]
+
+@pytest.mark.parametrize("framework", ["sklearn", "pytorch"])
+def test_warmup_runs_before_ready(generated_app, iris_model, framework):
+    """Test that startup scores every warmup batch size at the model's input width on all inference threads."""
+    import threading
+    model, X = iris_model
+    if framework == "pytorch":
+        torch = pytest.importorskip("torch")
+        model = torch.nn.Sequential(torch.nn.Linear(4, 8), torch.nn.ReLU(), torch.nn.Linear(8, 3)).eval()
+    main = generated_app(model, framework=framework, model_name="model.pt" if framework == "pytorch" else "model.pkl",
+                         env={"WARMUP_BATCH_SIZES": "1,16", "WARMUP_ITERATIONS": "2", "INFERENCE_WORKERS": "2"})
+    
+    calls = []
+    original = main._predict_batch
+    
+    def recording_predict_batch(m, features):
+        calls.append((features.shape, threading.current_thread().name))
+        return original(m, features)
+    
+    main._predict_batch = recording_predict_batch
+    
+    with TestClient(main.app) as client:
+        health = client.get("/health").json()
+    
+    assert health["ready"] is True
+    assert health["warmup"]["completed"] is True
+    assert health["warmup"]["batch_sizes"] == [1, 16]
+    assert health["warmup"]["error"] is None
+    assert sorted(shape for shape, _ in calls) == [(1, 4)] * 4 + [(16, 4)] * 4
+    assert len({thread for _, thread in calls}) == 2
+
+def test_warmup_skipped_without_input_shape(generated_app, iris_model):
+    """Test that a model without a discoverable input width still becomes ready, and WARMUP_INPUT_SHAPE overrides it."""
+    model, _ = iris_model
+    main = generated_app(model, env={"WARMUP_BATCH_SIZES": "2"})
+    del main.model.n_features_in_
+    
+    calls = []
+    original = main._predict_batch
+    main._predict_batch = lambda m, features: calls.append(features.shape) or original(m, features)
+    
+    with TestClient(main.app) as client:
+        skipped = client.get("/health").json()
+    main.WARMUP_INPUT_SHAPE = "4"
+    with TestClient(main.app) as client:
+        overridden = client.get("/health").json()
+    
+    assert skipped["ready"] and skipped["warmup"]["batch_sizes"] == []
+    assert overridden["warmup"]["batch_sizes"] == [2]
+    assert calls == [(2, 4)] * 2
+
+def test_background_loading_serves_probes_immediately(generated_app):
+    """Test that /live answers while the model loads, and /ready and /predict return 503 until it is ready."""
+    LOAD_GATE.clear()
+    main = generated_app(GatedModel(), env={"MODEL_LOAD_MODE": "background", "WARMUP_BATCH_SIZES": ""})
+    assert not main.model_loaded
+    
+    try:
+        with TestClient(main.app) as client:
+            live = client.get("/live")
+            loading = client.get("/ready")
+            rejected = client.post("/predict", json={"features": [1.0, 2.0]})
+            
+            LOAD_GATE.set()
+            deadline = time.monotonic() + 10
+            while client.get("/ready").status_code != 200 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            ready = client.get("/ready")
+            accepted = client.post("/predict", json={"features": [1.0, 2.0]})
+            metrics = client.get("/metrics").text
+    finally:
+        LOAD_GATE.set()
+    
+    assert live.status_code == 200
+    assert loading.status_code == 503 and loading.json()["status"] == "loading"
+    assert rejected.status_code == 503
+    assert rejected.headers["retry-after"] == "1"
+    assert rejected.json()["detail"]["error"] == "Model not ready"
+    assert ready.status_code == 200
+    assert ready.json()["status"] == "ready"
+    assert ready.json()["model_load_seconds"] > 0
+    assert accepted.status_code == 200
+    assert "model_load_duration_seconds " in metrics
+
+@pytest.mark.parametrize("env_name,live_status", [("development", 200), ("production", 503)])
+def test_background_loading_failure(generated_app, monkeypatch, env_name, live_status):
+    """Test that a failed background load keeps /ready at 503 and fails /live in production so the container restarts."""
+    main = generated_app(b"not a pickle", env={"MODEL_LOAD_MODE": "background", "ENV": env_name})
+    
+    with TestClient(main.app) as client:
+        deadline = time.monotonic() + 10
+        while main.model_state == "loading" and time.monotonic() < deadline:
+            time.sleep(0.01)
+        ready = client.get("/ready")
+        live = client.get("/live")
+        predict = client.post("/predict", json={"features": [1.0, 2.0]})
+    
+    assert ready.status_code == 503 and ready.json()["status"] == "failed"
+    assert ready.json()["error"]
+    assert live.status_code == live_status
+    assert predict.status_code == 503
+    assert predict.json()["detail"]["error"] == "Model not loaded"
+
+def test_admin_reload_swaps_model(generated_app):
+    """Test that /admin/reload needs the token, swaps in the new artifact and reports memory."""
+    import joblib
+    main = generated_app(ConstantModel(1.0), env={"ADMIN_TOKEN": "secret"})
+    
+    with TestClient(main.app) as client:
+        before = client.post("/predict", json={"features": [0.0, 0.0]}).json()
+        joblib.dump(ConstantModel(2.0), main.MODEL_PATH)
+        unauthorized = client.post("/admin/reload", headers={"Authorization": "Bearer wrong"})
+        reloaded = client.post("/admin/reload", headers={"Authorization": "Bearer secret"})
+        after = client.post("/predict", json={"features": [0.0, 0.0]}).json()
+        health = client.get("/health").json()
+        metrics = client.get("/metrics").text
+    
+    assert before["prediction"] == 1.0
+    assert unauthorized.status_code == 401
+    assert reloaded.status_code == 200
+    report = reloaded.json()
+    assert report["success"] and report["generation"] == 2
+    assert report["load_seconds"] is not None and report["warmup_seconds"] is not None
+    if os.path.exists("/proc/self/status"):
+        assert report["peak_rss_bytes"] >= report["rss_before_bytes"] > 0
+    assert after["prediction"] == 2.0
+    assert health["reload"]["reloads"] == 1
+    assert 'model_reloads_total{result="success"} 1' in metrics
+
+def test_admin_reload_disabled_without_token(generated_app):
+    """Test that the admin endpoint is refused when no ADMIN_TOKEN is configured."""
+    main = generated_app(ConstantModel(1.0))
+    with TestClient(main.app) as client:
+        response = client.post("/admin/reload", headers={"Authorization": "Bearer "})
+    assert response.status_code == 403
+
+def test_failed_reload_keeps_serving_old_model(generated_app):
+    """Test that an unloadable artifact leaves the current model in place."""
+    main = generated_app(ConstantModel(1.0), env={"ADMIN_TOKEN": "secret"})
+    
+    with TestClient(main.app) as client:
+        with open(main.MODEL_PATH, "wb") as f:
+            f.write(b"truncated upload")
+        response = client.post("/admin/reload", headers={"Authorization": "Bearer secret"})
+        prediction = client.post("/predict", json={"features": [0.0, 0.0]})
+    
+    assert response.status_code == 500
+    assert response.json()["success"] is False
+    assert main.model_generation == 1
+    assert prediction.json()["prediction"] == 1.0
+
+def test_reload_lets_in_flight_requests_finish_on_old_model(generated_app):
+    """Test that requests started before a swap finish on the old model and later ones use the new one."""
+    import joblib
+    main = generated_app(ConstantModel(1.0, delay=0.3), env={"WARMUP_BATCH_SIZES": ""})
+    
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            in_flight = asyncio.ensure_future(client.post("/predict", json={"features": [0.0, 0.0]}))
+            await asyncio.sleep(0.1)
+            joblib.dump(ConstantModel(2.0), main.MODEL_PATH)
+            report = await main._reload_model("test")
+            after = await client.post("/predict", json={"features": [0.0, 0.0]})
+            return await in_flight, report, after
+    
+    in_flight, report, after = asyncio.run(run())
+    
+    assert report["success"]
+    assert in_flight.status_code == 200 and in_flight.json()["prediction"] == 1.0
+    assert after.json()["prediction"] == 2.0
+
+def test_watcher_reloads_changed_artifact(generated_app):
+    """Test that MODEL_WATCH_INTERVAL picks up a replaced artifact once it stops changing."""
+    import joblib
+    main = generated_app(ConstantModel(1.0), env={"MODEL_WATCH_INTERVAL": "0.02"})
+    
+    with TestClient(main.app) as client:
+        joblib.dump(ConstantModel(3.0), main.MODEL_PATH)
+        deadline = time.monotonic() + 10
+        while main.reload_status["reloads"] == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        prediction = client.post("/predict", json={"features": [0.0, 0.0]}).json()
+    
+    assert main.reload_status["last"]["reason"] == "watch"
+    assert prediction["prediction"] == 3.0
+
+def _mapped_file(address):
+    """Return the file backing a virtual address in this process, from /proc/self/maps."""
+    with open("/proc/self/maps") as f:
+        for line in f:
+            fields = line.split()
+            start, end = (int(bound, 16) for bound in fields[0].split("-"))
+            if start <= address < end:
+                return fields[5] if len(fields) > 5 else None
+    return None
+
+def test_mmap_sklearn_model_and_memory_report(generated_app):
+    """Test that MODEL_MMAP maps the model's arrays from the artifact and /health reports memory."""
+    X = np.random.RandomState(0).rand(20, 3)
+    main = generated_app(LinearRegression().fit(X, X.sum(axis=1)), env={"MODEL_MMAP": "true"})
+    assert isinstance(main.model.coef_, np.memmap)
+    
+    with TestClient(main.app) as client:
+        prediction = client.post("/predict", json={"features": [0.1, 0.2, 0.3]}).json()
+        memory = client.get("/health").json()["memory"]
+    
+    assert prediction["prediction"] == pytest.approx(0.6)
+    assert memory["mmap"] is True
+    assert memory["pid"] == os.getpid()
+    if os.path.exists("/proc/self/smaps_rollup"):
+        assert memory["rss_after_load_bytes"] > 0
+        assert memory["shared_bytes"] + memory["private_bytes"] == pytest.approx(memory["rss_bytes"], rel=0.1)
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/maps"), reason="needs /proc/self/maps")
+def test_mmap_pytorch_state_dict_stays_file_backed(generated_app, tmp_path):
+    """Test that state_dict weights loaded with MODEL_MMAP are served straight from the mapped file."""
+    torch = pytest.importorskip("torch")
+    (tmp_path / "app").mkdir(exist_ok=True)
+    (tmp_path / "app" / "model.py").write_text(
+        "import torch\n\n"
+        "class Net(torch.nn.Module):\n"
+        "    def __init__(self):\n"
+        "        super().__init__()\n"
+        "        self.layer = torch.nn.Linear(4, 3)\n\n"
+        "    def forward(self, x):\n"
+        "        return self.layer(x)\n"
+    )
+    weights = torch.nn.Linear(4, 3).state_dict()
+    main = generated_app({f"layer.{k}": v for k, v in weights.items()}, framework='pytorch',
+                         model_name='model.pt', env={"MODEL_MMAP": "true"})
+    
+    assert _mapped_file(main.model.layer.weight.data_ptr()) == main.MODEL_PATH
+    features = np.random.RandomState(0).rand(4).astype(np.float32)
+    with TestClient(main.app) as client:
+        response = client.post("/predict", json={"features": features.tolist()})
+    expected = (torch.as_tensor(features) @ weights["weight"].T + weights["bias"]).argmax().item()
+    assert response.json()["prediction"] == expected
+
+async def _post_concurrently(main, count, path="/predict", stagger=0.02):
+    """POST one row to the app from several clients, starting a little apart so arrival order is fixed."""
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        async def post(i):
+            await asyncio.sleep(i * stagger)
+            start = time.perf_counter()
+            response = await client.post(path, json={"features": [0.0, 0.0]})
+            return response, time.perf_counter() - start
+        return await asyncio.gather(*(post(i) for i in range(count)))
+
+def test_admission_sheds_requests_beyond_queue(generated_app):
+    """Test that requests beyond MAX_IN_FLIGHT + MAX_QUEUE are rejected immediately with Retry-After."""
+    main = generated_app(ConstantModel(1.0, delay=0.3), env={
+        "MAX_IN_FLIGHT": "1", "MAX_QUEUE": "1", "WARMUP_BATCH_SIZES": "",
+    })
+    
+    results = asyncio.run(_post_concurrently(main, 3))
+    
+    (first, _), (queued, _), (shed, shed_seconds) = results
+    assert first.status_code == 200 and queued.status_code == 200
+    assert shed.status_code == 503
+    assert shed.headers["retry-after"] == "1"
+    assert shed.json()["detail"]["error"] == "Overloaded"
+    assert shed_seconds < 0.2
+    stats = main.admission.stats()
+    assert (stats["in_flight"], stats["queued"], stats["admitted"]) == (0, 0, 2)
+    assert stats["rejected"]["queue_full"] == 1
+    assert main.SHED_REQUESTS.value("queue_full") == 1
+    assert main.ADMISSION_WAIT_SECONDS.count() == 2
+
+def test_admission_deadline_rejects_queued_requests(generated_app):
+    """Test that a request still waiting for a slot at its deadline gets the configured status code."""
+    main = generated_app(ConstantModel(1.0, delay=0.4), env={
+        "MAX_IN_FLIGHT": "1", "MAX_QUEUE": "8", "REQUEST_DEADLINE_MS": "100",
+        "SHED_STATUS_CODE": "429", "WARMUP_BATCH_SIZES": "",
+    })
+    
+    (first, _), (late, late_seconds) = asyncio.run(_post_concurrently(main, 2))
+    
+    assert first.status_code == 200
+    assert late.status_code == 429
+    assert late.headers["retry-after"] == "1"
+    assert 0.09 < late_seconds < 0.35
+    assert main.admission.stats()["rejected"]["deadline"] == 1
+    assert main.model.calls == 1
+
+def test_expired_requests_skip_inference(generated_app):
+    """Test that admitted work whose deadline passes in the inference pool's queue never runs the model."""
+    main = generated_app(ConstantModel(1.0, delay=0.3), env={
+        "MAX_IN_FLIGHT": "4", "INFERENCE_WORKERS": "1", "REQUEST_DEADLINE_MS": "100", "WARMUP_BATCH_SIZES": "",
+    })
+    
+    results = asyncio.run(_post_concurrently(main, 3, stagger=0.01))
+    
+    statuses = [response.status_code for response, _ in results]
+    assert statuses == [200, 503, 503]
+    assert all(response.json()["detail"]["error"] == "Deadline exceeded" for response, _ in results[1:])
+    assert main.model.calls == 1
+    assert main.admission.stats()["expired"] == 2
+
+def test_expired_requests_leave_micro_batches(generated_app):
+    """Test that a batched request whose deadline passes is answered and left out of later batches."""
+    main = generated_app(ConstantModel(1.0, delay=0.3), env={
+        "ENABLE_BATCHING": "true", "MAX_BATCH_WAIT_MS": "0", "INFERENCE_WORKERS": "1",
+        "REQUEST_DEADLINE_MS": "100", "WARMUP_BATCH_SIZES": "",
+    })
+    
+    async def run():
+        main.batcher.start()
+        try:
+            return await _post_concurrently(main, 2, stagger=0.05)
+        finally:
+            await main.batcher.stop()
+    
+    (first, _), (expired, _) = asyncio.run(run())
+    
+    assert first.status_code == 200
+    assert expired.status_code == 503
+    assert main.model.calls == 1
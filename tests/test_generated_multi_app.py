@@ -0,0 +1,118 @@
+import asyncio
+import json
+import pytest
+import joblib
+from sklearn.datasets import load_iris
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LinearRegression
+
+pytest.importorskip("fastapi")
+httpx = pytest.importorskip("httpx")
+from fastapi.testclient import TestClient
+
+from deploywizard.scaffolder.scaffolder import Scaffolder
+
+@pytest.fixture
+def multi_app(tmp_path, monkeypatch):
+    """Return a factory that registers sklearn models, generates a multi-model service and imports it."""
+    import importlib.util
+    import uuid
+
+    monkeypatch.delenv("MODEL_PATH", raising=False)
+    X, y = load_iris(return_X_y=True)
+    scaffolder = Scaffolder(registry_path=str(tmp_path / "registry.json"))
+    for name, version, model in [
+        ("iris", "1.0.0", RandomForestClassifier(n_estimators=3, random_state=0).fit(X, y)),
+        ("iris", "2.0.0", RandomForestClassifier(n_estimators=5, random_state=1).fit(X, y)),
+        ("petal", "1.0.0", LinearRegression().fit(X[:, :3], X[:, 3])),
+    ]:
+        path = tmp_path / "artifacts" / name / version / "model.pkl"
+        path.parent.mkdir(parents=True)
+        joblib.dump(model, path)
+        scaffolder.register_model(name, version, str(path), "sklearn")
+
+    def _generate(env=None, **kwargs):
+        for key, value in (env or {}).items():
+            monkeypatch.setenv(key, str(value))
+        output_dir = tmp_path / "service"
+        hosted = scaffolder.generate_multi_project(output_dir=str(output_dir), **kwargs)
+        module_name = f"generated_multi_{uuid.uuid4().hex[:8]}"
+        spec = importlib.util.spec_from_file_location(module_name, str(output_dir / "app" / "main.py"))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module, hosted, X
+
+    return _generate
+
+def test_generate_multi_project_layout(multi_app, tmp_path):
+    """Test that every version is copied under app/models and listed in the manifest."""
+    main, hosted, _ = multi_app(models=["iris", "petal:1.0.0"])
+
+    app_dir = tmp_path / "service" / "app"
+    manifest = json.loads((app_dir / "models.json").read_text())
+    assert [(m["name"], m["version"]) for m in manifest["models"]] == [
+        ("iris", "1.0.0"), ("iris", "2.0.0"), ("petal", "1.0.0")
+    ]
+    assert manifest["latest"] == {"iris": "2.0.0", "petal": "1.0.0"}
+    assert (app_dir / "models" / "iris" / "2.0.0" / "model.pkl").exists()
+    assert "scikit-learn" in (app_dir / "requirements.txt").read_text()
+    assert 'MODEL_PATH="/app/models.json"' in (tmp_path / "service" / "Dockerfile").read_text()
+    assert len(hosted) == 3
+
+def test_multi_app_serves_each_model_version(multi_app):
+    """Test that predictions are routed by name and version, including the latest alias."""
+    main, _, X = multi_app()
+    old = joblib.load(main._artifact_path(main.MODEL_SPECS[("iris", "1.0.0")]))
+    new = joblib.load(main._artifact_path(main.MODEL_SPECS[("iris", "2.0.0")]))
+
+    with TestClient(main.app) as client:
+        v1 = client.post("/models/iris/1.0.0/predict/batch", json={"features": X[:20].tolist()})
+        latest = client.post("/models/iris/latest/predict/batch", json={"features": X[:20].tolist()})
+        petal = client.post("/models/petal/1.0.0/predict", json={"features": X[0, :3].tolist()})
+        missing = client.post("/models/iris/9.9.9/predict", json={"features": X[0].tolist()})
+        listing = client.get("/models").json()["models"]
+
+    assert v1.json()["predictions"] == old.predict(X[:20]).tolist()
+    assert latest.json()["predictions"] == new.predict(X[:20]).tolist()
+    assert petal.json()["probabilities"] is None
+    assert missing.status_code == 404
+    assert {(m["name"], m["version"]) for m in listing if m["loaded"]} == {("iris", "1.0.0"), ("iris", "2.0.0"), ("petal", "1.0.0")}
+
+def test_multi_app_evicts_least_recently_used(multi_app):
+    """Test that models beyond the memory budget are evicted least recently used first and reloaded on demand."""
+    main, _, X = multi_app(env={"MODEL_MEMORY_BUDGET_MB": "0", "ADMIN_TOKEN": "secret"})
+    row = {"features": X[0].tolist()}
+
+    with TestClient(main.app) as client:
+        client.post("/models/iris/1.0.0/predict", json=row)
+        client.post("/models/iris/1.0.0/predict", json=row)
+        client.post("/models/iris/2.0.0/predict", json=row)
+        client.post("/models/iris/1.0.0/predict", json=row)
+        unauthorized = client.get("/admin/models")
+        stats = client.get("/admin/models", headers={"Authorization": "Bearer secret"}).json()
+
+    assert unauthorized.status_code == 401
+    by_key = {(m["name"], m["version"]): m for m in stats["models"]}
+    v1, v2 = by_key[("iris", "1.0.0")], by_key[("iris", "2.0.0")]
+    assert (v1["loads"], v1["hits"], v1["evictions"], v1["loaded"]) == (2, 1, 1, True)
+    assert (v2["loads"], v2["hits"], v2["evictions"], v2["loaded"]) == (1, 0, 1, False)
+    assert v1["load_seconds"] is not None and v1["memory_bytes"] > 0
+    assert stats["memory_used_bytes"] == v1["memory_bytes"]
+    assert by_key[("petal", "1.0.0")]["loads"] == 0
+
+def test_multi_app_loads_each_model_once_under_concurrency(multi_app):
+    """Test that concurrent first requests for one model share a single load."""
+    main, _, X = multi_app()
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(
+                client.post("/models/iris/2.0.0/predict", json={"features": X[i].tolist()}) for i in range(8)
+            ))
+
+    responses = asyncio.run(run())
+
+    assert all(r.status_code == 200 for r in responses)
+    stats = main.model_cache.stats[("iris", "2.0.0")]
+    assert stats["loads"] == 1
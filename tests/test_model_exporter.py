@@ -0,0 +1,210 @@
+import pytest
+import numpy as np
+from pathlib import Path
+from deploywizard.scaffolder.model_exporter import ModelExporter
+
+torch = pytest.importorskip("torch")
+
+class DummyTorchModel(torch.nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.layer = torch.nn.Linear(4, 3)
+    
+    def forward(self, x):
+        return self.layer(x)
+
+MODEL_CLASS_SOURCE = '''
+import torch
+
+class DummyTorchModel(torch.nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.layer = torch.nn.Linear(4, 3)
+    
+    def forward(self, x):
+        return self.layer(x)
+'''
+
+def test_export_full_model(tmp_path):
+    """Test tracing a full model with the input shape inferred from its first Linear layer."""
+    model = torch.nn.Sequential(torch.nn.Linear(4, 8), torch.nn.ReLU(), torch.nn.Linear(8, 2)).eval()
+    model_path = tmp_path / "model.pt"
+    torch.save(model, model_path)
+    
+    report = ModelExporter().export_torchscript(str(model_path), str(tmp_path / "model.torchscript.pt"))
+    
+    assert report['format'] == 'torchscript'
+    assert report['method'] == 'trace'
+    assert report['input_shape'] == [1, 4]
+    traced = torch.jit.load(report['path'])
+    features = torch.rand(5, 4)
+    assert torch.allclose(traced(features), model(features))
+
+def test_export_state_dict_with_model_class(tmp_path):
+    """Test that state_dict artifacts are rebuilt from the model class file before tracing."""
+    model = DummyTorchModel().eval()
+    model_path = tmp_path / "model.pt"
+    torch.save(model.state_dict(), model_path)
+    class_path = tmp_path / "model.py"
+    class_path.write_text(MODEL_CLASS_SOURCE)
+    
+    report = ModelExporter().export_torchscript(
+        str(model_path), str(tmp_path / "out.pt"), sample_shape=(4,), model_class_path=str(class_path)
+    )
+    
+    assert report['format'] == 'torchscript'
+    features = torch.rand(2, 4)
+    assert torch.allclose(torch.jit.load(report['path'])(features), model(features))
+
+def test_export_falls_back_to_eager(tmp_path):
+    """Test that an unexportable model is reported as eager and nothing is written."""
+    model_path = tmp_path / "model.pt"
+    torch.save(DummyTorchModel().state_dict(), model_path)
+    output_path = tmp_path / "out.pt"
+    
+    report = ModelExporter().export_torchscript(str(model_path), str(output_path))
+    
+    assert report['format'] == 'eager'
+    assert "model class" in report['reason']
+    assert not output_path.exists()
+
+def test_export_requires_shape_without_linear_layer(tmp_path):
+    """Test that models without a Linear layer need an explicit sample shape."""
+    model_path = tmp_path / "model.pt"
+    torch.save(torch.nn.Sequential(torch.nn.ReLU()), model_path)
+    
+    report = ModelExporter().export_torchscript(str(model_path), str(tmp_path / "out.pt"))
+    assert report['format'] == 'eager'
+    assert "input shape" in report['reason']
+    
+    report = ModelExporter().export_torchscript(str(model_path), str(tmp_path / "out.pt"), sample_shape=(6,))
+    assert report['format'] == 'torchscript'
+    assert report['input_shape'] == [1, 6]
+
+def _iris_classifier(tmp_path):
+    import joblib
+    from sklearn.datasets import load_iris
+    from sklearn.ensemble import RandomForestClassifier
+    X, y = load_iris(return_X_y=True)
+    model = RandomForestClassifier(n_estimators=5, random_state=0).fit(X, y)
+    model_path = tmp_path / "model.pkl"
+    joblib.dump(model, model_path)
+    return model, model_path
+
+def test_export_onnx_sklearn_classifier(tmp_path):
+    """Test that sklearn classifiers convert to ONNX with a probability matrix and pass the parity check."""
+    pytest.importorskip("skl2onnx")
+    ort = pytest.importorskip("onnxruntime")
+    model, model_path = _iris_classifier(tmp_path)
+    
+    report = ModelExporter().export_onnx(str(model_path), 'sklearn', str(tmp_path / "model.onnx"))
+    
+    assert report['format'] == 'onnx', report['reason']
+    assert report['input_shape'] == [None, 4]
+    assert report['label_mismatches'] == 0
+    session = ort.InferenceSession(report['path'], providers=["CPUExecutionProvider"])
+    labels, probabilities = session.run(None, {session.get_inputs()[0].name: np.zeros((2, 4), np.float32)})
+    assert probabilities.shape == (2, 3)
+
+def test_export_onnx_pytorch(tmp_path):
+    """Test that PyTorch models export with a dynamic batch dimension."""
+    ort = pytest.importorskip("onnxruntime")
+    pytest.importorskip("onnx")
+    model = torch.nn.Sequential(torch.nn.Linear(4, 8), torch.nn.ReLU(), torch.nn.Linear(8, 3)).eval()
+    model_path = tmp_path / "model.pt"
+    torch.save(model, model_path)
+    
+    report = ModelExporter().export_onnx(str(model_path), 'pytorch', str(tmp_path / "model.onnx"))
+    
+    assert report['format'] == 'onnx', report['reason']
+    session = ort.InferenceSession(report['path'], providers=["CPUExecutionProvider"])
+    features = np.random.RandomState(0).rand(5, 4).astype(np.float32)
+    output = session.run(None, {session.get_inputs()[0].name: features})[0]
+    assert np.allclose(output, model(torch.as_tensor(features)).detach().numpy(), atol=1e-5)
+
+def test_export_onnx_refuses_divergent_model(tmp_path):
+    """Test that an ONNX model outside the tolerance is rejected and removed."""
+    pytest.importorskip("skl2onnx")
+    pytest.importorskip("onnxruntime")
+    import joblib
+    from sklearn.linear_model import LinearRegression
+    X = np.random.RandomState(0).rand(50, 3) * 1000
+    model_path = tmp_path / "model.pkl"
+    joblib.dump(LinearRegression().fit(X, X @ np.array([1.5, -2.0, 3.0])), model_path)
+    output_path = tmp_path / "model.onnx"
+    
+    report = ModelExporter().export_onnx(str(model_path), 'sklearn', str(output_path), tolerance=0.0)
+    
+    assert report['format'] is None
+    assert "diverges" in report['reason']
+    assert not output_path.exists()
+
+def test_export_mmap_sklearn_rewrites_compressed_dump(tmp_path):
+    """Test that a compressed joblib dump is replaced by one whose arrays can be memory-mapped."""
+    import joblib
+    from sklearn.linear_model import LinearRegression
+    X = np.random.RandomState(0).rand(50, 3)
+    model_path = tmp_path / "model.pkl"
+    joblib.dump(LinearRegression().fit(X, X.sum(axis=1)), model_path, compress=3)
+    
+    report = ModelExporter().export_mmap(str(model_path), 'sklearn', str(model_path))
+    
+    assert (report['format'], report['rewritten']) == ('joblib', True)
+    assert report['size_bytes'] == model_path.stat().st_size
+    assert isinstance(joblib.load(model_path, mmap_mode='r').coef_, np.memmap)
+    assert not list(tmp_path.glob(".*.tmp"))
+
+def test_export_mmap_pytorch_resaves_legacy_format(tmp_path):
+    """Test that only legacy-format PyTorch files are re-saved in the zip format."""
+    import zipfile
+    legacy_path, zip_path = tmp_path / "legacy.pt", tmp_path / "zip.pt"
+    torch.save(DummyTorchModel().state_dict(), legacy_path, _use_new_zipfile_serialization=False)
+    torch.save(DummyTorchModel().state_dict(), zip_path)
+    
+    legacy = ModelExporter().export_mmap(str(legacy_path), 'pytorch', str(tmp_path / "out" / "legacy.pt"))
+    kept = ModelExporter().export_mmap(str(zip_path), 'pytorch', str(zip_path))
+    
+    assert (legacy['format'], legacy['rewritten']) == ('torch-zip', True)
+    assert zipfile.is_zipfile(legacy['path'])
+    assert 'layer.weight' in torch.load(legacy['path'], mmap=True)
+    assert (kept['format'], kept['rewritten']) == ('torch-zip', False)
+
+def test_export_mmap_reports_unsupported_framework(tmp_path):
+    """Test that frameworks without mmap support are reported rather than raised."""
+    report = ModelExporter().export_mmap(str(tmp_path / "model.keras"), 'tensorflow', str(tmp_path / "out.keras"))
+    
+    assert report['format'] is None
+    assert "not supported" in report['reason']
+
+def test_quantize_dynamic_reports_latency_size_and_drift(tmp_path):
+    """Test that dynamic int8 quantization saves a TorchScript archive and compares it with fp32."""
+    model = torch.nn.Sequential(torch.nn.Linear(16, 64), torch.nn.ReLU(), torch.nn.Linear(64, 4)).eval()
+    model_path = tmp_path / "model.pt"
+    torch.save(model, model_path)
+    output_path = tmp_path / "model.int8.torchscript.pt"
+    
+    report = ModelExporter().quantize_dynamic(str(model_path), str(output_path), iterations=20)
+    
+    assert report['format'] == 'torchscript-int8', report['reason']
+    assert report['quantized_layers'] == 2
+    assert report['size_bytes']['int8'] < report['size_bytes']['fp32']
+    assert set(report['latency_ms']) == {'fp32', 'int8'}
+    assert report['latency_ms']['int8']['p99'] >= report['latency_ms']['int8']['p50'] > 0
+    assert report['drift']['max_abs_diff'] < 0.1
+    assert 0.0 <= report['drift']['top1_agreement'] <= 1.0
+    quantized = torch.jit.load(str(output_path))
+    features = torch.rand(5, 16)
+    assert torch.allclose(quantized(features), model(features), atol=0.1)
+
+def test_quantize_dynamic_requires_quantizable_layers(tmp_path):
+    """Test that a model without Linear or LSTM layers is reported, not exported."""
+    model = torch.nn.Sequential(torch.nn.Conv1d(1, 2, 3), torch.nn.Flatten()).eval()
+    model_path = tmp_path / "model.pt"
+    torch.save(model, model_path)
+    output_path = tmp_path / "model.int8.torchscript.pt"
+    
+    report = ModelExporter().quantize_dynamic(str(model_path), str(output_path), sample_shape=(1, 8))
+    
+    assert report['format'] is None
+    assert "no nn.Linear or nn.LSTM" in report['reason']
+    assert not output_path.exists()
@@ -51,6 +51,23 @@ def test_load_pytorch(pytorch_model):
     assert 'layer.weight' in model
     assert 'layer.bias' in model
 
+def test_load_sklearn_mmap(sklearn_model):
+    """Test that mmap loading maps the model's arrays read-only from the file."""
+    model = ModelLoader().load(sklearn_model, 'sklearn', mmap=True)
+    assert isinstance(model.coef_, np.memmap)
+    assert not model.coef_.flags.writeable
+
+def test_load_pytorch_mmap_falls_back_for_legacy_files(pytorch_model, tmp_path):
+    """Test mmap loading of zip-format checkpoints and the fallback for legacy ones."""
+    legacy_path = tmp_path / "legacy.pt"
+    torch.save(torch.load(pytorch_model), legacy_path, _use_new_zipfile_serialization=False)
+    loader = ModelLoader()
+    
+    mapped = loader.load(pytorch_model, 'pytorch', mmap=True)
+    legacy = loader.load(legacy_path, 'pytorch', mmap=True)
+    
+    assert torch.equal(mapped['layer.weight'], legacy['layer.weight'])
+
 def test_unsupported_framework(tmp_path):
     """Test loading with an unsupported framework."""
     loader = ModelLoader()
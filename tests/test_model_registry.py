@@ -1,8 +1,24 @@
 import os
 import json
+import sqlite3
+import sys
+import time
 import pytest
 from pathlib import Path
 
+from deploywizard.scaffolder import registry_storage
+from deploywizard.scaffolder.model_registry import ModelRegistry
+from deploywizard.scaffolder.registry_storage import version_key
+
+def _register_concurrently(path, backend, worker, count, barrier, spans):
+    """Stress-test writer: register `count` versions once every writer is ready."""
+    registry = ModelRegistry(path, backend=backend)
+    barrier.wait()
+    start = time.time()
+    for i in range(count):
+        registry.register_model(f"worker{worker}", f"{i}.0.0", "/models/model.pkl", "sklearn")
+    spans.put((start, time.time()))
+
 class TestModelRegistry:
     def test_register_model(self, temp_registry, sample_model):
         """Test registering a new model."""
@@ -162,3 +178,318 @@ class TestModelRegistry:
         
         # Should be empty due to corruption handling
         assert new_registry.list_models() == []
+        # The corrupted file is kept next to the registry instead of being overwritten
+        aside = list(Path(temp_registry.registry_path).parent.glob(Path(temp_registry.registry_path).name + '.corrupt-*'))
+        assert len(aside) == 1 and aside[0].read_text() == '{invalid json'
+        os.unlink(aside[0])
+    
+    def test_writers_merge_with_changes_on_disk(self, temp_registry, sample_model):
+        """Test that a registry instance does not overwrite changes made through another instance."""
+        other = type(temp_registry)(registry_path=temp_registry.registry_path)
+        
+        temp_registry.register_model(**sample_model)
+        second = other.register_model(**{**sample_model, 'version': '2.0.0'})
+        with pytest.raises(ValueError, match="already exists"):
+            other.register_model(**sample_model)
+        temp_registry.delete_model(sample_model['name'], '1.0.0')
+        
+        assert second['id'] == '2'
+        assert type(temp_registry)(registry_path=temp_registry.registry_path).list_models() == [second]
+        # Updating a version another instance deleted does not bring it back
+        assert other.update_model(sample_model['name'], '1.0.0', description='stale') is None
+
+    def test_update_model(self, temp_registry, sample_model):
+        """Test renaming and re-describing a model version in place."""
+        registered = temp_registry.register_model(**sample_model)
+        other = temp_registry.register_model(**{**sample_model, 'version': '2.0.0'})
+        
+        updated = temp_registry.update_model(sample_model['name'], '1.0.0', new_name='renamed', description='new')
+        
+        assert updated == {**registered, 'name': 'renamed', 'description': 'new'}
+        assert temp_registry.get_model(sample_model['name'], '1.0.0') is None
+        assert temp_registry.get_model('renamed') == updated
+        assert temp_registry.get_model(sample_model['name']) == other
+        assert temp_registry.update_model('missing') is None
+        with pytest.raises(ValueError, match="already exists"):
+            temp_registry.update_model('renamed', '1.0.0', new_name=sample_model['name'], new_version='2.0.0')
+
+class TestSqliteModelRegistry:
+    @pytest.fixture
+    def sqlite_registry(self, tmp_path):
+        return ModelRegistry(registry_path=str(tmp_path / "registry.db"))
+
+    def test_backend_selection(self, tmp_path, monkeypatch):
+        """Test that the backend follows the path suffix unless overridden."""
+        monkeypatch.delenv("DEPLOYWIZARD_REGISTRY_BACKEND", raising=False)
+        assert type(ModelRegistry(str(tmp_path / "a.json"))._storage).__name__ == "JsonRegistryStorage"
+        assert type(ModelRegistry(str(tmp_path / "a.sqlite"))._storage).__name__ == "SqliteRegistryStorage"
+
+        monkeypatch.setenv("DEPLOYWIZARD_REGISTRY_BACKEND", "sqlite")
+        registry = ModelRegistry(str(tmp_path / "b.json"))
+        assert registry.registry_path == tmp_path / "b.db"
+        with pytest.raises(ValueError, match="Unsupported registry backend"):
+            ModelRegistry(str(tmp_path / "c.json"), backend="yaml")
+
+    def test_crud_matches_json_backend(self, sqlite_registry, temp_registry, sample_model):
+        """Test that both backends return the same records for the same calls."""
+        for registry in (temp_registry, sqlite_registry):
+            registry.register_model(**sample_model)
+            registry.register_model(**{**sample_model, 'version': '2.0.0', 'framework': 'pytorch'})
+            registry.register_model(**{**sample_model, 'name': 'other'})
+            registry.update_model('other', tags=['prod'])
+            registry.delete_model(sample_model['name'], '1.0.0')
+        
+        def strip(models):
+            return sorted(({k: v for k, v in m.items() if k != 'created_at'} for m in models), key=lambda m: m['id'])
+        
+        assert strip(sqlite_registry.list_models()) == strip(temp_registry.list_models())
+        assert strip([sqlite_registry.get_model(sample_model['name'])]) == strip([temp_registry.get_model(sample_model['name'])])
+        assert [m['name'] for m in sqlite_registry.list_models(framework='sklearn')] == ['other']
+        assert sqlite_registry.get_model('other')['tags'] == ['prod']
+        with pytest.raises(ValueError, match="already exists"):
+            sqlite_registry.register_model(**{**sample_model, 'name': 'other'})
+        assert sqlite_registry.register_model(**{**sample_model, 'version': '3.0.0'})['id'] == '4'
+
+    def test_lookups_use_indexes(self, sqlite_registry):
+        """Test that name/version, framework and created_at lookups are served by indexes."""
+        conn = sqlite3.connect(str(sqlite_registry.registry_path))
+        
+        def plan(sql, *args):
+            return " ".join(row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, args))
+        
+        assert "USING INDEX" in plan("SELECT * FROM models WHERE name = ? AND version = ?", "m", "1")
+        assert "models_framework" in plan("SELECT * FROM models WHERE framework = ?", "sklearn")
+        assert "models_created_at" in plan("SELECT * FROM models ORDER BY created_at, id")
+        conn.close()
+
+    def test_migrates_json_registry(self, tmp_path, sample_model):
+        """Test that an existing JSON registry is imported once into a new database."""
+        json_registry = ModelRegistry(str(tmp_path / "registry.json"))
+        first = json_registry.register_model(**sample_model)
+        json_registry.register_model(**{**sample_model, 'version': '2.0.0'})
+        json_registry.delete_model(sample_model['name'], '2.0.0')
+        
+        migrated = ModelRegistry(str(tmp_path / "registry.db"))
+        
+        assert migrated.list_models() == [first]
+        assert migrated.register_model(**{**sample_model, 'version': '3.0.0'})['id'] == '3'
+        # The JSON file is left as it was and is not imported a second time
+        json_registry.register_model(**{**sample_model, 'name': 'late'})
+        assert ModelRegistry(str(tmp_path / "registry.db")).get_model('late') is None
+        assert len(ModelRegistry(str(tmp_path / "registry.json")).list_models()) == 2
+
+class TestJournalModelRegistry:
+    @pytest.fixture
+    def journal_registry(self, tmp_path):
+        return ModelRegistry(registry_path=str(tmp_path / "registry.json"), backend="journal")
+
+    def test_changes_are_appended_and_replayed(self, journal_registry, sample_model):
+        """Test that changes only append to the journal and survive a reload."""
+        journal_registry.register_model(**sample_model)
+        journal_registry.register_model(**{**sample_model, 'version': '2.0.0'})
+        journal_registry.update_model(sample_model['name'], '2.0.0', description='tuned')
+        journal_registry.delete_model(sample_model['name'], '1.0.0')
+        
+        journal = journal_registry._storage.journal_path
+        assert not journal_registry.registry_path.exists()
+        assert [json.loads(line)['op'] for line in journal.read_text().splitlines()] == ['insert', 'insert', 'update', 'delete']
+        
+        reloaded = ModelRegistry(registry_path=str(journal_registry.registry_path), backend="journal")
+        assert reloaded.list_models() == journal_registry.list_models()
+        assert reloaded.get_model(sample_model['name'])['description'] == 'tuned'
+        assert reloaded.register_model(**{**sample_model, 'version': '3.0.0'})['id'] == '3'
+
+    def test_compacts_past_threshold(self, tmp_path, sample_model, monkeypatch):
+        """Test that the journal is folded into the JSON snapshot once it reaches the threshold."""
+        monkeypatch.setenv("DEPLOYWIZARD_REGISTRY_COMPACT_THRESHOLD", "3")
+        registry = ModelRegistry(registry_path=str(tmp_path / "registry.json"), backend="journal")
+        for version in ('1', '2', '3', '4'):
+            registry.register_model(**{**sample_model, 'version': version})
+        
+        journal = registry._storage.journal_path
+        assert len(journal.read_text().splitlines()) == 1
+        snapshot = json.loads(registry.registry_path.read_text())
+        assert sorted(snapshot['models'][sample_model['name']]) == ['1', '2', '3']
+        # The snapshot is a plain JSON registry
+        assert len(ModelRegistry(registry_path=str(registry.registry_path), backend="json").list_models()) == 3
+        assert len(ModelRegistry(registry_path=str(registry.registry_path), backend="journal").list_models()) == 4
+
+    def test_replay_tolerates_crashes(self, journal_registry, sample_model):
+        """Test that a torn last line is dropped and entries already in the snapshot replay harmlessly."""
+        journal_registry.register_model(**sample_model)
+        journal_registry.update_model(sample_model['name'], new_version='2.0.0')
+        journal = journal_registry._storage.journal_path
+        pending = journal.read_text()
+        # Crash after writing the snapshot but before emptying the journal
+        journal_registry._storage.compact()
+        journal.write_text(pending + '{"op": "ins')
+        
+        reloaded = ModelRegistry(registry_path=str(journal_registry.registry_path), backend="journal")
+        reloaded.register_model(**{**sample_model, 'name': 'after'})
+        
+        assert [(m['name'], m['version'], m['id']) for m in reloaded.list_models()] == [
+            (sample_model['name'], '2.0.0', '1'), ('after', '1.0.0', '2')
+        ]
+        assert ModelRegistry(registry_path=str(journal_registry.registry_path), backend="journal").get_model('after') is not None
+
+    def test_sqlite_migration_includes_journal(self, journal_registry, sample_model, tmp_path):
+        """Test that migrating to SQLite picks up changes still in the journal."""
+        journal_registry.register_model(**sample_model)
+        
+        migrated = ModelRegistry(registry_path=str(tmp_path / "registry.db"))
+        
+        assert migrated.list_models() == journal_registry.list_models()
+
+class TestShardedModelRegistry:
+    @pytest.fixture
+    def sharded_registry(self, tmp_path):
+        return ModelRegistry(registry_path=str(tmp_path / "registry.d"))
+
+    def test_layout(self, sharded_registry, sample_model):
+        """Test that each model gets its own shard and the index lists model names only."""
+        sharded_registry.register_model(**sample_model)
+        sharded_registry.register_model(**{**sample_model, 'version': '2.0.0'})
+        sharded_registry.register_model(**{**sample_model, 'name': 'team/other model'})
+        
+        root = sharded_registry.registry_path
+        assert json.loads((root / "index.json").read_text()) == {"models": ["team/other model", sample_model['name']]}
+        assert json.loads((root / "next_id.json").read_text()) == {"next_id": 4}
+        shards = sorted(root.glob("models/*/*.json"))
+        assert len(shards) == 2
+        shard = json.loads(sharded_registry._storage._shard_path(sample_model['name']).read_text())
+        assert (shard['latest'], sorted(shard['versions'])) == ('2.0.0', ['1.0.0', '2.0.0'])
+        
+        sharded_registry.delete_model('team/other model')
+        assert json.loads((root / "index.json").read_text()) == {"models": [sample_model['name']]}
+        assert len(list(root.glob("models/*/*.json"))) == 1
+
+    def test_get_model_reads_only_its_shard(self, sharded_registry, sample_model):
+        """Test that looking up a model does not depend on the index or other shards."""
+        sharded_registry.register_model(**sample_model)
+        other = sharded_registry.register_model(**{**sample_model, 'name': 'other'})
+        (sharded_registry.registry_path / "index.json").write_text("{broken")
+        sharded_registry._storage._shard_path(sample_model['name']).unlink()
+        
+        fresh = ModelRegistry(registry_path=str(sharded_registry.registry_path))
+        
+        assert fresh.get_model('other') == other
+        assert fresh.get_model(sample_model['name']) is None
+
+    def test_iter_models_reads_shards_lazily(self, sharded_registry, sample_model, monkeypatch):
+        """Test that iterating the registry reads one shard per model as it goes."""
+        for name in ('a', 'b', 'c'):
+            sharded_registry.register_model(**{**sample_model, 'name': name})
+        reads = []
+        read_shard = sharded_registry._storage._read_shard
+        monkeypatch.setattr(sharded_registry._storage, "_read_shard", lambda name: reads.append(name) or read_shard(name))
+        
+        models = sharded_registry.iter_models()
+        assert next(models)['name'] == 'a' and reads == ['a']
+        assert [m['name'] for m in models] == ['b', 'c']
+        assert [m['name'] for m in sharded_registry.list_models()] == ['a', 'b', 'c']
+
+    def test_migrates_json_registry(self, tmp_path, sample_model, monkeypatch):
+        """Test that selecting the sharded backend imports the JSON registry, including its journal."""
+        json_registry = ModelRegistry(str(tmp_path / "registry.json"), backend="journal")
+        first = json_registry.register_model(**sample_model)
+        second = json_registry.register_model(**{**sample_model, 'name': 'other', 'version': '10.0.0'})
+        json_registry.register_model(**{**sample_model, 'name': 'other', 'version': '9.0.0'})
+        
+        monkeypatch.setenv("DEPLOYWIZARD_REGISTRY_BACKEND", "sharded")
+        migrated = ModelRegistry(str(tmp_path / "registry.json"))
+        
+        assert migrated.registry_path == tmp_path / "registry.d"
+        assert migrated.get_model(sample_model['name']) == first
+        assert migrated.get_model('other') == second
+        assert migrated.register_model(**{**sample_model, 'name': 'new'})['id'] == '4'
+
+def test_version_key_orders_pep440_and_semver():
+    """Test that versions sort numerically, with pre-releases first and invalid strings last."""
+    versions = ["10.0.0", "9.0.0", "1.0.0", "1.0.0-rc.1", "1.0.0.post1", "2.0.0b1", "run10", "run2", "v1.5"]
+    
+    assert sorted(versions, key=version_key) == [
+        "run2", "run10", "1.0.0-rc.1", "1.0.0", "1.0.0.post1", "v1.5", "2.0.0b1", "9.0.0", "10.0.0"
+    ]
+
+def test_version_key_without_packaging(monkeypatch):
+    """Test the natural-order fallback used when packaging is not installed."""
+    monkeypatch.setattr(registry_storage, "Version", None)
+    
+    assert sorted(["10.0.0", "9.0.0", "9.0.10", "9.0.9"], key=version_key) == ["9.0.0", "9.0.9", "9.0.10", "10.0.0"]
+
+@pytest.mark.parametrize("backend", ["json", "journal", "sqlite", "sharded"])
+def test_latest_version_index(tmp_path, sample_model, backend, monkeypatch):
+    """Test that the latest version follows version order through registers, updates and deletes."""
+    registry = ModelRegistry(str(tmp_path / "registry.json"), backend=backend)
+    register = lambda version, name=sample_model['name']: registry.register_model(**{**sample_model, 'name': name, 'version': version})
+    latest = lambda name=sample_model['name']: (registry.get_model(name) or {}).get('version')
+    
+    for version in ("9.0.0", "10.0.0", "10.0.0rc1", "2.0.0"):
+        register(version)
+    assert latest() == "10.0.0"
+    
+    registry.delete_model(sample_model['name'], "10.0.0")
+    assert latest() == "10.0.0rc1"
+    registry.update_model(sample_model['name'], "10.0.0rc1", new_version="8.0.0")
+    assert latest() == "9.0.0"
+    registry.update_model(sample_model['name'], "9.0.0", new_name="other")
+    assert (latest(), latest("other")) == ("8.0.0", "9.0.0")
+    registry.delete_model(sample_model['name'])
+    assert latest() is None
+    
+    # Reloading from disk gives the same answers
+    registry = ModelRegistry(str(tmp_path / "registry.json"), backend=backend)
+    register("11.0.0", name="other")
+    assert (latest(), latest("other")) == (None, "11.0.0")
+    
+    # Latest lookups no longer compare versions
+    calls = []
+    monkeypatch.setattr(registry_storage, "version_key", lambda v: calls.append(v))
+    for _ in range(100):
+        latest("other")
+    assert calls == []
+
+def test_sqlite_latest_index_is_built_for_existing_databases(tmp_path, sample_model):
+    """Test that a database created before the latest table existed gets it filled on open."""
+    registry = ModelRegistry(str(tmp_path / "registry.db"))
+    for version in ("9.0.0", "10.0.0"):
+        registry.register_model(**{**sample_model, 'version': version})
+    registry._storage.close()
+    conn = sqlite3.connect(str(tmp_path / "registry.db"))
+    conn.executescript("DROP TABLE latest; DELETE FROM meta WHERE key = 'latest_indexed';")
+    conn.close()
+    
+    assert ModelRegistry(str(tmp_path / "registry.db")).get_model(sample_model['name'])['version'] == "10.0.0"
+
+@pytest.mark.skipif(sys.platform == "win32", reason="forks the writer processes")
+@pytest.mark.parametrize("backend", ["json", "journal", "sqlite", "sharded"])
+def test_concurrent_writers_lose_no_updates(tmp_path, backend, monkeypatch):
+    """Stress test: several processes register models into one registry at the same time."""
+    import multiprocessing
+    monkeypatch.setenv("DEPLOYWIZARD_REGISTRY_COMPACT_THRESHOLD", "50")
+    workers, count = 8, 25
+    path = str(tmp_path / ("registry.db" if backend == "sqlite" else "registry.json"))
+    # Forked writers start without re-importing the package
+    context = multiprocessing.get_context("fork")
+    barrier, spans = context.Barrier(workers), context.Queue()
+    procs = [
+        context.Process(target=_register_concurrently, args=(path, backend, w, count, barrier, spans))
+        for w in range(workers)
+    ]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join(timeout=120)
+        assert proc.exitcode == 0
+    # Timed inside the writers, so process startup and shutdown are left out
+    starts, ends = zip(*(spans.get(timeout=5) for _ in procs))
+    elapsed = max(ends) - min(starts)
+    
+    models = ModelRegistry(path, backend=backend).list_models()
+    print(f"\n{backend}: {workers} writers registered {workers * count} models in {elapsed:.2f}s "
+          f"({workers * count / elapsed:.0f} registrations/s)")
+    assert len(models) == workers * count
+    assert {(m['name'], m['version']) for m in models} == {
+        (f"worker{w}", f"{i}.0.0") for w in range(workers) for i in range(count)
+    }
+    assert sorted(int(m['id']) for m in models) == list(range(1, workers * count + 1))
@@ -1,3 +1,4 @@
+import json
 import pytest
 from pathlib import Path
 from unittest.mock import patch, MagicMock, call
@@ -152,3 +153,83 @@ def test_generate_readme(tmp_path):
     assert "ML Model Deployment" in content
     assert "docker build" in content.lower()
     assert "uvicorn" in content.lower()
+
+def test_generate_project_onnx_runtime(tmp_path, capsys):
+    """Test that --runtime onnx ships only the converted model and onnxruntime requirements."""
+    pytest.importorskip("skl2onnx")
+    pytest.importorskip("onnxruntime")
+    import joblib
+    from sklearn.datasets import load_iris
+    from sklearn.linear_model import LogisticRegression
+    X, y = load_iris(return_X_y=True)
+    model_path = tmp_path / "iris.pkl"
+    joblib.dump(LogisticRegression(max_iter=500).fit(X, y), model_path)
+    
+    scaffolder = Scaffolder(registry_path=str(tmp_path / "registry.json"))
+    scaffolder.register_model("iris", "1.0.0", str(model_path), "sklearn")
+    output_dir = tmp_path / "service"
+    scaffolder.generate_project("iris", output_dir=str(output_dir), runtime="onnx")
+    
+    app_dir = output_dir / "app"
+    assert (app_dir / "iris.onnx").exists()
+    assert not (app_dir / "iris.pkl").exists()
+    requirements = (app_dir / "requirements.txt").read_text()
+    assert "onnxruntime" in requirements
+    assert "scikit-learn" not in requirements
+    assert 'MODEL_PATH="/app/iris.onnx"' in (output_dir / "Dockerfile").read_text()
+    assert "ONNX export verified" in capsys.readouterr().out
+
+def test_generate_project_mmap_resaves_uncompressed(tmp_path, capsys):
+    """Test that mmap=True ships an uncompressed artifact and enables MODEL_MMAP in the service."""
+    import joblib
+    import numpy as np
+    from sklearn.linear_model import LinearRegression
+    X = np.random.RandomState(0).rand(50, 3)
+    model_path = tmp_path / "reg.pkl"
+    joblib.dump(LinearRegression().fit(X, X.sum(axis=1)), model_path, compress=3)
+    
+    scaffolder = Scaffolder(registry_path=str(tmp_path / "registry.json"))
+    scaffolder.register_model("reg", "1.0.0", str(model_path), "sklearn")
+    output_dir = tmp_path / "service"
+    scaffolder.generate_project("reg", output_dir=str(output_dir), mmap=True)
+    
+    app_dir = output_dir / "app"
+    assert isinstance(joblib.load(app_dir / "reg.pkl", mmap_mode="r").coef_, np.memmap)
+    assert 'os.getenv("MODEL_MMAP", "true")' in (app_dir / "main.py").read_text()
+    assert "for memory-mapped loading" in capsys.readouterr().out
+
+def test_generate_project_quantize_dynamic_int8(tmp_path, capsys):
+    """Test that --quantize ships an int8 TorchScript archive and writes the comparison report."""
+    torch = pytest.importorskip("torch")
+    model_class_path = tmp_path / "net_class.py"
+    model_class_path.write_text(
+        "import torch\n\n"
+        "class Net(torch.nn.Module):\n"
+        "    def __init__(self):\n"
+        "        super().__init__()\n"
+        "        self.hidden = torch.nn.Linear(8, 32)\n"
+        "        self.out = torch.nn.Linear(32, 2)\n\n"
+        "    def forward(self, x):\n"
+        "        return self.out(torch.relu(self.hidden(x)))\n"
+    )
+    model_path = tmp_path / "net.pt"
+    torch.save({
+        "hidden.weight": torch.rand(32, 8), "hidden.bias": torch.rand(32),
+        "out.weight": torch.rand(2, 32), "out.bias": torch.rand(2),
+    }, model_path)
+    
+    scaffolder = Scaffolder(registry_path=str(tmp_path / "registry.json"))
+    scaffolder.register_model("net", "1.0.0", str(model_path), "pytorch")
+    output_dir = tmp_path / "service"
+    scaffolder.generate_project("net", output_dir=str(output_dir), model_class_path=str(model_class_path),
+                                quantize="dynamic-int8")
+    
+    report = json.loads((output_dir / "quantization_report.json").read_text())
+    assert report['format'] == 'torchscript-int8'
+    assert (output_dir / "app" / "net.int8.torchscript.pt").exists()
+    assert "net.int8.torchscript.pt" in (output_dir / "app" / "main.py").read_text()
+    assert not (output_dir / "app" / "net.torchscript.pt").exists()
+    assert "Latency p50/p99" in capsys.readouterr().out
+    
+    with pytest.raises(ValueError, match="only supported for PyTorch"):
+        scaffolder.generate_project("net", output_dir=str(tmp_path / "onnx"), quantize="dynamic-int8", runtime="onnx")